@@ -8,13 +8,14 @@ import secrets
 import threading
 import time
 import urllib.parse
-import urllib.request
 import webbrowser
 from dataclasses import dataclass
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from pathlib import Path
 from typing import Any
 
+from .http_pool import HttpConnectionPool
+
 
 @dataclass
 class AuthResult:
@@ -65,6 +66,12 @@ class EveSsoClient:
         self.scopes = scopes
         self.token_store_path = token_store_path
         self.token_snapshot = self._load_token_snapshot()
+        # Token requests get their own pool with a circuit breaker but are never retried.
+        self._http = HttpConnectionPool(max_connections_per_host=2, timeout_s=30.0)
+
+    def close(self) -> None:
+        """Close pooled keep-alive connections."""
+        self._http.close()
 
     def login(self) -> AuthResult:
         verifier = self._code_verifier()
@@ -138,12 +145,16 @@ class EveSsoClient:
             return "Reconnect"
 
     def _token_request(self, payload: dict[str, str]) -> AuthResult:
-        token_data = urllib.parse.urlencode(payload).encode("utf-8")
-        request = urllib.request.Request(self.TOKEN_URL, data=token_data, method="POST")
-        request.add_header("Content-Type", "application/x-www-form-urlencoded")
-
-        with urllib.request.urlopen(request, timeout=30) as response:
-            parsed_payload = json.loads(response.read().decode("utf-8"))
+        response = self._http.request(
+            "POST",
+            self.TOKEN_URL,
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            body=urllib.parse.urlencode(payload).encode("utf-8"),
+            # Codes and rotated refresh tokens are single-use, so a grant is never replayed.
+            retry=False,
+        )
+        response.raise_for_status()
+        parsed_payload = json.loads(response.body.decode("utf-8"))
 
         return AuthResult(
             access_token=parsed_payload["access_token"],
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is an optional speed-up
+    np = None
+
+from .configuration import BuildCalculationProfile
+
+if TYPE_CHECKING:
+    from .cost_plan import CompiledBlueprint
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+@dataclass(frozen=True)
+class BlueprintMatrix:
+    """Blueprint x material quantities in ELLPACK layout.
+
+    Row ``i`` holds the materials of blueprint ``i`` in their original dict order,
+    padded with ``-1`` material indices and ``0`` quantities. Keeping the per-row
+    order lets the batch path sum material costs in exactly the same sequence as
+    the scalar loop, so rounded results are bit-for-bit identical.
+    """
+
+    material_index: Any
+    quantities: Any
+    build_quantities: Any
+    me_multipliers: Any
+
+
+def compile_blueprint_matrix(blueprints: Sequence[CompiledBlueprint]) -> BlueprintMatrix:
+    if np is None:
+        raise RuntimeError("NumPy is required for batch costing.")
+
+    width = max((len(bp.material_ids) for bp in blueprints), default=0)
+    material_index = np.full((len(blueprints), width), -1, dtype=np.int64)
+    quantities = np.zeros((len(blueprints), width), dtype=np.float64)
+    for row, bp in enumerate(blueprints):
+        material_index[row, : len(bp.material_ids)] = bp.material_ids
+        quantities[row, : len(bp.quantities)] = bp.quantities
+
+    return BlueprintMatrix(
+        material_index=material_index,
+        quantities=quantities,
+        build_quantities=np.array([bp.build_quantity for bp in blueprints], dtype=np.float64),
+        me_multipliers=np.array([(100 - bp.me) / 100 for bp in blueprints], dtype=np.float64),
+    )
+
+
+def cost_blueprint_matrix(
+    matrix: BlueprintMatrix,
+    price_vector: Sequence[float],
+    profile: BuildCalculationProfile,
+    *,
+    rows: Sequence[int] | None = None,
+) -> list[tuple[float, float, float]]:
+    """Return rounded ``(material_cost, tax_cost, total_cost)`` per blueprint row.
+
+    ``rows`` restricts the computation to a subset of matrix rows, in that order.
+    """
+    return cost_blueprint_matrix_scenarios(matrix, [price_vector], [profile], rows=rows)[0]
+
+
+def cost_blueprint_matrix_scenarios(
+    matrix: BlueprintMatrix,
+    price_vectors: Sequence[Sequence[float]],
+    profiles: Sequence[BuildCalculationProfile],
+    *,
+    rows: Sequence[int] | None = None,
+) -> list[list[tuple[float, float, float]]]:
+    """Cost every row under each ``(price_vectors[i], profiles[i])`` scenario in one pass.
+
+    Scenarios form the leading axis of every intermediate array, so a sweep is a
+    single batched computation rather than one pass per scenario.
+    """
+    if np is None:
+        raise RuntimeError("NumPy is required for batch costing.")
+
+    material_index = matrix.material_index
+    quantities = matrix.quantities
+    build_quantities = matrix.build_quantities
+    me_multipliers = matrix.me_multipliers
+    if rows is not None:
+        selected = np.asarray(rows, dtype=np.int64)
+        material_index = material_index[selected]
+        quantities = quantities[selected]
+        build_quantities = build_quantities[selected]
+        me_multipliers = me_multipliers[selected]
+
+    # The trailing zero is the price slot referenced by padding entries (index -1).
+    prices = np.array([list(price_vector) + [0.0] for price_vector in price_vectors], dtype=np.float64)
+    # Per-scenario terms are column vectors that broadcast across blueprint rows.
+    tax_rates = np.array(
+        [[profile.facility_tax_percent + profile.scc_surcharge_percent] for profile in profiles], dtype=np.float64
+    )
+    facility_me_multipliers = np.array(
+        [[max(0.0, 1.0 - profile.manufacturing_material_efficiency_bonus)] for profile in profiles], dtype=np.float64
+    )
+    system_cost_indexes = np.array([[profile.system_cost_index] for profile in profiles], dtype=np.float64)
+    additional_costs = np.array([[profile.additional_cost_isk] for profile in profiles], dtype=np.float64)
+
+    total_material_cost = np.zeros((len(profiles), len(build_quantities)), dtype=np.float64)
+    for column in range(quantities.shape[1]):
+        required_for_batch = np.ceil(
+            quantities[:, column] * build_quantities * me_multipliers * facility_me_multipliers
+        )
+        total_material_cost += required_for_batch * prices[:, material_index[:, column]]
+
+    material_cost_per_unit = total_material_cost / build_quantities
+    system_cost = material_cost_per_unit * system_cost_indexes
+    tax_cost = material_cost_per_unit * tax_rates
+    additional_cost_per_unit = additional_costs / np.maximum(build_quantities, 1)
+    total_cost = material_cost_per_unit + system_cost + tax_cost + additional_cost_per_unit
+
+    # Python's round() is correctly rounded; np.round is not, so finish per row.
+    return [
+        [
+            (round(material, 2), round(tax, 2), round(total, 2))
+            for material, tax, total in zip(materials, taxes, totals)
+        ]
+        for materials, taxes, totals in zip(
+            material_cost_per_unit.tolist(),
+            (tax_cost + system_cost).tolist(),
+            total_cost.tolist(),
+        )
+    ]
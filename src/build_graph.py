@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+from .configuration import BuildCalculationProfile, get_me_te_for_blueprint
+
+MANUFACTURING = "manufacturing"
+REACTION = "reaction"
+MARKET = "market"
+
+
+@dataclass(frozen=True)
+class BuildRecipe:
+    name: str
+    activity: str
+    materials: dict[str, float]
+    output_quantity: int = 1
+
+
+@dataclass(frozen=True)
+class BuildNodeCost:
+    """Per-unit cost of one node in the build tree."""
+
+    name: str
+    activity: str
+    unit_cost: float
+    material_cost: float
+    job_cost: float
+    inputs: tuple[tuple[str, float], ...] = ()
+
+
+def load_build_recipes(config: dict[str, Any], blueprints: Iterable[dict[str, Any]]) -> dict[str, BuildRecipe]:
+    """Collect manufacturing and reaction recipes that make up the build graph.
+
+    The graph is only active when the config lists ``components`` or ``reactions``;
+    in that case the resolved ``blueprints`` also become recipes so T1 hulls and
+    other catalog items can feed T2 parents.
+    """
+    components = config.get("components", [])
+    reactions = config.get("reactions", [])
+    if not components and not reactions:
+        return {}
+
+    recipes: dict[str, BuildRecipe] = {}
+    for activity, rows in (
+        (MANUFACTURING, blueprints),
+        (MANUFACTURING, components),
+        (REACTION, reactions),
+    ):
+        for row in rows:
+            name = str(row["name"])
+            recipes[name] = BuildRecipe(
+                name=name,
+                activity=activity,
+                materials={str(material): float(amount) for material, amount in row["materials"].items()},
+                output_quantity=max(int(row.get("output_quantity", 1)), 1),
+            )
+    return recipes
+
+
+class BuildGraph:
+    """Memoized DAG costing of components, reactions and raw materials.
+
+    Each node is priced at most once per graph instance, so sub-trees shared by
+    many parents (advanced components, intermediate reactions) are only walked
+    once per refresh. ``reprice`` drops only the nodes that depend on the changed
+    materials. Intermediate quantities are not batch-rounded; rounding is applied
+    by the caller when costing the top-level build.
+    """
+
+    def __init__(
+        self,
+        recipes: dict[str, BuildRecipe],
+        prices: dict[str, Any],
+        profile: BuildCalculationProfile,
+    ) -> None:
+        self.recipes = recipes
+        self.prices = prices
+        self.profile = profile
+        self._memo: dict[str, BuildNodeCost] = {}
+        self._visiting: set[str] = set()
+        self._consumers: dict[str, set[str]] = {}
+        for recipe in recipes.values():
+            for material in recipe.materials:
+                self._consumers.setdefault(material, set()).add(recipe.name)
+
+    def node_cost(self, name: str) -> BuildNodeCost:
+        cached = self._memo.get(name)
+        if cached is not None:
+            return cached
+        if name in self._visiting:
+            raise ValueError(f"Build graph has a cycle through '{name}'.")
+
+        recipe = self.recipes.get(name)
+        if recipe is None or (recipe.activity == REACTION and not self.profile.calculate_reaction_jobs):
+            node = BuildNodeCost(
+                name=name,
+                activity=MARKET,
+                unit_cost=float(self.prices.get(name, 0)),
+                material_cost=float(self.prices.get(name, 0)),
+                job_cost=0.0,
+            )
+            self._memo[name] = node
+            return node
+
+        self._visiting.add(name)
+        try:
+            multiplier = self._material_multiplier(recipe)
+            inputs = tuple(
+                (material, amount * multiplier / recipe.output_quantity)
+                for material, amount in recipe.materials.items()
+            )
+            material_cost = sum(quantity * self.node_cost(material).unit_cost for material, quantity in inputs)
+        finally:
+            self._visiting.discard(name)
+
+        tax_rate = self.profile.facility_tax_percent + self.profile.scc_surcharge_percent
+        cost_index = (
+            self.profile.reaction_cost_index if recipe.activity == REACTION else self.profile.system_cost_index
+        )
+        job_cost = material_cost * (cost_index + tax_rate)
+        node = BuildNodeCost(
+            name=name,
+            activity=recipe.activity,
+            unit_cost=material_cost + job_cost,
+            material_cost=material_cost,
+            job_cost=job_cost,
+            inputs=inputs,
+        )
+        self._memo[name] = node
+        return node
+
+    def reprice(self, changed_prices: dict[str, Any]) -> set[str]:
+        """Update leaf prices and forget every node built from them.
+
+        Returns the recipes whose cost may have moved; they are priced again on
+        the next lookup while the rest of the memo is kept.
+        """
+        self.prices = {**self.prices, **changed_prices}
+        invalidated: set[str] = set()
+        pending = list(changed_prices)
+        while pending:
+            name = pending.pop()
+            self._memo.pop(name, None)
+            for consumer in self._consumers.get(name, ()):
+                if consumer not in invalidated:
+                    invalidated.add(consumer)
+                    pending.append(consumer)
+        return invalidated
+
+    def effective_prices(self, materials: Iterable[str]) -> dict[str, Any]:
+        """Return ``prices`` with every buildable material replaced by its full-chain unit cost."""
+        resolved = dict(self.prices)
+        for material in materials:
+            if material in self.recipes:
+                node = self.node_cost(material)
+                if node.activity != MARKET:
+                    resolved[material] = node.unit_cost
+        return resolved
+
+    def node_costs(self) -> list[BuildNodeCost]:
+        """Every node priced so far, in the order it was first resolved."""
+        return list(self._memo.values())
+
+    def _material_multiplier(self, recipe: BuildRecipe) -> float:
+        if recipe.activity == REACTION:
+            return max(0.0, 1.0 - self.profile.reaction_material_efficiency_bonus)
+        bp_me, _ = get_me_te_for_blueprint(
+            recipe.name,
+            default_me=int(self.profile.base_me),
+            default_te=int(self.profile.base_te),
+        )
+        return (100 - bp_me) / 100 * max(0.0, 1.0 - self.profile.manufacturing_material_efficiency_bonus)
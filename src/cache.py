@@ -1,16 +1,118 @@
 from __future__ import annotations
 
+import inspect
 import json
 import sqlite3
+import struct
+import sys
+import threading
 import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Mapping
 
-from .providers import CharacterStateRecord, MarketSnapshotRecord
+from .providers import CharacterStateProvider, CharacterStateRecord, MarketSnapshotProvider, MarketSnapshotRecord
+
+_SCHEMA_VERSION = 6
+HOUR_SECONDS = 3600
+DAY_SECONDS = 24 * HOUR_SECONDS
+ROLLUP_BUCKETS = (HOUR_SECONDS, DAY_SECONDS)
+_SNAPSHOT_TABLES = ("market_snapshots", "character_assets_snapshots", "character_open_orders_snapshots")
+
+# Build-cost blobs start with a one-byte tag. ``BlueprintCost`` rows use a fixed
+# little-endian layout of three doubles followed by the UTF-8 name; anything else
+# falls back to compact JSON.
+_BLOB_JSON = 0
+_BLOB_BLUEPRINT_COST = 1
+_BLUEPRINT_COST_FORMAT = struct.Struct("<B3d")
+_BLUEPRINT_COST_FIELDS = ("material_cost", "tax_cost", "total_cost")
+
+
+def _encode_build_cost(cost: Mapping[str, Any]) -> bytes:
+    if (
+        len(cost) == 4
+        and isinstance(cost.get("name"), str)
+        and all(type(cost.get(field)) is float for field in _BLUEPRINT_COST_FIELDS)
+    ):
+        return _BLUEPRINT_COST_FORMAT.pack(
+            _BLOB_BLUEPRINT_COST, *(cost[field] for field in _BLUEPRINT_COST_FIELDS)
+        ) + cost["name"].encode("utf-8")
+    return bytes((_BLOB_JSON,)) + json.dumps(cost, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _decode_build_cost(blob: bytes) -> dict[str, Any]:
+    if blob[0] == _BLOB_BLUEPRINT_COST:
+        _, material_cost, tax_cost, total_cost = _BLUEPRINT_COST_FORMAT.unpack_from(blob)
+        return {
+            "name": blob[_BLUEPRINT_COST_FORMAT.size :].decode("utf-8"),
+            "material_cost": material_cost,
+            "tax_cost": tax_cost,
+            "total_cost": total_cost,
+        }
+    return json.loads(blob[1:])
+
+
+@dataclass(frozen=True)
+class SnapshotRead:
+    """Result of a stale-while-revalidate read, flagged with the snapshot's age."""
+
+    rows: Any
+    snapshot_ts: int
+    age_seconds: int
+    stale: bool
+    # Set when a failed provider left only a snapshot older than ``max_stale_seconds``.
+    past_max_stale: bool = False
+
+
+@dataclass(frozen=True)
+class CachedHttpResponse:
+    cache_key: str
+    payload: Any
+    etag: str | None
+    last_modified: str | None
+    expires_ts: int
+
+
+def _market_row(row: sqlite3.Row) -> dict[str, Any]:
+    return {
+        "type_id": row["type_id"],
+        "item_name": row["item_name"],
+        "sell_price": row["sell_price"],
+        "buy_price": row["buy_price"],
+        "daily_volume": row["daily_volume"],
+    }
+
+
+def _market_sort_key(key: tuple[int | None, int]) -> tuple[bool, int, int]:
+    """Same order as ``ORDER BY type_id, item_id`` (NULL type ids first)."""
+    type_id, item_id = key
+    return (type_id is not None, type_id or 0, item_id)
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _provider_expiry(provider: object) -> int | None:
+    """Upstream expiry reported by a provider after its last fetch, if it tracks one."""
+    expiry = getattr(provider, "snapshot_expires_ts", None)
+    return expiry() if callable(expiry) else None
 
 
 class LocalSQLiteCache:
-    """Local cache for market/character snapshots and computed build costs."""
+    """Local cache for market/character snapshots and computed build costs.
+
+    One long-lived writer connection is shared behind a lock, and every thread
+    gets its own long-lived reader connection. The database runs in WAL mode so
+    readers never block the writer (or each other).
+
+    Retention is bounded: old snapshots and least-recently-used build costs are
+    pruned by a background maintenance pass that also runs an incremental vacuum.
+    Any retention limit set to ``None`` is disabled.
+    """
 
     def __init__(
         self,
@@ -18,53 +120,285 @@ class LocalSQLiteCache:
         *,
         market_ttl_seconds: int = 600,
         character_ttl_seconds: int = 180,
+        busy_timeout_ms: int = 5000,
+        cache_size_kib: int = 8192,
+        market_snapshots_to_keep: int | None = 48,
+        character_snapshots_to_keep: int | None = 48,
+        snapshot_max_age_seconds: int | None = 7 * 24 * 3600,
+        build_cost_max_entries: int | None = 50_000,
+        build_cost_max_age_seconds: int | None = 30 * 24 * 3600,
+        maintenance_interval_seconds: float | None = 900.0,
+        vacuum_pages_per_run: int = 256,
+        market_keyframe_interval: int | None = 12,
+        hourly_rollup_max_age_seconds: int | None = 14 * DAY_SECONDS,
+        daily_rollup_max_age_seconds: int | None = 365 * DAY_SECONDS,
+        market_max_stale_seconds: int | None = 6 * HOUR_SECONDS,
+        character_max_stale_seconds: int | None = HOUR_SECONDS,
     ) -> None:
         self.db_path = db_path
         self.market_ttl_seconds = market_ttl_seconds
         self.character_ttl_seconds = character_ttl_seconds
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kib = cache_size_kib
+        self.market_snapshots_to_keep = market_snapshots_to_keep
+        self.character_snapshots_to_keep = character_snapshots_to_keep
+        self.snapshot_max_age_seconds = snapshot_max_age_seconds
+        self.build_cost_max_entries = build_cost_max_entries
+        self.build_cost_max_age_seconds = build_cost_max_age_seconds
+        self.maintenance_interval_seconds = maintenance_interval_seconds
+        self.vacuum_pages_per_run = vacuum_pages_per_run
+        self.market_keyframe_interval = market_keyframe_interval
+        self.hourly_rollup_max_age_seconds = hourly_rollup_max_age_seconds
+        self.daily_rollup_max_age_seconds = daily_rollup_max_age_seconds
+        self.market_max_stale_seconds = market_max_stale_seconds
+        self.character_max_stale_seconds = character_max_stale_seconds
+        self.revalidation_errors: dict[tuple[str, str], Exception] = {}
+        self._revalidations: dict[tuple[str, str], threading.Thread] = {}
+        self._revalidations_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # Per-thread readers, so ones left behind by finished threads can be closed.
+        self._readers: list[tuple[threading.Thread, sqlite3.Connection]] = []
+        self._touched_build_costs: set[str] = set()
+        self._touched_lock = threading.Lock()
+        self._last_maintenance = time.monotonic()
+        self._maintenance_thread: threading.Thread | None = None
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer = self._connect()
+        # Only takes effect on a brand-new file; older files are converted by the first maintenance run.
+        self._writer.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._writer.execute("PRAGMA journal_mode=WAL")
         self._init_db()
 
+    @classmethod
+    def from_config(cls, db_path: Path, cache_cfg: Mapping[str, Any]) -> "LocalSQLiteCache":
+        """Build a cache from the optional ``cache`` block of ``app_config.json``."""
+        known = {
+            name
+            for klass in cls.__mro__
+            if issubclass(klass, LocalSQLiteCache)
+            for name, parameter in inspect.signature(klass.__init__).parameters.items()
+            if parameter.kind is inspect.Parameter.KEYWORD_ONLY
+        }
+        unknown = sorted(set(cache_cfg) - known)
+        if unknown:
+            raise ValueError(f"Unknown cache setting(s): {', '.join(unknown)}")
+        return cls(db_path, **dict(cache_cfg))
+
+    def __enter__(self) -> "LocalSQLiteCache":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.wait_for_revalidation()
+        thread = self._maintenance_thread
+        if thread is not None:
+            thread.join()
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._readers = []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
     def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=256,
+        )
         conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        with self._connections_lock:
+            self._connections.append(conn)
         return conn
 
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """Serialize writes on the shared writer connection inside one transaction."""
+        with self._write_lock:
+            with self._writer:
+                yield self._writer
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Connection]:
+        conn = getattr(self._local, "reader", None)
+        if conn is None:
+            self._close_orphaned_readers()
+            conn = self._connect()
+            self._local.reader = conn
+            with self._connections_lock:
+                self._readers.append((threading.current_thread(), conn))
+        yield conn
+
+    def _close_orphaned_readers(self) -> None:
+        """Close reader connections whose thread has exited (short-lived worker pools)."""
+        with self._connections_lock:
+            orphaned = [conn for thread, conn in self._readers if not thread.is_alive()]
+            if not orphaned:
+                return
+            self._readers = [(thread, conn) for thread, conn in self._readers if thread.is_alive()]
+            self._connections = [conn for conn in self._connections if all(conn is not dead for dead in orphaned)]
+        for conn in orphaned:
+            conn.close()
+
     def _init_db(self) -> None:
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        with self._connect() as conn:
+        with self._write() as conn:
+            schema_version = int(conn.execute("PRAGMA user_version").fetchone()[0])
+            if schema_version < 5:
+                # v1 keys character rows by character_id and v5 also by location_id; old
+                # character rows are short-lived cache data.
+                conn.execute("DROP TABLE IF EXISTS character_assets_snapshots")
+                conn.execute("DROP TABLE IF EXISTS character_open_orders_snapshots")
+            # v2 interns item names and stores build costs as binary blobs; v1 tables are
+            # renamed aside here and copied into the new layout below.
+            legacy_tables: list[str] = []
+            for table in (*_SNAPSHOT_TABLES, "build_cost_cache"):
+                columns = _table_columns(conn, table)
+                if "item_name" in columns or "payload_json" in columns:
+                    conn.execute(f"DROP INDEX IF EXISTS {table}_covering")
+                    conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+                    legacy_tables.append(table)
+
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS item_names (
+                    item_id INTEGER PRIMARY KEY,
+                    item_name TEXT NOT NULL UNIQUE
+                )
+                """
+            )
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS market_snapshots (
                     hub_name TEXT NOT NULL,
                     snapshot_ts INTEGER NOT NULL,
                     type_id INTEGER,
-                    item_name TEXT NOT NULL,
+                    item_id INTEGER NOT NULL,
                     sell_price REAL NOT NULL,
                     buy_price REAL NOT NULL,
                     daily_volume REAL NOT NULL,
-                    PRIMARY KEY (hub_name, snapshot_ts, type_id, item_name)
+                    deleted INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (hub_name, snapshot_ts, type_id, item_id)
                 )
                 """
             )
+            if schema_version < 3:
+                # v3 stores market snapshots as keyframes plus deltas with ``deleted`` tombstones.
+                if "deleted" not in _table_columns(conn, "market_snapshots"):
+                    conn.execute("ALTER TABLE market_snapshots ADD COLUMN deleted INTEGER NOT NULL DEFAULT 0")
+            if schema_version < 6:
+                # v6 drops the covering index that stored every market row a second time.
+                conn.execute("DROP INDEX IF EXISTS market_snapshots_covering")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS market_snapshot_index (
+                    hub_name TEXT NOT NULL,
+                    snapshot_ts INTEGER NOT NULL,
+                    keyframe_ts INTEGER NOT NULL,
+                    PRIMARY KEY (hub_name, snapshot_ts)
+                ) WITHOUT ROWID
+                """
+            )
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS character_assets_snapshots (
+                    character_id INTEGER NOT NULL,
                     snapshot_ts INTEGER NOT NULL,
                     type_id INTEGER,
-                    item_name TEXT NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    location_id INTEGER NOT NULL DEFAULT 0,
                     quantity INTEGER NOT NULL,
-                    PRIMARY KEY (snapshot_ts, type_id, item_name)
+                    PRIMARY KEY (character_id, snapshot_ts, type_id, item_id, location_id)
                 )
                 """
             )
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS character_open_orders_snapshots (
+                    character_id INTEGER NOT NULL,
                     snapshot_ts INTEGER NOT NULL,
                     type_id INTEGER,
-                    item_name TEXT NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    location_id INTEGER NOT NULL DEFAULT 0,
                     volume_remain INTEGER NOT NULL,
-                    PRIMARY KEY (snapshot_ts, type_id, item_name)
+                    PRIMARY KEY (character_id, snapshot_ts, type_id, item_id, location_id)
+                )
+                """
+            )
+            # Market rows are found through their primary key, which already leads with
+            # (hub_name, snapshot_ts); a covering index would store every row a second time.
+            # Character rows are few, so their reads are answered from the index alone.
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS character_assets_snapshots_covering
+                ON character_assets_snapshots (character_id, snapshot_ts, type_id, item_id, location_id, quantity)
+                """
+            )
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS character_open_orders_snapshots_covering
+                ON character_open_orders_snapshots (character_id, snapshot_ts, type_id, item_id, location_id, volume_remain)
+                """
+            )
+            # One row per hub / character pointing at its latest *committed* snapshot. It is
+            # written in the same transaction as the snapshot rows, so partial writes are never visible.
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS snapshot_catalog (
+                    kind TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    snapshot_ts INTEGER NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    expires_ts INTEGER,
+                    PRIMARY KEY (kind, scope)
+                ) WITHOUT ROWID
+                """
+            )
+            # Server-declared expiry (``Expires``/``max-age``) of the endpoints behind a snapshot.
+            if "expires_ts" not in _table_columns(conn, "snapshot_catalog"):
+                conn.execute("ALTER TABLE snapshot_catalog ADD COLUMN expires_ts INTEGER")
+            # Hourly and daily OHLC/volume buckets outlive raw snapshot retention.
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS market_rollups (
+                    hub_name TEXT NOT NULL,
+                    bucket_seconds INTEGER NOT NULL,
+                    bucket_ts INTEGER NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    type_id INTEGER,
+                    open_ts INTEGER NOT NULL,
+                    open_sell REAL NOT NULL,
+                    high_sell REAL NOT NULL,
+                    low_sell REAL NOT NULL,
+                    close_ts INTEGER NOT NULL,
+                    close_sell REAL NOT NULL,
+                    close_buy REAL NOT NULL,
+                    close_volume REAL NOT NULL,
+                    volume_sum REAL NOT NULL,
+                    samples INTEGER NOT NULL,
+                    PRIMARY KEY (hub_name, bucket_seconds, bucket_ts, item_id)
+                ) WITHOUT ROWID
+                """
+            )
+            # Parsed upstream API responses with their HTTP validators, keyed by request.
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS http_response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    expires_ts INTEGER NOT NULL,
+                    stored_ts INTEGER NOT NULL,
+                    payload_json TEXT NOT NULL
                 )
                 """
             )
@@ -73,137 +407,1009 @@ class LocalSQLiteCache:
                 CREATE TABLE IF NOT EXISTS build_cost_cache (
                     config_hash TEXT PRIMARY KEY,
                     computed_ts INTEGER NOT NULL,
-                    payload_json TEXT NOT NULL
+                    payload BLOB NOT NULL,
+                    last_used_ts INTEGER
                 )
                 """
             )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS build_cost_cache_last_used ON build_cost_cache (last_used_ts)"
+            )
 
-    def save_market_snapshot(self, hub_name: str, records: list[MarketSnapshotRecord], *, now_ts: int | None = None) -> int:
+            for table in legacy_tables:
+                self._migrate_legacy_table(conn, table)
+            if schema_version < 1:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO snapshot_catalog (kind, scope, snapshot_ts, row_count)
+                    SELECT 'market', hub_name, snapshot_ts, COUNT(*)
+                    FROM market_snapshots AS m
+                    WHERE snapshot_ts = (SELECT MAX(snapshot_ts) FROM market_snapshots WHERE hub_name = m.hub_name)
+                    GROUP BY hub_name, snapshot_ts
+                    """
+                )
+            if schema_version < 3:
+                # Snapshots written before v3 are complete, so each one is its own keyframe.
+                conn.execute(
+                    """
+                    INSERT OR IGNORE INTO market_snapshot_index (hub_name, snapshot_ts, keyframe_ts)
+                    SELECT DISTINCT hub_name, snapshot_ts, snapshot_ts FROM market_snapshots
+                    """
+                )
+            if schema_version < 4:
+                self._rebuild_market_rollups(conn)
+            if schema_version < 5:
+                conn.execute("DELETE FROM snapshot_catalog WHERE kind = 'character'")
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    @staticmethod
+    def _migrate_legacy_table(conn: sqlite3.Connection, table: str) -> None:
+        legacy = f"{table}_legacy"
+        if table == "build_cost_cache":
+            has_last_used = "last_used_ts" in _table_columns(conn, legacy)
+            rows = conn.execute(
+                f"SELECT config_hash, computed_ts, payload_json, {'last_used_ts' if has_last_used else 'NULL'} FROM {legacy}"
+            ).fetchall()
+            conn.executemany(
+                "INSERT OR REPLACE INTO build_cost_cache (config_hash, computed_ts, payload, last_used_ts) VALUES (?, ?, ?, ?)",
+                [(row[0], row[1], _encode_build_cost(json.loads(row[2])), row[3]) for row in rows],
+            )
+        else:
+            columns = [column for column in _table_columns(conn, legacy) if column != "item_name"]
+            conn.execute(f"INSERT OR IGNORE INTO item_names (item_name) SELECT DISTINCT item_name FROM {legacy}")
+            conn.execute(
+                f"""
+                INSERT OR REPLACE INTO {table} ({', '.join(columns)}, item_id)
+                SELECT {', '.join(f'l.{column}' for column in columns)}, n.item_id
+                FROM {legacy} AS l JOIN item_names AS n ON n.item_name = l.item_name
+                """
+            )
+        conn.execute(f"DROP TABLE {legacy}")
+
+    @staticmethod
+    def _intern_item_names(conn: sqlite3.Connection, item_names: set[str]) -> dict[str, int]:
+        """Return ``item_name -> item_id``, adding any names not seen before."""
+        conn.executemany("INSERT OR IGNORE INTO item_names (item_name) VALUES (?)", [(name,) for name in item_names])
+        rows = conn.execute(
+            "SELECT item_id, item_name FROM item_names WHERE item_name IN (SELECT value FROM json_each(?))",
+            (json.dumps(sorted(item_names)),),
+        )
+        return {row["item_name"]: row["item_id"] for row in rows}
+
+    def _latest_snapshot(self, conn: sqlite3.Connection, kind: str, scope: str) -> tuple[int, int] | None:
+        """``(snapshot_ts, fresh_until)`` of the latest snapshot, or ``None``.
+
+        A snapshot stays fresh until its server-declared expiry when one was saved,
+        otherwise for the market/character TTL.
+        """
+        row = conn.execute(
+            "SELECT snapshot_ts, expires_ts FROM snapshot_catalog WHERE kind = ? AND scope = ?",
+            (kind, scope),
+        ).fetchone()
+        if row is None:
+            return None
+        snapshot_ts = int(row["snapshot_ts"])
+        if row["expires_ts"] is not None:
+            return snapshot_ts, int(row["expires_ts"])
+        ttl_seconds = self.market_ttl_seconds if kind == "market" else self.character_ttl_seconds
+        return snapshot_ts, snapshot_ts + ttl_seconds
+
+    def snapshot_fresh_until(self, kind: str, scope: str) -> int | None:
+        """When the latest ``market``/``character`` snapshot for ``scope`` goes stale, if there is one."""
+        with self._read() as conn:
+            latest = self._latest_snapshot(conn, kind, scope)
+        return None if latest is None else latest[1]
+
+    def due_snapshots(self, kind: str, scopes: Iterable[str], *, now_ts: int | None = None) -> list[str]:
+        """``scopes`` whose snapshot is missing or past its expiry, in the given order."""
         ts = now_ts or int(time.time())
-        with self._connect() as conn:
+        with self._read() as conn:
+            due = []
+            for scope in scopes:
+                latest = self._latest_snapshot(conn, kind, scope)
+                if latest is None or latest[1] <= ts:
+                    due.append(scope)
+        return due
+
+    @staticmethod
+    def _publish_snapshot(
+        conn: sqlite3.Connection,
+        kind: str,
+        scope: str,
+        snapshot_ts: int,
+        row_count: int,
+        expires_ts: int | None = None,
+    ) -> None:
+        conn.execute(
+            """
+            INSERT INTO snapshot_catalog (kind, scope, snapshot_ts, row_count, expires_ts)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (kind, scope) DO UPDATE SET
+                snapshot_ts = excluded.snapshot_ts,
+                row_count = excluded.row_count,
+                expires_ts = excluded.expires_ts
+            WHERE excluded.snapshot_ts >= snapshot_catalog.snapshot_ts
+            """,
+            # An expiry already in the past (clock skew) still leaves the new snapshot readable.
+            (kind, scope, snapshot_ts, row_count, None if expires_ts is None else max(expires_ts, snapshot_ts)),
+        )
+
+    def save_market_snapshot(
+        self,
+        hub_name: str,
+        records: list[MarketSnapshotRecord],
+        *,
+        now_ts: int | None = None,
+        expires_ts: int | None = None,
+    ) -> int:
+        """Store a hub snapshot as a delta against the previous one, or as a keyframe.
+
+        A keyframe holds every row; a delta only holds rows whose prices changed plus
+        ``deleted`` tombstones for rows that disappeared. A new keyframe starts once a
+        chain reaches ``market_keyframe_interval`` snapshots or a delta would not be
+        smaller than the full snapshot. ``expires_ts`` is the upstream expiry, if any;
+        it replaces ``market_ttl_seconds`` for this snapshot.
+        """
+        ts = now_ts or int(time.time())
+        with self._write() as conn:
+            item_ids = self._intern_item_names(conn, {record.key.item_name for record in records})
+            state = {
+                (record.key.type_id, item_ids[record.key.item_name]): (
+                    record.sell_price,
+                    record.buy_price,
+                    record.daily_volume,
+                )
+                for record in records
+            }
+
+            tip = conn.execute(
+                "SELECT snapshot_ts, keyframe_ts FROM market_snapshot_index WHERE hub_name = ? ORDER BY snapshot_ts DESC LIMIT 1",
+                (hub_name,),
+            ).fetchone()
+            if tip is not None and tip["snapshot_ts"] == ts:
+                # Re-saving the latest snapshot replaces it; nothing chains from it yet.
+                conn.execute("DELETE FROM market_snapshots WHERE hub_name = ? AND snapshot_ts = ?", (hub_name, ts))
+                conn.execute("DELETE FROM market_snapshot_index WHERE hub_name = ? AND snapshot_ts = ?", (hub_name, ts))
+                tip = conn.execute(
+                    "SELECT snapshot_ts, keyframe_ts FROM market_snapshot_index WHERE hub_name = ? ORDER BY snapshot_ts DESC LIMIT 1",
+                    (hub_name,),
+                ).fetchone()
+            elif tip is not None and tip["snapshot_ts"] > ts:
+                if conn.execute(
+                    "SELECT 1 FROM market_snapshot_index WHERE hub_name = ? AND snapshot_ts = ?", (hub_name, ts)
+                ).fetchone():
+                    raise ValueError(f"Market snapshot {ts} for '{hub_name}' already exists and is not the latest.")
+                # Out-of-order snapshots are stored as standalone keyframes outside any chain.
+                tip = None
+
+            delta: dict[tuple[int | None, int], tuple[float, float, float] | None] | None = None
+            if tip is not None:
+                chain_length = conn.execute(
+                    "SELECT COUNT(*) FROM market_snapshot_index WHERE hub_name = ? AND snapshot_ts >= ? AND keyframe_ts = ?",
+                    (hub_name, tip["keyframe_ts"], tip["keyframe_ts"]),
+                ).fetchone()[0]
+                if self.market_keyframe_interval is not None and chain_length < self.market_keyframe_interval:
+                    previous = {
+                        (row["type_id"], row["item_id"]): (row["sell_price"], row["buy_price"], row["daily_volume"])
+                        for row in self._market_state(conn, hub_name, tip["snapshot_ts"], tip["keyframe_ts"])
+                    }
+                    delta = {key: values for key, values in state.items() if previous.get(key) != values}
+                    delta.update((key, None) for key in previous.keys() - state.keys())
+                    if len(delta) >= len(state):
+                        delta = None
+
+            keyframe_ts = ts if delta is None else tip["keyframe_ts"]
+            rows = state if delta is None else delta
             conn.executemany(
                 """
-                INSERT OR REPLACE INTO market_snapshots
-                (hub_name, snapshot_ts, type_id, item_name, sell_price, buy_price, daily_volume)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO market_snapshots
+                (hub_name, snapshot_ts, type_id, item_id, sell_price, buy_price, daily_volume, deleted)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 """,
                 [
-                    (
-                        hub_name,
-                        ts,
-                        record.key.type_id,
-                        record.key.item_name,
-                        record.sell_price,
-                        record.buy_price,
-                        record.daily_volume,
-                    )
-                    for record in records
+                    (hub_name, ts, type_id, item_id, *(values or (0.0, 0.0, 0.0)), values is None)
+                    for (type_id, item_id), values in rows.items()
                 ],
             )
+            conn.execute(
+                "INSERT INTO market_snapshot_index (hub_name, snapshot_ts, keyframe_ts) VALUES (?, ?, ?)",
+                (hub_name, ts, keyframe_ts),
+            )
+            self._publish_snapshot(conn, "market", hub_name, ts, len(state), expires_ts)
+            self._roll_up_market_snapshot(conn, hub_name, ts, state)
+        self._maybe_schedule_maintenance()
         return ts
 
+    @staticmethod
+    def _market_state(conn: sqlite3.Connection, hub_name: str, snapshot_ts: int, keyframe_ts: int) -> list[sqlite3.Row]:
+        """Rebuild one hub snapshot by taking the newest row per item along its delta chain."""
+        return conn.execute(
+            """
+            SELECT m.type_id, m.item_id, n.item_name, m.sell_price, m.buy_price, m.daily_volume
+            FROM (
+                SELECT
+                    m.*,
+                    ROW_NUMBER() OVER (PARTITION BY m.type_id, m.item_id ORDER BY m.snapshot_ts DESC) AS newest
+                FROM market_snapshots AS m
+                JOIN market_snapshot_index AS i ON i.hub_name = m.hub_name AND i.snapshot_ts = m.snapshot_ts
+                WHERE m.hub_name = ? AND m.snapshot_ts BETWEEN ? AND ? AND i.keyframe_ts = ?
+            ) AS m
+            JOIN item_names AS n ON n.item_id = m.item_id
+            WHERE m.newest = 1 AND NOT m.deleted
+            ORDER BY m.type_id, m.item_id
+            """,
+            (hub_name, keyframe_ts, snapshot_ts, keyframe_ts),
+        ).fetchall()
+
     def get_market_snapshot(self, hub_name: str, *, now_ts: int | None = None) -> list[dict[str, Any]] | None:
         ts = now_ts or int(time.time())
-        oldest_allowed = ts - self.market_ttl_seconds
-        with self._connect() as conn:
-            row = conn.execute(
-                """
-                SELECT MAX(snapshot_ts) AS snapshot_ts
-                FROM market_snapshots
-                WHERE hub_name = ?
-                """,
-                (hub_name,),
+        with self._read() as conn:
+            latest = self._latest_snapshot(conn, "market", hub_name)
+            if latest is None or latest[1] < ts:
+                return None
+            latest_ts = latest[0]
+
+            keyframe = conn.execute(
+                "SELECT keyframe_ts FROM market_snapshot_index WHERE hub_name = ? AND snapshot_ts = ?",
+                (hub_name, latest_ts),
             ).fetchone()
-            if not row or row["snapshot_ts"] is None or int(row["snapshot_ts"]) < oldest_allowed:
+            if keyframe is None:
                 return None
+            return [_market_row(row) for row in self._market_state(conn, hub_name, latest_ts, keyframe["keyframe_ts"])]
+
+    def get_market_history(self, hub_name: str, *, start_ts: int, end_ts: int) -> list[tuple[int, list[dict[str, Any]]]]:
+        """Every stored snapshot of a hub with ``start_ts <= snapshot_ts <= end_ts``, oldest first.
+
+        Delta chains are replayed once in timestamp order, so reading a range costs one
+        pass over its rows rather than one reconstruction per snapshot.
+        """
+        with self._read() as conn:
+            return [
+                (snapshot_ts, [dict(state[key]) for key in sorted(state, key=_market_sort_key)])
+                for snapshot_ts, state in self._replay_market_history(conn, hub_name, start_ts=start_ts, end_ts=end_ts)
+            ]
+
+    @staticmethod
+    def _replay_market_history(
+        conn: sqlite3.Connection,
+        hub_name: str,
+        *,
+        start_ts: int,
+        end_ts: int,
+    ) -> Iterator[tuple[int, dict[tuple[int | None, int], dict[str, Any]]]]:
+        """Yield ``(snapshot_ts, state)`` per snapshot in range; ``state`` is reused, copy before keeping it."""
+        rows = conn.execute(
+            """
+            SELECT i.snapshot_ts, i.keyframe_ts, m.type_id, m.item_id, n.item_name,
+                   m.sell_price, m.buy_price, m.daily_volume, m.deleted
+            FROM market_snapshot_index AS i
+            LEFT JOIN market_snapshots AS m ON m.hub_name = i.hub_name AND m.snapshot_ts = i.snapshot_ts
+            LEFT JOIN item_names AS n ON n.item_id = m.item_id
+            WHERE i.hub_name = ?
+              AND i.snapshot_ts <= ?
+              AND i.snapshot_ts >= (
+                  SELECT MIN(keyframe_ts) FROM market_snapshot_index
+                  WHERE hub_name = ? AND snapshot_ts BETWEEN ? AND ?
+              )
+            ORDER BY i.snapshot_ts
+            """,
+            (hub_name, end_ts, hub_name, start_ts, end_ts),
+        ).fetchall()
+
+        chains: dict[int, dict[tuple[int | None, int], dict[str, Any]]] = {}
+        for index, row in enumerate(rows):
+            snapshot_ts, keyframe_ts = row["snapshot_ts"], row["keyframe_ts"]
+            if snapshot_ts == keyframe_ts and (index == 0 or rows[index - 1]["snapshot_ts"] != snapshot_ts):
+                chains[keyframe_ts] = {}
+            state = chains.setdefault(keyframe_ts, {})
+            if row["item_id"] is not None:
+                key = (row["type_id"], row["item_id"])
+                if row["deleted"]:
+                    state.pop(key, None)
+                else:
+                    state[key] = _market_row(row)
+            last_row_of_snapshot = index + 1 == len(rows) or rows[index + 1]["snapshot_ts"] != snapshot_ts
+            if last_row_of_snapshot and snapshot_ts >= start_ts:
+                yield snapshot_ts, state
+
+    @staticmethod
+    def _roll_up_market_snapshot(
+        conn: sqlite3.Connection,
+        hub_name: str,
+        snapshot_ts: int,
+        state: Mapping[tuple[int | None, int], tuple[float, float, float]],
+    ) -> None:
+        """Fold one full snapshot into its hourly and daily OHLC/volume buckets.
+
+        Re-folding a snapshot with the same timestamp as a bucket's close replaces that
+        sample instead of counting it twice.
+        """
+        conn.executemany(
+            """
+            INSERT INTO market_rollups (
+                hub_name, bucket_seconds, bucket_ts, item_id, type_id,
+                open_ts, open_sell, high_sell, low_sell, close_ts, close_sell, close_buy,
+                close_volume, volume_sum, samples
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+            ON CONFLICT (hub_name, bucket_seconds, bucket_ts, item_id) DO UPDATE SET
+                type_id = excluded.type_id,
+                open_sell = CASE WHEN excluded.open_ts < open_ts THEN excluded.open_sell ELSE open_sell END,
+                open_ts = MIN(open_ts, excluded.open_ts),
+                high_sell = MAX(high_sell, excluded.high_sell),
+                low_sell = MIN(low_sell, excluded.low_sell),
+                volume_sum = volume_sum + excluded.volume_sum
+                    - CASE WHEN excluded.close_ts = close_ts THEN close_volume ELSE 0 END,
+                samples = samples + CASE WHEN excluded.close_ts = close_ts THEN 0 ELSE 1 END,
+                close_sell = CASE WHEN excluded.close_ts >= close_ts THEN excluded.close_sell ELSE close_sell END,
+                close_buy = CASE WHEN excluded.close_ts >= close_ts THEN excluded.close_buy ELSE close_buy END,
+                close_volume = CASE WHEN excluded.close_ts >= close_ts THEN excluded.close_volume ELSE close_volume END,
+                close_ts = MAX(close_ts, excluded.close_ts)
+            """,
+            [
+                (
+                    hub_name,
+                    bucket_seconds,
+                    snapshot_ts - snapshot_ts % bucket_seconds,
+                    item_id,
+                    type_id,
+                    snapshot_ts,
+                    sell_price,
+                    sell_price,
+                    sell_price,
+                    snapshot_ts,
+                    sell_price,
+                    buy_price,
+                    daily_volume,
+                    daily_volume,
+                )
+                for bucket_seconds in ROLLUP_BUCKETS
+                for (type_id, item_id), (sell_price, buy_price, daily_volume) in state.items()
+            ],
+        )
+
+    def _rebuild_market_rollups(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM market_rollups")
+        hubs = [row["hub_name"] for row in conn.execute("SELECT DISTINCT hub_name FROM market_snapshot_index")]
+        for hub_name in hubs:
+            for snapshot_ts, state in self._replay_market_history(conn, hub_name, start_ts=0, end_ts=2**62):
+                self._roll_up_market_snapshot(
+                    conn,
+                    hub_name,
+                    snapshot_ts,
+                    {key: (row["sell_price"], row["buy_price"], row["daily_volume"]) for key, row in state.items()},
+                )
+
+    def get_market_rollups(
+        self,
+        hub_name: str,
+        *,
+        bucket_seconds: int,
+        start_ts: int,
+        end_ts: int,
+    ) -> list[dict[str, Any]]:
+        """OHLC sell-price and volume buckets of one size whose start lies in ``[start_ts, end_ts]``."""
+        if bucket_seconds not in ROLLUP_BUCKETS:
+            raise ValueError(f"Unsupported rollup bucket size: {bucket_seconds}")
+        with self._read() as conn:
+            rows = conn.execute(
+                """
+                SELECT r.bucket_ts, r.type_id, n.item_name, r.open_sell, r.high_sell, r.low_sell, r.close_sell,
+                       r.close_buy, r.volume_sum / r.samples AS avg_daily_volume, r.samples
+                FROM market_rollups AS r JOIN item_names AS n ON n.item_id = r.item_id
+                WHERE r.hub_name = ? AND r.bucket_seconds = ? AND r.bucket_ts BETWEEN ? AND ?
+                ORDER BY r.bucket_ts, r.type_id, r.item_id
+                """,
+                (hub_name, bucket_seconds, start_ts, end_ts),
+            ).fetchall()
+        return [dict(row) for row in rows]
 
-            latest_ts = int(row["snapshot_ts"])
+    def get_average_daily_volume(self, hub_name: str, *, days: int = 7, now_ts: int | None = None) -> dict[str, float]:
+        """Per-item average of the daily buckets in the last ``days`` days (including today).
+
+        Buckets with no reported volume (e.g. snapshots built from order books) are ignored.
+        """
+        ts = now_ts or int(time.time())
+        start_ts = ts - ts % DAY_SECONDS - (days - 1) * DAY_SECONDS
+        with self._read() as conn:
             rows = conn.execute(
                 """
-                SELECT type_id, item_name, sell_price, buy_price, daily_volume
-                FROM market_snapshots
-                WHERE hub_name = ? AND snapshot_ts = ?
+                SELECT n.item_name, AVG(r.volume_sum / r.samples) AS avg_daily_volume
+                FROM market_rollups AS r JOIN item_names AS n ON n.item_id = r.item_id
+                WHERE r.hub_name = ? AND r.bucket_seconds = ? AND r.bucket_ts BETWEEN ? AND ?
+                  AND r.volume_sum > 0
+                GROUP BY r.item_id
                 """,
-                (hub_name, latest_ts),
+                (hub_name, DAY_SECONDS, start_ts, ts),
             ).fetchall()
-            return [dict(r) for r in rows]
+        return {row["item_name"]: float(row["avg_daily_volume"]) for row in rows}
+
+    def read_market_snapshot(
+        self,
+        hub_name: str,
+        provider: MarketSnapshotProvider,
+        *,
+        now_ts: int | None = None,
+    ) -> SnapshotRead:
+        """Stale-while-revalidate read of a hub snapshot.
+
+        A snapshot before its expiry (see ``snapshot_fresh_until``) is returned as-is.
+        An expired one is still returned immediately (``stale=True``) while ``provider``
+        refreshes it on a background thread. Only a missing snapshot, or one older than
+        ``market_max_stale_seconds``, makes the caller wait for ``provider``. The
+        limit is not hard: if that fetch fails, the too-old snapshot is still returned,
+        flagged ``past_max_stale``, and the error is kept in ``revalidation_errors``.
+        Providers with a ``snapshot_expires_ts()`` method pass their upstream expiry along.
+        """
+
+        def fetch_and_save(save_ts: int | None) -> int:
+            records = list(provider.get_market_snapshot_records().values())
+            return self.save_market_snapshot(hub_name, records, now_ts=save_ts, expires_ts=_provider_expiry(provider))
+
+        return self._read_with_revalidation(
+            ("market", hub_name),
+            max_stale_seconds=self.market_max_stale_seconds,
+            load=lambda snapshot_ts: self.get_market_snapshot(hub_name, now_ts=snapshot_ts),
+            fetch_and_save=fetch_and_save,
+            now_ts=now_ts,
+        )
+
+    def read_character_snapshot(
+        self,
+        provider: CharacterStateProvider,
+        *,
+        character_id: int = 0,
+        now_ts: int | None = None,
+    ) -> SnapshotRead:
+        """Stale-while-revalidate read of a character snapshot; see ``read_market_snapshot``."""
+
+        def fetch_and_save(save_ts: int | None) -> int:
+            records = list(provider.get_character_state_records().values())
+            return self.save_character_snapshot(
+                records, now_ts=save_ts, character_id=character_id, expires_ts=_provider_expiry(provider)
+            )
+
+        return self._read_with_revalidation(
+            ("character", str(character_id)),
+            max_stale_seconds=self.character_max_stale_seconds,
+            load=lambda snapshot_ts: self.get_character_snapshot(now_ts=snapshot_ts, character_id=character_id),
+            fetch_and_save=fetch_and_save,
+            now_ts=now_ts,
+        )
+
+    def _read_with_revalidation(
+        self,
+        key: tuple[str, str],
+        *,
+        max_stale_seconds: int | None,
+        load: Callable[[int], Any],
+        fetch_and_save: Callable[[int | None], int],
+        now_ts: int | None,
+    ) -> SnapshotRead:
+        ts = now_ts or int(time.time())
+        with self._read() as conn:
+            latest = self._latest_snapshot(conn, *key)
+        if latest is not None and (max_stale_seconds is None or ts - latest[0] <= max_stale_seconds):
+            snapshot_ts, fresh_until = latest
+            # Reading "as of" the snapshot's own timestamp skips the freshness check in ``load``.
+            rows = load(snapshot_ts)
+            if rows is not None:
+                age = max(ts - snapshot_ts, 0)
+                stale = ts > fresh_until
+                if stale:
+                    self._revalidate_in_background(key, fetch_and_save)
+                return SnapshotRead(rows=rows, snapshot_ts=snapshot_ts, age_seconds=age, stale=stale)
+
+        try:
+            snapshot_ts = fetch_and_save(now_ts)
+        except Exception as exc:
+            # An outdated snapshot still beats none while the provider is failing.
+            rows = None if latest is None else load(latest[0])
+            if rows is None:
+                raise
+            self.revalidation_errors[key] = exc
+            return SnapshotRead(
+                rows=rows,
+                snapshot_ts=latest[0],
+                age_seconds=max(ts - latest[0], 0),
+                stale=True,
+                past_max_stale=max_stale_seconds is not None and ts - latest[0] > max_stale_seconds,
+            )
+        self.revalidation_errors.pop(key, None)
+        return SnapshotRead(rows=load(snapshot_ts), snapshot_ts=snapshot_ts, age_seconds=0, stale=False)
+
+    def _revalidate_in_background(self, key: tuple[str, str], fetch_and_save: Callable[[int | None], int]) -> None:
+        """Start at most one background refresh per snapshot scope."""
+
+        def revalidate() -> None:
+            try:
+                fetch_and_save(None)
+            except Exception as exc:  # surfaced through revalidation_errors for the UI
+                self.revalidation_errors[key] = exc
+            else:
+                self.revalidation_errors.pop(key, None)
+
+        with self._revalidations_lock:
+            thread = self._revalidations.get(key)
+            if thread is not None and thread.is_alive():
+                return
+            thread = threading.Thread(target=revalidate, name=f"builder-cache-revalidate-{key[0]}", daemon=True)
+            self._revalidations[key] = thread
+            thread.start()
+
+    def wait_for_revalidation(self, timeout: float | None = None) -> None:
+        """Block until every background refresh started so far has finished."""
+        with self._revalidations_lock:
+            threads = list(self._revalidations.values())
+        for thread in threads:
+            thread.join(timeout)
 
-    def save_character_snapshot(self, records: list[CharacterStateRecord], *, now_ts: int | None = None) -> int:
+    def save_character_snapshot(
+        self,
+        records: list[CharacterStateRecord],
+        *,
+        now_ts: int | None = None,
+        character_id: int = 0,
+        expires_ts: int | None = None,
+    ) -> int:
+        """Store one character snapshot; zero quantities are not stored."""
         ts = now_ts or int(time.time())
-        with self._connect() as conn:
+        with self._write() as conn:
+            item_ids = self._intern_item_names(conn, {r.key.item_name for r in records})
             conn.executemany(
                 """
                 INSERT OR REPLACE INTO character_assets_snapshots
-                (snapshot_ts, type_id, item_name, quantity)
-                VALUES (?, ?, ?, ?)
+                (character_id, snapshot_ts, type_id, item_id, location_id, quantity)
+                VALUES (?, ?, ?, ?, ?, ?)
                 """,
-                [(ts, r.key.type_id, r.key.item_name, r.asset_quantity) for r in records],
+                [
+                    (character_id, ts, r.key.type_id, item_ids[r.key.item_name], r.location_id, r.asset_quantity)
+                    for r in records
+                    if r.asset_quantity
+                ],
             )
             conn.executemany(
                 """
                 INSERT OR REPLACE INTO character_open_orders_snapshots
-                (snapshot_ts, type_id, item_name, volume_remain)
-                VALUES (?, ?, ?, ?)
+                (character_id, snapshot_ts, type_id, item_id, location_id, volume_remain)
+                VALUES (?, ?, ?, ?, ?, ?)
                 """,
-                [(ts, r.key.type_id, r.key.item_name, r.open_order_quantity) for r in records],
+                [
+                    (character_id, ts, r.key.type_id, item_ids[r.key.item_name], r.location_id, r.open_order_quantity)
+                    for r in records
+                    if r.open_order_quantity
+                ],
             )
+            self._publish_snapshot(conn, "character", str(character_id), ts, len(records), expires_ts)
+        self._maybe_schedule_maintenance()
         return ts
 
-    def get_character_snapshot(self, *, now_ts: int | None = None) -> dict[str, list[dict[str, Any]]] | None:
+    def get_character_snapshot(
+        self,
+        *,
+        now_ts: int | None = None,
+        character_id: int = 0,
+    ) -> dict[str, list[dict[str, Any]]] | None:
         ts = now_ts or int(time.time())
-        oldest_allowed = ts - self.character_ttl_seconds
-        with self._connect() as conn:
-            assets_ts = conn.execute("SELECT MAX(snapshot_ts) AS snapshot_ts FROM character_assets_snapshots").fetchone()
-            orders_ts = conn.execute("SELECT MAX(snapshot_ts) AS snapshot_ts FROM character_open_orders_snapshots").fetchone()
-            if not assets_ts or not orders_ts:
-                return None
-            latest_assets = assets_ts["snapshot_ts"]
-            latest_orders = orders_ts["snapshot_ts"]
-            if latest_assets is None or latest_orders is None:
-                return None
-            latest_ts = min(int(latest_assets), int(latest_orders))
-            if latest_ts < oldest_allowed:
+        with self._read() as conn:
+            latest = self._latest_snapshot(conn, "character", str(character_id))
+            if latest is None or latest[1] < ts:
                 return None
+            latest_ts = latest[0]
 
             assets = conn.execute(
                 """
-                SELECT type_id, item_name, quantity
-                FROM character_assets_snapshots
-                WHERE snapshot_ts = ?
+                SELECT a.type_id, n.item_name, a.location_id, a.quantity
+                FROM character_assets_snapshots AS a JOIN item_names AS n ON n.item_id = a.item_id
+                WHERE a.character_id = ? AND a.snapshot_ts = ?
                 """,
-                (latest_ts,),
+                (character_id, latest_ts),
             ).fetchall()
             orders = conn.execute(
                 """
-                SELECT type_id, item_name, volume_remain
-                FROM character_open_orders_snapshots
-                WHERE snapshot_ts = ?
+                SELECT o.type_id, n.item_name, o.location_id, o.volume_remain
+                FROM character_open_orders_snapshots AS o JOIN item_names AS n ON n.item_id = o.item_id
+                WHERE o.character_id = ? AND o.snapshot_ts = ?
                 """,
-                (latest_ts,),
+                (character_id, latest_ts),
             ).fetchall()
             return {
                 "assets": [dict(r) for r in assets],
                 "open_orders": [dict(r) for r in orders],
             }
 
+    def get_http_response(self, cache_key: str) -> CachedHttpResponse | None:
+        with self._read() as conn:
+            row = conn.execute(
+                "SELECT etag, last_modified, expires_ts, payload_json FROM http_response_cache WHERE cache_key = ?",
+                (cache_key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return CachedHttpResponse(
+            cache_key=cache_key,
+            payload=json.loads(row["payload_json"]),
+            etag=row["etag"],
+            last_modified=row["last_modified"],
+            expires_ts=int(row["expires_ts"]),
+        )
+
+    def save_http_response(
+        self,
+        cache_key: str,
+        payload: Any,
+        *,
+        etag: str | None,
+        last_modified: str | None,
+        expires_ts: int,
+        now_ts: int | None = None,
+    ) -> None:
+        ts = now_ts or int(time.time())
+        with self._write() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO http_response_cache
+                (cache_key, etag, last_modified, expires_ts, stored_ts, payload_json)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (cache_key, etag, last_modified, expires_ts, ts, json.dumps(payload, sort_keys=True, separators=(",", ":"))),
+            )
+
+    def extend_http_response(self, cache_key: str, *, expires_ts: int) -> None:
+        """Record a ``304 Not Modified`` revalidation by moving the entry's expiry forward."""
+        with self._write() as conn:
+            conn.execute("UPDATE http_response_cache SET expires_ts = ? WHERE cache_key = ?", (expires_ts, cache_key))
+
     def get_build_cost(self, config_hash: str) -> dict[str, Any] | None:
-        with self._connect() as conn:
+        with self._read() as conn:
             row = conn.execute(
-                "SELECT payload_json FROM build_cost_cache WHERE config_hash = ?",
+                "SELECT payload FROM build_cost_cache WHERE config_hash = ?",
                 (config_hash,),
             ).fetchone()
             if not row:
                 return None
-            payload = json.loads(row["payload_json"])
-            return payload
+            payload = _decode_build_cost(row["payload"])
+        self._touch_build_costs([config_hash])
+        return payload
 
     def save_build_cost(self, config_hash: str, cost: dict[str, Any], *, now_ts: int | None = None) -> None:
         ts = now_ts or int(time.time())
-        with self._connect() as conn:
+        with self._write() as conn:
             conn.execute(
                 """
-                INSERT OR REPLACE INTO build_cost_cache (config_hash, computed_ts, payload_json)
-                VALUES (?, ?, ?)
+                INSERT OR REPLACE INTO build_cost_cache (config_hash, computed_ts, payload, last_used_ts)
+                VALUES (?, ?, ?, ?)
                 """,
-                (config_hash, ts, json.dumps(cost, sort_keys=True)),
+                (config_hash, ts, _encode_build_cost(cost), ts),
             )
+        self._maybe_schedule_maintenance()
+
+    def get_build_costs(self, config_hashes: list[str]) -> dict[str, dict[str, Any]]:
+        """Resolve many build-cost hashes in a single query; misses are absent from the result."""
+        if not config_hashes:
+            return {}
+        with self._read() as conn:
+            rows = conn.execute(
+                """
+                SELECT config_hash, payload
+                FROM build_cost_cache
+                WHERE config_hash IN (SELECT value FROM json_each(?))
+                """,
+                (json.dumps(config_hashes),),
+            ).fetchall()
+        hits = {row["config_hash"]: _decode_build_cost(row["payload"]) for row in rows}
+        self._touch_build_costs(hits)
+        return hits
+
+    def save_build_costs(self, costs: dict[str, dict[str, Any]], *, now_ts: int | None = None) -> None:
+        """Write many build costs in one transaction."""
+        if not costs:
+            return
+        ts = now_ts or int(time.time())
+        with self._write() as conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO build_cost_cache (config_hash, computed_ts, payload, last_used_ts)
+                VALUES (?, ?, ?, ?)
+                """,
+                [(config_hash, ts, _encode_build_cost(cost), ts) for config_hash, cost in costs.items()],
+            )
+        self._maybe_schedule_maintenance()
+
+    def _touch_build_costs(self, config_hashes: Any) -> None:
+        """Remember build-cost hits; their LRU timestamps are flushed by maintenance."""
+        with self._touched_lock:
+            self._touched_build_costs.update(config_hashes)
+
+    def _maybe_schedule_maintenance(self) -> None:
+        if self.maintenance_interval_seconds is None:
+            return
+        if time.monotonic() - self._last_maintenance < self.maintenance_interval_seconds:
+            return
+        thread = self._maintenance_thread
+        if thread is not None and thread.is_alive():
+            return
+        self._last_maintenance = time.monotonic()
+        self._maintenance_thread = threading.Thread(
+            target=self.run_maintenance,
+            name="builder-cache-maintenance",
+            daemon=True,
+        )
+        self._maintenance_thread.start()
+
+    def run_maintenance(self, *, now_ts: int | None = None) -> dict[str, int]:
+        """Prune by retention policy, then release a bounded number of free pages."""
+        removed = self.prune(now_ts=now_ts)
+        with self._write_lock:
+            auto_vacuum = self._writer.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if auto_vacuum != 2:
+                # Files created before incremental vacuum existed need one full VACUUM to switch modes.
+                self._writer.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                self._writer.execute("VACUUM")
+            else:
+                self._writer.execute(f"PRAGMA incremental_vacuum({int(self.vacuum_pages_per_run)})").fetchall()
+        return removed
+
+    def prune(self, *, now_ts: int | None = None) -> dict[str, int]:
+        """Apply snapshot and build-cost retention; returns deleted row counts per table."""
+        ts = now_ts or int(time.time())
+        with self._touched_lock:
+            touched, self._touched_build_costs = self._touched_build_costs, set()
+
+        removed: dict[str, int] = {}
+        with self._write() as conn:
+            if touched:
+                conn.execute(
+                    "UPDATE build_cost_cache SET last_used_ts = ? WHERE config_hash IN (SELECT value FROM json_each(?))",
+                    (ts, json.dumps(sorted(touched))),
+                )
+
+            market_deleted = 0
+            hubs = [row["scope"] for row in conn.execute("SELECT scope FROM snapshot_catalog WHERE kind = 'market'")]
+            for hub_name in hubs:
+                cutoff = self._snapshot_cutoff(
+                    conn,
+                    "SELECT snapshot_ts FROM market_snapshot_index WHERE hub_name = ? ORDER BY snapshot_ts DESC",
+                    (hub_name,),
+                    keep=self.market_snapshots_to_keep,
+                    now_ts=ts,
+                )
+                if cutoff is not None:
+                    # Retained deltas still need their keyframe, so pruning stops at the oldest one in use.
+                    cutoff = conn.execute(
+                        "SELECT MIN(keyframe_ts) FROM market_snapshot_index WHERE hub_name = ? AND snapshot_ts >= ?",
+                        (hub_name, cutoff),
+                    ).fetchone()[0]
+                    market_deleted += conn.execute(
+                        "DELETE FROM market_snapshots WHERE hub_name = ? AND snapshot_ts < ?",
+                        (hub_name, cutoff),
+                    ).rowcount
+                    conn.execute(
+                        "DELETE FROM market_snapshot_index WHERE hub_name = ? AND snapshot_ts < ?",
+                        (hub_name, cutoff),
+                    )
+            removed["market_snapshots"] = market_deleted
+
+            character_ids = [
+                int(row["scope"]) for row in conn.execute("SELECT scope FROM snapshot_catalog WHERE kind = 'character'")
+            ]
+            for table in ("character_assets_snapshots", "character_open_orders_snapshots"):
+                removed[table] = 0
+                for character_id in character_ids:
+                    cutoff = self._snapshot_cutoff(
+                        conn,
+                        f"SELECT DISTINCT snapshot_ts FROM {table} WHERE character_id = ? ORDER BY snapshot_ts DESC",
+                        (character_id,),
+                        keep=self.character_snapshots_to_keep,
+                        now_ts=ts,
+                    )
+                    if cutoff is not None:
+                        removed[table] += conn.execute(
+                            f"DELETE FROM {table} WHERE character_id = ? AND snapshot_ts < ?",
+                            (character_id, cutoff),
+                        ).rowcount
+
+            build_costs_deleted = 0
+            if self.build_cost_max_age_seconds is not None:
+                build_costs_deleted += conn.execute(
+                    "DELETE FROM build_cost_cache WHERE COALESCE(last_used_ts, computed_ts) < ?",
+                    (ts - self.build_cost_max_age_seconds,),
+                ).rowcount
+            if self.build_cost_max_entries is not None:
+                build_costs_deleted += conn.execute(
+                    """
+                    DELETE FROM build_cost_cache
+                    WHERE config_hash IN (
+                        SELECT config_hash FROM build_cost_cache
+                        ORDER BY COALESCE(last_used_ts, computed_ts) ASC
+                        LIMIT MAX((SELECT COUNT(*) FROM build_cost_cache) - ?, 0)
+                    )
+                    """,
+                    (self.build_cost_max_entries,),
+                ).rowcount
+            removed["build_cost_cache"] = build_costs_deleted
+
+            removed["market_rollups"] = 0
+            for bucket_seconds, max_age in (
+                (HOUR_SECONDS, self.hourly_rollup_max_age_seconds),
+                (DAY_SECONDS, self.daily_rollup_max_age_seconds),
+            ):
+                if max_age is not None:
+                    removed["market_rollups"] += conn.execute(
+                        "DELETE FROM market_rollups WHERE bucket_seconds = ? AND bucket_ts < ?",
+                        (bucket_seconds, ts - max_age),
+                    ).rowcount
+        return removed
+
+    def _snapshot_cutoff(
+        self,
+        conn: sqlite3.Connection,
+        distinct_ts_query: str,
+        params: tuple[Any, ...],
+        *,
+        keep: int | None,
+        now_ts: int,
+    ) -> int | None:
+        """Oldest snapshot_ts to retain, or ``None`` when nothing should be deleted.
+
+        The newest snapshot is always kept so a long-idle hub still has a last-known state.
+        """
+        timestamps = [int(row["snapshot_ts"]) for row in conn.execute(distinct_ts_query, params)]
+        if len(timestamps) <= 1:
+            return None
+        retained = timestamps[: max(keep, 1)] if keep is not None else timestamps
+        if self.snapshot_max_age_seconds is not None:
+            oldest_allowed = now_ts - self.snapshot_max_age_seconds
+            retained = [timestamps[0]] + [snapshot_ts for snapshot_ts in retained[1:] if snapshot_ts >= oldest_allowed]
+        return retained[-1] if len(retained) < len(timestamps) else None
+
+
+def _estimated_size(value: Any) -> int:
+    """Rough deep size of cached dict/list payloads, used for the memory budget."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_estimated_size(key) + _estimated_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_estimated_size(item) for item in value)
+    return size
+
+
+class MemoryTieredCache(LocalSQLiteCache):
+    """``LocalSQLiteCache`` with a bounded in-process LRU tier in front of SQLite.
+
+    Snapshot entries remember their ``snapshot_ts`` so the usual market/character
+    TTLs still apply to memory hits. Every save invalidates the affected entries,
+    and the least recently used entries are evicted once ``memory_budget_bytes`` is
+    exceeded. Reads return fresh copies so callers cannot mutate cached state.
+    """
+
+    def __init__(self, db_path: Path, *, memory_budget_bytes: int = 16 * 1024 * 1024, **kwargs: Any) -> None:
+        self.memory_budget_bytes = memory_budget_bytes
+        self.memory_hits = 0
+        self.memory_misses = 0
+        self._memory: OrderedDict[tuple[str, ...], tuple[Any, int]] = OrderedDict()
+        self._memory_bytes = 0
+        self._memory_lock = threading.Lock()
+        super().__init__(db_path, **kwargs)
+
+    def _memory_get(self, key: tuple[str, ...]) -> Any | None:
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                self.memory_misses += 1
+                return None
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return entry[0]
+
+    def _memory_put(self, key: tuple[str, ...], value: Any) -> None:
+        size = _estimated_size(value)
+        if size > self.memory_budget_bytes:
+            return
+        with self._memory_lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous[1]
+            self._memory[key] = (value, size)
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_budget_bytes:
+                _, (_, evicted_size) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted_size
+
+    def _memory_invalidate(self, keys: Any) -> None:
+        with self._memory_lock:
+            for key in keys:
+                entry = self._memory.pop(key, None)
+                if entry is not None:
+                    self._memory_bytes -= entry[1]
+
+    def clear_memory(self) -> None:
+        with self._memory_lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def save_market_snapshot(
+        self,
+        hub_name: str,
+        records: list[MarketSnapshotRecord],
+        *,
+        now_ts: int | None = None,
+        expires_ts: int | None = None,
+    ) -> int:
+        ts = super().save_market_snapshot(hub_name, records, now_ts=now_ts, expires_ts=expires_ts)
+        self._memory_invalidate([("market", hub_name)])
+        return ts
+
+    def get_market_snapshot(self, hub_name: str, *, now_ts: int | None = None) -> list[dict[str, Any]] | None:
+        ts = now_ts or int(time.time())
+        # Entries are (fresh_until, rows).
+        cached = self._memory_get(("market", hub_name))
+        if cached is not None and cached[0] >= ts:
+            return [dict(row) for row in cached[1]]
+
+        with self._read() as conn:
+            latest = self._latest_snapshot(conn, "market", hub_name)
+        rows = super().get_market_snapshot(hub_name, now_ts=now_ts)
+        if rows is not None and latest is not None:
+            self._memory_put(("market", hub_name), (latest[1], tuple(dict(row) for row in rows)))
+        return rows
+
+    def save_character_snapshot(
+        self,
+        records: list[CharacterStateRecord],
+        *,
+        now_ts: int | None = None,
+        character_id: int = 0,
+        expires_ts: int | None = None,
+    ) -> int:
+        ts = super().save_character_snapshot(records, now_ts=now_ts, character_id=character_id, expires_ts=expires_ts)
+        self._memory_invalidate([("character", str(character_id))])
+        return ts
+
+    def get_character_snapshot(
+        self,
+        *,
+        now_ts: int | None = None,
+        character_id: int = 0,
+    ) -> dict[str, list[dict[str, Any]]] | None:
+        ts = now_ts or int(time.time())
+        key = ("character", str(character_id))
+        cached = self._memory_get(key)
+        if cached is not None and cached[0] >= ts:
+            return {name: [dict(row) for row in rows] for name, rows in cached[1].items()}
+
+        with self._read() as conn:
+            latest = self._latest_snapshot(conn, "character", str(character_id))
+        snapshot = super().get_character_snapshot(now_ts=now_ts, character_id=character_id)
+        if snapshot is not None and latest is not None:
+            frozen = {name: tuple(dict(row) for row in rows) for name, rows in snapshot.items()}
+            self._memory_put(key, (latest[1], frozen))
+        return snapshot
+
+    def get_build_cost(self, config_hash: str) -> dict[str, Any] | None:
+        return self.get_build_costs([config_hash]).get(config_hash)
+
+    def get_build_costs(self, config_hashes: list[str]) -> dict[str, dict[str, Any]]:
+        hits: dict[str, dict[str, Any]] = {}
+        missing: list[str] = []
+        for config_hash in config_hashes:
+            cached = self._memory_get(("build", config_hash))
+            if cached is None:
+                missing.append(config_hash)
+            else:
+                hits[config_hash] = dict(cached)
+        if hits:
+            self._touch_build_costs(hits)
+
+        for config_hash, payload in super().get_build_costs(missing).items():
+            self._memory_put(("build", config_hash), dict(payload))
+            hits[config_hash] = payload
+        return hits
+
+    def save_build_cost(self, config_hash: str, cost: dict[str, Any], *, now_ts: int | None = None) -> None:
+        super().save_build_cost(config_hash, cost, now_ts=now_ts)
+        self._memory_invalidate([("build", config_hash)])
+
+    def save_build_costs(self, costs: dict[str, dict[str, Any]], *, now_ts: int | None = None) -> None:
+        super().save_build_costs(costs, now_ts=now_ts)
+        self._memory_invalidate([("build", config_hash) for config_hash in costs])
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any
+from itertools import product
+from typing import Any, Iterable
 
 from .build_plan import STATIC_BUILD_QUANTITIES
 
@@ -48,6 +49,15 @@ SYSTEM_INDEX_ASSUMPTIONS: dict[str, float] = {
     "C-N4OD": 0.06,
 }
 
+# Reactions are charged against each system's reaction cost index, not the manufacturing one.
+REACTION_INDEX_ASSUMPTIONS: dict[str, float] = {
+    "Jita": 0.02,
+    "Amarr": 0.02,
+    "Dodixie": 0.02,
+    "O-PNSN": 0.04,
+    "C-N4OD": 0.04,
+}
+
 # Tax assumptions and facility profile.
 TAX_ASSUMPTIONS: dict[str, float] = {
     "scc_surcharge": 0.04,
@@ -69,6 +79,7 @@ class BuildCalculationProfile:
     base_te: int
     system: str
     system_cost_index: float
+    reaction_cost_index: float
     facility_tax_percent: float
     scc_surcharge_percent: float
     additional_cost_isk: float
@@ -105,6 +116,7 @@ def load_build_calculation_profile(config_defaults: dict[str, Any]) -> BuildCalc
         base_te=base_te,
         system=system,
         system_cost_index=float(SYSTEM_INDEX_ASSUMPTIONS.get(system, 0.0)),
+        reaction_cost_index=float(calculation.get("reaction_cost_index", REACTION_INDEX_ASSUMPTIONS.get(system, 0.0))),
         facility_tax_percent=float(calculation.get("facility_tax_percent", config_defaults.get("tax_rate", 0.0))),
         scc_surcharge_percent=float(calculation.get("scc_surcharge_percent", TAX_ASSUMPTIONS["scc_surcharge"])),
         additional_cost_isk=float(calculation.get("additional_cost_isk", 0.0)),
@@ -121,6 +133,40 @@ def load_build_calculation_profile(config_defaults: dict[str, Any]) -> BuildCalc
         reaction_material_efficiency_bonus=float(reaction_rig_bonus.get("material_efficiency_bonus", 0.0)),
     )
 
+
+def apply_build_calculation_overrides(config_defaults: dict[str, Any], overrides: dict[str, Any]) -> dict[str, Any]:
+    """Return a copy of app defaults with ``build_calculation`` keys replaced by ``overrides``."""
+    calculation = {**config_defaults.get("build_calculation", {}), **overrides}
+    return {**config_defaults, "build_calculation": calculation}
+
+
+def build_scenario_grid(
+    *,
+    structures: Iterable[str] | None = None,
+    rigs: Iterable[str] | None = None,
+    systems: Iterable[str] | None = None,
+) -> dict[str, dict[str, Any]]:
+    """Cartesian product of facility choices as named ``build_calculation`` overrides.
+
+    Omitted dimensions default to every known structure, rig or system.
+    """
+    dimensions = (
+        ("manufacturing_structure", list(structures or STRUCTURE_MANUFACTURING_BONUSES), STRUCTURE_MANUFACTURING_BONUSES),
+        ("manufacturing_rig", list(rigs or RIG_BONUSES), RIG_BONUSES),
+        ("system", list(systems or SYSTEM_INDEX_ASSUMPTIONS), SYSTEM_INDEX_ASSUMPTIONS),
+    )
+    for field_name, values, known in dimensions:
+        unknown = [value for value in values if value not in known]
+        if unknown:
+            raise ValueError(f"Unknown {field_name} value(s) for scenario grid: {', '.join(unknown)}")
+
+    grid: dict[str, dict[str, Any]] = {}
+    for combination in product(*(values for _, values, _ in dimensions)):
+        name = " / ".join(combination)
+        grid[name] = {field_name: value for (field_name, _, _), value in zip(dimensions, combination)}
+    return grid
+
+
 OUTPUT_MARKET_HUBS: list[str] = ["Jita", "Amarr", "Dodixie", "O-PNSN", "C-N4OD"]
 
 # ESI location-id mapping used to derive CSV hub columns:
@@ -139,6 +185,14 @@ MARKET_HUB_LOCATION_IDS: dict[str, list[int]] = {
     "C-N4OD": [1037131880317],
 }
 
+# Regions whose public order books cover the NPC stations above. Upwell structure
+# markets (13-digit location IDs) are read from the structure market endpoint instead.
+MARKET_HUB_REGION_IDS: dict[str, int] = {
+    "Jita": 10000002,     # The Forge
+    "Amarr": 10000043,    # Domain
+    "Dodixie": 10000032,  # Sinq Laison
+}
+
 
 def ensure_blueprint_whitelisted(blueprint: dict[str, Any]) -> None:
     """Reject any blueprint not present in the local whitelist."""
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import struct
+import sys
+from dataclasses import asdict, dataclass
+from types import MappingProxyType
+from typing import Any, Mapping, Sequence
+
+from .batch_costing import BlueprintMatrix, compile_blueprint_matrix, numpy_available
+from .build_graph import BuildRecipe
+from .build_plan import STATIC_BUILD_QUANTITIES
+from .configuration import BuildCalculationProfile, ensure_blueprint_whitelisted, get_me_te_for_blueprint
+
+
+_DIGEST_SIZE = 16
+_PRICE_FORMAT = struct.Struct("<d")
+
+
+def _digest(payload: Any) -> bytes:
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=_DIGEST_SIZE).digest()
+
+
+@dataclass(frozen=True)
+class CompiledBlueprint:
+    name: str
+    material_ids: tuple[int, ...]
+    quantities: tuple[float, ...]
+    build_quantity: int
+    me: int
+    te: int
+    digest: bytes
+
+
+@dataclass(frozen=True)
+class CostPlan:
+    """Immutable, pre-parsed view of everything refresh_data needs from the config.
+
+    Material names are interned to dense integer ids so prices can be resolved
+    once per refresh into a flat vector shared by every blueprint.
+    """
+
+    profile: BuildCalculationProfile
+    material_names: tuple[str, ...]
+    material_ids: Mapping[str, int]
+    blueprints: tuple[CompiledBlueprint, ...]
+    material_index: Mapping[int, tuple[int, ...]]
+    recipes: Mapping[str, BuildRecipe]
+    profile_digest: bytes
+    matrix: BlueprintMatrix | None = None
+
+    def price_vector(self, prices: Mapping[str, Any]) -> list[float]:
+        return [float(prices.get(material, 0)) for material in self.material_names]
+
+    def cache_keys(self, price_vector: Sequence[float], positions: Sequence[int] | None = None) -> list[str]:
+        """Build-cost cache key per blueprint (or per ``positions``) for the given resolved prices.
+
+        Each key combines the precomputed profile digest, the blueprint's own
+        digest and the packed prices of just the materials it consumes, so a warm
+        refresh hashes a few dozen bytes per blueprint instead of its full config.
+        """
+        price_tokens = [_PRICE_FORMAT.pack(price) for price in price_vector]
+        prefix = self.profile_digest
+        blueprints = self.blueprints if positions is None else [self.blueprints[position] for position in positions]
+        return [
+            hashlib.blake2b(
+                b"".join([prefix, bp.digest, *[price_tokens[material_id] for material_id in bp.material_ids]]),
+                digest_size=_DIGEST_SIZE,
+            ).hexdigest()
+            for bp in blueprints
+        ]
+
+    def positions_for(self, materials: Sequence[str] | set[str]) -> set[int]:
+        """Blueprint positions that consume any of ``materials``."""
+        positions: set[int] = set()
+        for material in materials:
+            material_id = self.material_ids.get(material)
+            if material_id is not None:
+                positions.update(self.material_index.get(material_id, ()))
+        return positions
+
+
+def compile_cost_plan(
+    blueprints: Sequence[dict[str, Any]],
+    *,
+    profile: BuildCalculationProfile,
+    recipes: Mapping[str, BuildRecipe],
+    vectorized: bool = False,
+) -> CostPlan:
+    """Validate and compile blueprints into a ``CostPlan`` for the given profile."""
+    default_me = int(profile.base_me)
+    default_te = int(profile.base_te)
+    material_ids: dict[str, int] = {}
+    material_index: dict[int, list[int]] = {}
+    compiled: list[CompiledBlueprint] = []
+
+    for position, bp in enumerate(blueprints):
+        ensure_blueprint_whitelisted(bp)
+        bp_name = sys.intern(str(bp["name"]))
+        ids: list[int] = []
+        quantities: list[float] = []
+        for material, amount in bp["materials"].items():
+            material_id = material_ids.setdefault(sys.intern(str(material)), len(material_ids))
+            ids.append(material_id)
+            quantities.append(float(amount))
+            material_index.setdefault(material_id, []).append(position)
+        bp_me, bp_te = get_me_te_for_blueprint(bp_name, default_me=default_me, default_te=default_te)
+        build_quantity = int(STATIC_BUILD_QUANTITIES.get(bp_name, 1))
+        compiled.append(
+            CompiledBlueprint(
+                name=bp_name,
+                material_ids=tuple(ids),
+                quantities=tuple(quantities),
+                build_quantity=build_quantity,
+                me=bp_me,
+                te=bp_te,
+                # Material order is part of the digest because it fixes the summation order.
+                digest=_digest(
+                    {
+                        "blueprint": bp,
+                        "material_order": list(bp["materials"]),
+                        "build_quantity": build_quantity,
+                        "me": bp_me,
+                        "te": bp_te,
+                    }
+                ),
+            )
+        )
+
+    return CostPlan(
+        profile=profile,
+        material_names=tuple(material_ids),
+        material_ids=MappingProxyType(material_ids),
+        blueprints=tuple(compiled),
+        material_index=MappingProxyType({key: tuple(value) for key, value in material_index.items()}),
+        recipes=MappingProxyType(dict(recipes)),
+        profile_digest=_digest(asdict(profile)),
+        matrix=compile_blueprint_matrix(compiled) if vectorized and numpy_available() else None,
+    )
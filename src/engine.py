@@ -1,25 +1,28 @@
 from __future__ import annotations
 
 import csv
-import hashlib
 import json
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from math import ceil
 from pathlib import Path
 from typing import Any
 
-from .cache import LocalSQLiteCache
+from .batch_costing import cost_blueprint_matrix, cost_blueprint_matrix_scenarios
+from .build_graph import BuildGraph, BuildNodeCost, load_build_recipes
+from .cache import MemoryTieredCache
+from .cost_plan import CompiledBlueprint, CostPlan, compile_cost_plan
 from .build_plan import STATIC_BUILD_QUANTITIES
 from .evecookbook import EveCookbookClient
 from .configuration import (
     MARKET_HUB_LOCATION_IDS,
     OUTPUT_MARKET_HUBS,
-    ensure_blueprint_whitelisted,
-    get_me_te_for_blueprint,
+    BuildCalculationProfile,
+    apply_build_calculation_overrides,
     load_build_calculation_profile,
 )
-from .providers import EsiCharacterStateAdapter
+from .providers import EsiCharacterStateAdapter, LivePriceProvider, MarketSnapshotProvider
 
 
 CSV_EXPORT_HEADERS = [
@@ -73,11 +76,29 @@ class MarketHubMetrics:
     avg_daily_volume: float = 0.0
 
 
-class LivePriceProvider:
-    """Protocol-like base class for optional live pricing integrations."""
+@dataclass
+class ScenarioCostTable:
+    """Blueprint x scenario cost rows produced by ``CalculatorEngine.sweep_scenarios``."""
+
+    blueprint_names: list[str]
+    scenario_names: list[str]
+    costs: dict[str, list[BlueprintCost]]
+
+    def get(self, blueprint_name: str, scenario_name: str) -> BlueprintCost:
+        return self.costs[scenario_name][self.blueprint_names.index(blueprint_name)]
+
+    def cheapest_scenario(self, blueprint_name: str) -> str:
+        position = self.blueprint_names.index(blueprint_name)
+        return min(self.scenario_names, key=lambda name: self.costs[name][position].total_cost)
 
-    def get_sell_price(self, item_name: str) -> float | None:
-        return None
+
+def _cost_blueprint_shard(
+    shard: tuple[CompiledBlueprint, ...],
+    price_vector: list[float],
+    calculation_profile: BuildCalculationProfile,
+) -> list[BlueprintCost]:
+    """Process-pool entry point; must stay importable at module level for pickling."""
+    return [CalculatorEngine._cost_blueprint(compiled, price_vector, calculation_profile) for compiled in shard]
 
 
 class CalculatorEngine:
@@ -89,60 +110,366 @@ class CalculatorEngine:
         self.last_refresh: datetime | None = None
         self.results: list[BlueprintCost] = []
         self._character_adapter: EsiCharacterStateAdapter | None = None
-        self.cache = LocalSQLiteCache(config_path.with_suffix(".cache.sqlite3"))
+        self._market_providers: dict[str, MarketSnapshotProvider] = {}
+        # Hubs whose snapshot provider failed during the last export.
+        self.snapshot_errors: dict[str, Exception] = {}
+        self._cookbook_client: EveCookbookClient | None = None
+        self._cost_plan: CostPlan | None = None
+        self._cost_plan_source: list[dict[str, Any]] = []
+        self._prices: dict[str, Any] = {}
+        self._effective_prices: dict[str, Any] = {}
+        self.build_steps: list[BuildNodeCost] = []
+        self._build_graph: BuildGraph | None = None
+        self._process_pool: ProcessPoolExecutor | None = None
+        self._process_pool_workers = 0
         self.load_config()
+        self.cache = MemoryTieredCache.from_config(
+            config_path.with_suffix(".cache.sqlite3"),
+            self.config.get("cache", {}),
+        )
 
     def load_config(self) -> None:
         with self.config_path.open("r", encoding="utf-8") as f:
             self.config = json.load(f)
+        self._cost_plan = None
+        self._build_graph = None
+        self._close_cookbook_client()
+
+    def close(self) -> None:
+        """Release parallel refresh workers, pooled HTTP connections and the cache's SQLite connections."""
+        self._shutdown_process_pool()
+        self._close_cookbook_client()
+        self.cache.close()
+
+    def _close_cookbook_client(self) -> None:
+        if self._cookbook_client is not None:
+            self._cookbook_client.close()
+            self._cookbook_client = None
+
+    def _get_cookbook_client(self, cookbook_cfg: dict[str, Any]) -> EveCookbookClient:
+        """One client per loaded config, so keep-alive connections survive across refreshes."""
+        if self._cookbook_client is None:
+            self._cookbook_client = EveCookbookClient(cookbook_cfg, response_cache=self.cache)
+        return self._cookbook_client
+
+    def _shutdown_process_pool(self) -> None:
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True)
+            self._process_pool = None
+            self._process_pool_workers = 0
 
     def refresh_data(self) -> list[BlueprintCost]:
         """Recalculate costs from the fixed bundled config."""
-        defaults = self.config["defaults"]
-        calculation_profile = load_build_calculation_profile(defaults)
-        tax_rate = calculation_profile.facility_tax_percent + calculation_profile.scc_surcharge_percent
-        default_me = int(calculation_profile.base_me)
-        default_te = int(calculation_profile.base_te)
-        blueprints, prices = self._resolve_blueprints_and_prices()
-
-        refreshed: list[BlueprintCost] = []
-        for bp in blueprints:
-            ensure_blueprint_whitelisted(bp)
-            cache_key = self._blueprint_config_hash(bp=bp, defaults=defaults, prices=prices)
-            cached = self.cache.get_build_cost(cache_key)
+        blueprints, raw_prices = self._resolve_blueprints_and_prices()
+        plan = self._get_cost_plan(blueprints)
+        prices = self._apply_build_graph(plan, raw_prices)
+
+        price_vector = plan.price_vector(prices)
+        cache_keys = plan.cache_keys(price_vector)
+        cached_costs = self.cache.get_build_costs(cache_keys)
+        refreshed: list[BlueprintCost | None] = []
+        misses: list[tuple[int, str]] = []
+        for position, cache_key in enumerate(cache_keys):
+            cached = cached_costs.get(cache_key)
             if cached is not None:
                 refreshed.append(BlueprintCost(**cached))
                 continue
+            misses.append((position, cache_key))
+            refreshed.append(None)
+
+        computed = self._cost_plan_rows(
+            plan,
+            price_vector,
+            plan.profile,
+            positions=[position for position, _ in misses],
+        )
+        for (position, _), row in zip(misses, computed):
+            refreshed[position] = row
+        self.cache.save_build_costs({cache_key: row.__dict__ for (_, cache_key), row in zip(misses, computed)})
 
-            bp_name = str(bp["name"])
-            build_quantity = int(STATIC_BUILD_QUANTITIES.get(bp_name, 1))
-            bp_me, _ = get_me_te_for_blueprint(bp_name, default_me=default_me, default_te=default_te)
-            me_bonus = (100 - bp_me) / 100
-            facility_me_multiplier = max(0.0, 1.0 - calculation_profile.manufacturing_material_efficiency_bonus)
-            total_material_cost = 0.0
-            for material, amount in bp["materials"].items():
-                unit_price = float(prices.get(material, 0))
-                required_for_batch = ceil(float(amount) * build_quantity * me_bonus * facility_me_multiplier)
-                total_material_cost += required_for_batch * unit_price
-
-            material_cost_per_unit = total_material_cost / build_quantity
-            system_cost = material_cost_per_unit * calculation_profile.system_cost_index
-            tax_cost = material_cost_per_unit * tax_rate
-            additional_cost_per_unit = calculation_profile.additional_cost_isk / max(build_quantity, 1)
-            total_cost = material_cost_per_unit + system_cost + tax_cost + additional_cost_per_unit
-            row = BlueprintCost(
-                name=bp_name,
-                material_cost=round(material_cost_per_unit, 2),
-                tax_cost=round(tax_cost + system_cost, 2),
-                total_cost=round(total_cost, 2),
-            )
-            refreshed.append(row)
-            self.cache.save_build_cost(cache_key, cost=row.__dict__)
+        self.results = [row for row in refreshed if row is not None]
+        self._prices = dict(raw_prices)
+        self._effective_prices = prices
+        self.last_refresh = datetime.now(timezone.utc)
+        return self.results
+
+    def reprice(self, changed_prices: dict[str, Any]) -> list[BlueprintCost]:
+        """Apply material price changes, recomputing only the blueprints that consume them.
+
+        ``self.results`` is patched in place and the updated rows are returned in
+        result order. Materials whose price did not actually change are ignored.
+        """
+        if not self.results or self._cost_plan is None:
+            self.refresh_data()
+        plan = self._cost_plan
+
+        changed: set[str] = set()
+        for material, price in changed_prices.items():
+            if material in self._prices and self._prices[material] == price:
+                continue
+            self._prices[material] = price
+            changed.add(material)
+        if not changed:
+            return []
+
+        previous_prices = self._effective_prices
+        if self._build_graph is None:
+            self._effective_prices = self._apply_build_graph(plan, self._prices)
+            invalidated: set[str] = set(plan.recipes)
+        else:
+            invalidated = self._build_graph.reprice({material: self._prices[material] for material in changed})
+            self._effective_prices = self._collect_build_graph(plan, self._build_graph)
+        # Built components may move even when only their leaf inputs were repriced.
+        changed.update(
+            name for name in invalidated if self._effective_prices.get(name) != previous_prices.get(name)
+        )
+
+        positions = sorted(plan.positions_for(changed))
+        if not positions:
+            return []
+
+        price_vector = plan.price_vector(self._effective_prices)
+        repriced = self._cost_plan_rows(plan, price_vector, plan.profile, positions=positions)
+        for position, row in zip(positions, repriced):
+            self.results[position] = row
+        self.cache.save_build_costs(
+            {cache_key: row.__dict__ for cache_key, row in zip(plan.cache_keys(price_vector, positions), repriced)}
+        )
 
-        self.results = refreshed
         self.last_refresh = datetime.now(timezone.utc)
-        return refreshed
+        return repriced
+
+    def sweep_scenarios(self, scenarios: dict[str, dict[str, Any]]) -> ScenarioCostTable:
+        """Cost every blueprint under each ``build_calculation`` variant in one batched pass.
+
+        Blueprints, prices and the compiled cost plan are resolved once and shared by
+        all scenarios. With a compiled matrix, every scenario of a plan is costed in
+        one NumPy pass along a scenario axis; otherwise material totals are summed
+        once per distinct facility ME bonus and price vector, and only the index and
+        tax terms are applied per scenario. The build-cost cache, ``self.results`` and
+        the plan that ``reprice`` patches them with are left untouched.
+        """
+        defaults = self.config["defaults"]
+        blueprints, raw_prices = self._resolve_blueprints_and_prices()
+        # A hydration may resolve other blueprints than the last refresh did, and
+        # reprice() writes into self.results by that refresh's row positions.
+        if self._cost_plan is not None and self._cost_plan_source == blueprints:
+            plan = self._cost_plan
+        else:
+            plan = self._compile_cost_plan(blueprints, load_build_calculation_profile(defaults))
+
+        plans_by_me_te = {(plan.profile.base_me, plan.profile.base_te): plan}
+        jobs: dict[tuple[int, int], list[tuple[str, list[float], BuildCalculationProfile]]] = {}
+        for scenario_name, overrides in scenarios.items():
+            profile = load_build_calculation_profile(apply_build_calculation_overrides(defaults, overrides))
+            me_te = (profile.base_me, profile.base_te)
+            scenario_plan = plans_by_me_te.get(me_te)
+            if scenario_plan is None:
+                scenario_plan = plans_by_me_te[me_te] = self._compile_cost_plan(blueprints, profile)
+            prices = (
+                BuildGraph(dict(plan.recipes), raw_prices, profile).effective_prices(plan.material_names)
+                if plan.recipes
+                else raw_prices
+            )
+            jobs.setdefault(me_te, []).append((scenario_name, scenario_plan.price_vector(prices), profile))
+
+        costs: dict[str, list[BlueprintCost]] = {}
+        for me_te, scenario_jobs in jobs.items():
+            costs.update(self._sweep_plan(plans_by_me_te[me_te], scenario_jobs))
+
+        return ScenarioCostTable(
+            blueprint_names=[compiled.name for compiled in plan.blueprints],
+            scenario_names=list(scenarios),
+            costs={scenario_name: costs[scenario_name] for scenario_name in scenarios},
+        )
+
+    def _sweep_plan(
+        self,
+        plan: CostPlan,
+        jobs: list[tuple[str, list[float], BuildCalculationProfile]],
+    ) -> dict[str, list[BlueprintCost]]:
+        """Cost all ``(scenario_name, price_vector, profile)`` jobs that share one compiled plan."""
+        if plan.matrix is not None:
+            scenario_rows = cost_blueprint_matrix_scenarios(
+                plan.matrix,
+                [price_vector for _, price_vector, _ in jobs],
+                [profile for _, _, profile in jobs],
+            )
+            return {
+                scenario_name: [
+                    BlueprintCost(name=compiled.name, material_cost=material, tax_cost=tax, total_cost=total)
+                    for compiled, (material, tax, total) in zip(plan.blueprints, rows)
+                ]
+                for (scenario_name, _, _), rows in zip(jobs, scenario_rows)
+            }
+
+        # Structures, rigs and systems mostly differ in index and tax, not in materials.
+        material_costs: dict[tuple[float, tuple[float, ...]], list[float]] = {}
+        swept: dict[str, list[BlueprintCost]] = {}
+        for scenario_name, price_vector, profile in jobs:
+            facility_me_multiplier = self._facility_me_multiplier(profile)
+            key = (facility_me_multiplier, tuple(price_vector))
+            unit_costs = material_costs.get(key)
+            if unit_costs is None:
+                unit_costs = material_costs[key] = [
+                    self._material_cost_per_unit(compiled, price_vector, facility_me_multiplier)
+                    for compiled in plan.blueprints
+                ]
+            swept[scenario_name] = [
+                self._finish_blueprint_cost(compiled, material_cost_per_unit, profile)
+                for compiled, material_cost_per_unit in zip(plan.blueprints, unit_costs)
+            ]
+        return swept
+
+    def _get_cost_plan(self, blueprints: list[dict[str, Any]]) -> CostPlan:
+        """Return the compiled cost plan, rebuilding it only when its inputs changed."""
+        if self._cost_plan is None or self._cost_plan_source != blueprints:
+            profile = load_build_calculation_profile(self.config["defaults"])
+            self._cost_plan = self._compile_cost_plan(blueprints, profile)
+            self._cost_plan_source = list(blueprints)
+        return self._cost_plan
+
+    def _compile_cost_plan(self, blueprints: list[dict[str, Any]], profile: BuildCalculationProfile) -> CostPlan:
+        return compile_cost_plan(
+            blueprints,
+            profile=profile,
+            recipes=load_build_recipes(self.config, blueprints),
+            vectorized=bool(self.config.get("engine", {}).get("vectorized", False)),
+        )
+
+    def _apply_build_graph(self, plan: CostPlan, prices: dict[str, Any]) -> dict[str, Any]:
+        """Swap buildable inputs for their full-chain cost when recipes are configured."""
+        if not plan.recipes:
+            self._build_graph = None
+            self.build_steps = []
+            return prices
 
+        # Kept for ``reprice``, which only invalidates the nodes fed by changed materials.
+        self._build_graph = BuildGraph(dict(plan.recipes), prices, plan.profile)
+        return self._collect_build_graph(plan, self._build_graph)
+
+    def _collect_build_graph(self, plan: CostPlan, graph: BuildGraph) -> dict[str, Any]:
+        effective = graph.effective_prices(plan.material_names)
+        self.build_steps = graph.node_costs() if plan.profile.show_detailed_build_steps else []
+        return effective
+
+    def _cost_plan_rows(
+        self,
+        plan: CostPlan,
+        price_vector: list[float],
+        calculation_profile: BuildCalculationProfile,
+        *,
+        positions: list[int] | None = None,
+    ) -> list[BlueprintCost]:
+        """Cost plan blueprints (optionally only ``positions``), batched when a matrix is compiled."""
+        selected = list(range(len(plan.blueprints))) if positions is None else positions
+        if not selected:
+            return []
+
+        if plan.matrix is not None:
+            return [
+                BlueprintCost(name=plan.blueprints[position].name, material_cost=material, tax_cost=tax, total_cost=total)
+                for position, (material, tax, total) in zip(
+                    selected,
+                    cost_blueprint_matrix(plan.matrix, price_vector, calculation_profile, rows=positions),
+                )
+            ]
+
+        workers = self._parallel_workers(len(selected))
+        if workers > 1:
+            return self._cost_in_process_pool(plan, price_vector, calculation_profile, selected, workers)
+
+        return [
+            self._cost_blueprint(plan.blueprints[position], price_vector, calculation_profile)
+            for position in selected
+        ]
+
+    def _parallel_workers(self, blueprint_count: int) -> int:
+        engine_cfg = self.config.get("engine", {})
+        workers = int(engine_cfg.get("workers", 0) or 0)
+        if workers <= 1 or blueprint_count < int(engine_cfg.get("parallel_min_blueprints", 256)):
+            return 0
+        return workers
+
+    def _cost_in_process_pool(
+        self,
+        plan: CostPlan,
+        price_vector: list[float],
+        calculation_profile: BuildCalculationProfile,
+        positions: list[int],
+        workers: int,
+    ) -> list[BlueprintCost]:
+        """Shard blueprints across worker processes and merge rows back in input order."""
+        if self._process_pool is None or self._process_pool_workers != workers:
+            self._shutdown_process_pool()
+            self._process_pool = ProcessPoolExecutor(max_workers=workers)
+            self._process_pool_workers = workers
+
+        # A few shards per worker keeps cores busy when blueprints differ in size.
+        shard_size = max(1, -(-len(positions) // (workers * 4)))
+        shards = [
+            tuple(plan.blueprints[position] for position in positions[start : start + shard_size])
+            for start in range(0, len(positions), shard_size)
+        ]
+        merged: list[BlueprintCost] = []
+        for rows in self._process_pool.map(
+            _cost_blueprint_shard,
+            shards,
+            [price_vector] * len(shards),
+            [calculation_profile] * len(shards),
+        ):
+            merged.extend(rows)
+        return merged
+
+    @staticmethod
+    def _cost_blueprint(
+        compiled: CompiledBlueprint,
+        price_vector: list[float],
+        calculation_profile: BuildCalculationProfile,
+    ) -> BlueprintCost:
+        material_cost_per_unit = CalculatorEngine._material_cost_per_unit(
+            compiled,
+            price_vector,
+            CalculatorEngine._facility_me_multiplier(calculation_profile),
+        )
+        return CalculatorEngine._finish_blueprint_cost(compiled, material_cost_per_unit, calculation_profile)
+
+    @staticmethod
+    def _facility_me_multiplier(calculation_profile: BuildCalculationProfile) -> float:
+        return max(0.0, 1.0 - calculation_profile.manufacturing_material_efficiency_bonus)
+
+    @staticmethod
+    def _material_cost_per_unit(
+        compiled: CompiledBlueprint,
+        price_vector: list[float],
+        facility_me_multiplier: float,
+    ) -> float:
+        build_quantity = compiled.build_quantity
+        me_bonus = (100 - compiled.me) / 100
+        total_material_cost = 0.0
+        for material_id, amount in zip(compiled.material_ids, compiled.quantities):
+            unit_price = price_vector[material_id]
+            required_for_batch = ceil(amount * build_quantity * me_bonus * facility_me_multiplier)
+            total_material_cost += required_for_batch * unit_price
+        return total_material_cost / build_quantity
+
+    @staticmethod
+    def _finish_blueprint_cost(
+        compiled: CompiledBlueprint,
+        material_cost_per_unit: float,
+        calculation_profile: BuildCalculationProfile,
+    ) -> BlueprintCost:
+        tax_rate = calculation_profile.facility_tax_percent + calculation_profile.scc_surcharge_percent
+        system_cost = material_cost_per_unit * calculation_profile.system_cost_index
+        tax_cost = material_cost_per_unit * tax_rate
+        additional_cost_per_unit = calculation_profile.additional_cost_isk / max(compiled.build_quantity, 1)
+        total_cost = material_cost_per_unit + system_cost + tax_cost + additional_cost_per_unit
+        return BlueprintCost(
+            name=compiled.name,
+            material_cost=round(material_cost_per_unit, 2),
+            tax_cost=round(tax_cost + system_cost, 2),
+            total_cost=round(total_cost, 2),
+        )
 
     def _resolve_blueprints_and_prices(self) -> tuple[list[dict[str, Any]], dict[str, Any]]:
         """Load blueprint/material config, optionally hydrating from EVE Cookbook API."""
@@ -153,15 +480,11 @@ class CalculatorEngine:
         if not cookbook_cfg.get("enabled", False):
             return blueprints, prices
 
-        client = EveCookbookClient(cookbook_cfg)
+        client = self._get_cookbook_client(cookbook_cfg)
         selected_blueprints = cookbook_cfg.get("blueprints") or sorted(STATIC_BUILD_QUANTITIES)
 
         hydrated_blueprints: list[dict[str, Any]] = []
-        for blueprint_name in selected_blueprints:
-            try:
-                blueprint = client.fetch_blueprint(str(blueprint_name))
-            except Exception:
-                continue
+        for blueprint in client.fetch_blueprints([str(name) for name in selected_blueprints]):
             hydrated_blueprints.append({"name": blueprint.name, "materials": blueprint.materials})
             for material, price in blueprint.material_prices.items():
                 prices.setdefault(material, price)
@@ -179,38 +502,38 @@ class CalculatorEngine:
             order_rows=order_rows,
         )
 
-    @staticmethod
-    def _blueprint_config_hash(bp: dict[str, Any], defaults: dict[str, Any], prices: dict[str, Any]) -> str:
-        relevant_prices = {name: prices.get(name, 0) for name in sorted(bp["materials"])}
-        build_quantity = int(STATIC_BUILD_QUANTITIES.get(str(bp.get("name", "")), 1))
-        calculation_profile = load_build_calculation_profile(defaults)
-        payload = {
-            "blueprint": bp,
-            "defaults": {
-                "tax_rate": defaults.get("tax_rate"),
-                "me": defaults.get("me"),
-                "te": defaults.get("te"),
-                "build_calculation": defaults.get("build_calculation", {}),
-            },
-            "prices": relevant_prices,
-            "build_quantity": build_quantity,
-            "system": calculation_profile.system,
-            "system_cost_index": calculation_profile.system_cost_index,
-            "facility_tax_percent": calculation_profile.facility_tax_percent,
-            "scc_surcharge_percent": calculation_profile.scc_surcharge_percent,
-            "additional_cost_isk": calculation_profile.additional_cost_isk,
-            "manufacturing_structure": calculation_profile.manufacturing_structure,
-            "manufacturing_rig": calculation_profile.manufacturing_rig,
-            "manufacturing_material_efficiency_bonus": calculation_profile.manufacturing_material_efficiency_bonus,
-        }
-        digest_input = json.dumps(payload, sort_keys=True, separators=(",", ":"))
-        return hashlib.sha256(digest_input.encode("utf-8")).hexdigest()
+    def attach_market_snapshot_provider(self, hub_name: str, provider: MarketSnapshotProvider) -> None:
+        """Use ``provider`` for hub sell prices, read through the cache's stale-while-revalidate path."""
+        if hub_name not in OUTPUT_MARKET_HUBS:
+            raise ValueError(f"Unknown market hub '{hub_name}'.")
+        self._market_providers[hub_name] = provider
 
     def export_csv(self, target_path: Path, *, live_price_provider: LivePriceProvider | None = None) -> Path:
         if not self.results:
             self.refresh_data()
 
         market_overrides: dict[str, dict[str, Any]] = self.config.get("hub_market_overrides", {})
+        volume_window_days = int(self.config.get("market_history", {}).get("volume_window_days", 7))
+        history_volumes = {
+            hub_name: {
+                item_name.strip().lower(): volume
+                for item_name, volume in self.cache.get_average_daily_volume(hub_name, days=volume_window_days).items()
+            }
+            for hub_name in OUTPUT_MARKET_HUBS
+        }
+        # Stale snapshots are exported right away; the cache refreshes them in the background.
+        # A hub whose provider fails with nothing stored falls back to the config overrides.
+        snapshot_prices: dict[str, dict[str, float]] = {}
+        self.snapshot_errors = {}
+        for hub_name, provider in self._market_providers.items():
+            try:
+                rows = self.cache.read_market_snapshot(hub_name, provider).rows
+            except Exception as exc:
+                self.snapshot_errors[hub_name] = exc
+                continue
+            snapshot_prices[hub_name] = {
+                str(row["item_name"]).strip().lower(): float(row["sell_price"]) for row in rows
+            }
         hub_state_records = (
             self._character_adapter.get_hub_state_records(MARKET_HUB_LOCATION_IDS)
             if self._character_adapter
@@ -225,6 +548,8 @@ class CalculatorEngine:
                 hub_metrics = self._resolve_hub_metrics(
                     item_name=row.name,
                     market_overrides=market_overrides,
+                    history_volumes=history_volumes,
+                    snapshot_prices=snapshot_prices,
                     hub_state_records=hub_state_records,
                     live_price_provider=live_price_provider,
                 )
@@ -270,6 +595,8 @@ class CalculatorEngine:
         *,
         item_name: str,
         market_overrides: dict[str, dict[str, Any]],
+        history_volumes: dict[str, dict[str, float]],
+        snapshot_prices: dict[str, dict[str, float]],
         hub_state_records: dict[tuple[Any, str], Any],
         live_price_provider: LivePriceProvider | None,
     ) -> dict[str, MarketHubMetrics]:
@@ -285,6 +612,14 @@ class CalculatorEngine:
                 result[hub_name].order_price = float(row.get("order_price", 0.0))
                 result[hub_name].avg_daily_volume = float(row.get("avg_daily_volume", 0.0))
 
+            # Local market history, when present, replaces the static volume override.
+            history_volume = history_volumes.get(hub_name, {}).get(lookup_name)
+            if history_volume is not None:
+                result[hub_name].avg_daily_volume = history_volume
+            snapshot_price = snapshot_prices.get(hub_name, {}).get(lookup_name)
+            if snapshot_price is not None:
+                result[hub_name].sell_price = snapshot_price
+
         if live_price_provider is not None:
             live_sell = live_price_provider.get_sell_price(item_name)
             if live_sell is not None:
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, Iterable, Iterator, Mapping, Sequence, TypeVar
+from urllib.parse import urlencode
+
+from .http_pool import HttpConnectionPool, freshness_expiry
+from .json_stream import iter_json_array
+
+ESI_BASE_URL = "https://esi.evetech.net/latest"
+# POST /universe/names/ accepts at most this many ids per call.
+_NAMES_CHUNK_SIZE = 1000
+# Default request rate per host; override with ``rate_limit_per_s``.
+_DEFAULT_RATE_LIMIT_PER_S = 50.0
+
+T = TypeVar("T")
+
+
+def declared_expiry(headers: Mapping[str, str], *, now_ts: int) -> int | None:
+    """Unix time the server says a response stays valid until, or ``None`` if it does not say."""
+    if "expires" not in headers and "max-age" not in headers.get("cache-control", ""):
+        return None
+    return freshness_expiry(headers, now_ts=now_ts, default_max_age_s=0)
+
+
+@dataclass(frozen=True)
+class PagedResult(Generic[T]):
+    """Per-page reductions of one paginated endpoint and its earliest declared expiry."""
+
+    pages: list[T]
+    expires_ts: int | None
+
+
+class EsiClient:
+    """Shared ESI transport: pooled connections, concurrent paging and type names.
+
+    Paginated endpoints report ``X-Pages`` on their first page; every remaining
+    page is then requested concurrently and each page body is streamed through the
+    caller's reducer instead of being materialized.
+    """
+
+    def __init__(self, config: dict[str, Any], *, thread_name_prefix: str = "esi") -> None:
+        self.base_url = str(config.get("base_url", ESI_BASE_URL)).rstrip("/")
+        self.datasource = str(config.get("datasource", "tranquility"))
+        self.user_agent = str(config.get("user_agent", "Builder_Lightweight"))
+        self.request_timeout_s = float(config.get("request_timeout_s", 15.0))
+        self.max_concurrency = max(int(config.get("max_concurrency", 16)), 1)
+        # ESI bans clients that burn through their error limit; the pool backs off,
+        # throttles and pauses on X-ESI-Error-Limit-Remain before that happens.
+        self.pool = HttpConnectionPool.from_config(
+            config,
+            pool_size=self.max_concurrency,
+            timeout_s=self.request_timeout_s,
+            rate_limit_per_s=_DEFAULT_RATE_LIMIT_PER_S,
+        )
+        self.thread_name_prefix = thread_name_prefix
+        self._type_names: dict[int, str] = {}
+        self._names_lock = threading.Lock()
+
+    def close(self) -> None:
+        """Close pooled keep-alive connections."""
+        self.pool.close()
+
+    def url(self, path: str, **params: Any) -> str:
+        separator = "&" if "?" in path else "?"
+        return f"{self.base_url}{path}{separator}{urlencode({'datasource': self.datasource, **params})}"
+
+    def headers(self, token: str | None) -> dict[str, str]:
+        headers = {"Accept": "application/json", "User-Agent": self.user_agent}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        return headers
+
+    def map(self, function: Callable[[Any], T], items: Sequence[Any]) -> list[T]:
+        """``map`` over ``items`` on up to ``max_concurrency`` threads, keeping order."""
+        workers = min(self.max_concurrency, len(items))
+        if workers <= 1:
+            return [function(item) for item in items]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=self.thread_name_prefix) as executor:
+            return list(executor.map(function, items))
+
+    def reduce_pages(
+        self,
+        paths: Sequence[str],
+        reduce_page: Callable[[int, Iterator[Any]], T],
+        *,
+        token: str | None = None,
+    ) -> list[PagedResult[T]]:
+        """Stream every page of each paginated ``paths`` entry through ``reduce_page``.
+
+        ``reduce_page(path_index, rows)`` runs on a worker thread once per page and
+        must consume ``rows``. Results come back per path, in page order, with the
+        earliest ``Expires``/``max-age`` any of its pages declared.
+        """
+
+        def fetch(job: tuple[int, int]) -> tuple[T, int, int | None]:
+            index, page = job
+            with self.pool.stream("GET", self.url(paths[index], page=page), headers=self.headers(token)) as response:
+                response.raise_for_status()
+                result = reduce_page(index, iter_json_array(response.body))
+            pages = max(int(response.headers.get("x-pages", "1") or 1), 1)
+            return result, pages, declared_expiry(response.headers, now_ts=int(time.time()))
+
+        first_pages = self.map(fetch, [(index, 1) for index in range(len(paths))])
+        remaining = [(index, page) for index, (_, pages, _) in enumerate(first_pages) for page in range(2, pages + 1)]
+        results: list[list[T]] = [[result] for result, _, _ in first_pages]
+        expiries: list[list[int]] = [[] if expires is None else [expires] for _, _, expires in first_pages]
+        for (index, _), (result, _, expires) in zip(remaining, self.map(fetch, remaining)):
+            results[index].append(result)
+            if expires is not None:
+                expiries[index].append(expires)
+        return [
+            PagedResult(pages=pages, expires_ts=min(path_expiries) if path_expiries else None)
+            for pages, path_expiries in zip(results, expiries)
+        ]
+
+    def type_names(self, type_ids: Iterable[int]) -> dict[int, str]:
+        """Names for ``type_ids``; ids not seen before are looked up via ``POST /universe/names/``."""
+        wanted = set(type_ids)
+        with self._names_lock:
+            missing = sorted(wanted - self._type_names.keys())
+        chunks = [missing[start : start + _NAMES_CHUNK_SIZE] for start in range(0, len(missing), _NAMES_CHUNK_SIZE)]
+
+        def post_names(chunk: list[int]) -> list[dict[str, Any]]:
+            response = self.pool.request(
+                "POST",
+                self.url("/universe/names/"),
+                headers={**self.headers(None), "Content-Type": "application/json"},
+                body=json.dumps(chunk).encode("utf-8"),
+                # Name lookups are read-only despite being a POST.
+                retry=True,
+            )
+            response.raise_for_status()
+            return json.loads(response.body.decode("utf-8"))
+
+        for entries in self.map(post_names, chunks):
+            with self._names_lock:
+                for entry in entries:
+                    self._type_names[int(entry["id"])] = str(entry.get("name", ""))
+        with self._names_lock:
+            return {type_id: self._type_names[type_id] for type_id in wanted if type_id in self._type_names}
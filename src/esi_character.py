@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import base64
+import json
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Iterator
+
+from .esi import EsiClient
+from .providers import CharacterStateRecord, ItemKey
+
+if TYPE_CHECKING:
+    from .cache import LocalSQLiteCache
+
+
+def character_id_from_token(access_token: str) -> int:
+    """Character id from an EVE SSO v2 access token (a JWT whose ``sub`` is ``CHARACTER:EVE:<id>``)."""
+    try:
+        segment = access_token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+        return int(str(claims["sub"]).rsplit(":", 1)[-1])
+    except (IndexError, KeyError, TypeError, ValueError) as exc:
+        raise ValueError("Access token does not identify a character.") from exc
+
+
+@dataclass(frozen=True)
+class CharacterState:
+    """Live assets and sell orders, summed per ``(type_id, location_id)``."""
+
+    character_id: int
+    asset_rows: list[dict[str, Any]]
+    order_rows: list[dict[str, Any]]
+
+
+class EsiCharacterStateFetcher:
+    """Fetches a character's assets and open orders from ESI.
+
+    Asset pages and the order list are requested concurrently and streamed into
+    per-``(type_id, location_id)`` totals; besides those, only the locations of
+    assembled items are kept, so memory follows distinct stacks and containers
+    rather than the raw row count. Items inside containers are attributed to the
+    station or structure the container sits in. The totals are written through
+    ``save_character_snapshot`` and reused until ESI's declared ``Expires``, or for
+    ``character_ttl_seconds`` when it declares none.
+    """
+
+    def __init__(self, config: dict[str, Any], *, cache: LocalSQLiteCache | None = None) -> None:
+        self.esi = EsiClient(config, thread_name_prefix="esi-character")
+        self.cache = cache
+
+    def close(self) -> None:
+        """Close pooled keep-alive connections."""
+        self.esi.close()
+
+    def fetch(self, access_token: str, *, now_ts: int | None = None, force: bool = False) -> CharacterState:
+        character_id = character_id_from_token(access_token)
+        ts = now_ts or int(time.time())
+        if self.cache is not None and not force:
+            snapshot = self.cache.get_character_snapshot(now_ts=ts, character_id=character_id)
+            if snapshot is not None:
+                return CharacterState(
+                    character_id=character_id, asset_rows=snapshot["assets"], order_rows=snapshot["open_orders"]
+                )
+
+        def reduce_page(index: int, rows: Iterator[dict[str, Any]]) -> tuple[dict[tuple[int, int], int], dict[int, int]]:
+            totals: dict[tuple[int, int], int] = {}
+            item_locations: dict[int, int] = {}
+            for row in rows:
+                type_id = int(row["type_id"])
+                location_id = int(row["location_id"])
+                if index == 0:
+                    # Only assembled (singleton) items such as containers and ships can hold others.
+                    if row.get("is_singleton"):
+                        item_locations[int(row["item_id"])] = location_id
+                    amount = int(row.get("quantity", 0))
+                elif row.get("is_buy_order"):
+                    continue
+                else:
+                    amount = int(row.get("volume_remain", 0))
+                totals[(type_id, location_id)] = totals.get((type_id, location_id), 0) + amount
+            return totals, item_locations
+
+        assets, orders = self.esi.reduce_pages(
+            [f"/characters/{character_id}/assets/", f"/characters/{character_id}/orders/"],
+            reduce_page,
+            token=access_token,
+        )
+        asset_pages, order_pages = assets.pages, orders.pages
+        item_locations: dict[int, int] = {}
+        for _, page_locations in asset_pages:
+            item_locations.update(page_locations)
+
+        def root_location(location_id: int) -> int:
+            # Containers and ships are assets themselves; walk up to where they are parked.
+            seen: set[int] = set()
+            while location_id in item_locations and location_id not in seen:
+                seen.add(location_id)
+                location_id = item_locations[location_id]
+            return location_id
+
+        asset_totals = self._merge(
+            ((type_id, root_location(location_id)), quantity)
+            for totals, _ in asset_pages
+            for (type_id, location_id), quantity in totals.items()
+        )
+        order_totals = self._merge(pair for totals, _ in order_pages for pair in totals.items())
+        names = self.esi.type_names({type_id for type_id, _ in (*asset_totals, *order_totals)})
+
+        records = [
+            CharacterStateRecord(
+                key=ItemKey.from_raw(type_id=type_id, item_name=names.get(type_id, "")),
+                asset_quantity=asset_totals.get((type_id, location_id), 0),
+                open_order_quantity=order_totals.get((type_id, location_id), 0),
+                location_id=location_id,
+            )
+            for type_id, location_id in {**asset_totals, **order_totals}
+        ]
+        if self.cache is not None:
+            # ESI declares when assets and orders are next regenerated; fall back to the TTL.
+            declared = [expires for expires in (assets.expires_ts, orders.expires_ts) if expires is not None]
+            self.cache.save_character_snapshot(
+                records, now_ts=ts, character_id=character_id, expires_ts=min(declared) if declared else None
+            )
+        return CharacterState(
+            character_id=character_id,
+            asset_rows=[
+                {
+                    "type_id": r.key.type_id,
+                    "item_name": r.key.item_name,
+                    "location_id": r.location_id,
+                    "quantity": r.asset_quantity,
+                }
+                for r in records
+                if r.asset_quantity
+            ],
+            order_rows=[
+                {
+                    "type_id": r.key.type_id,
+                    "item_name": r.key.item_name,
+                    "location_id": r.location_id,
+                    "volume_remain": r.open_order_quantity,
+                }
+                for r in records
+                if r.open_order_quantity
+            ],
+        )
+
+    @staticmethod
+    def _merge(pairs: Iterator[tuple[tuple[int, int], int]]) -> dict[tuple[int, int], int]:
+        merged: dict[tuple[int, int], int] = {}
+        for key, amount in pairs:
+            merged[key] = merged.get(key, 0) + amount
+        return merged
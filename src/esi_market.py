@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Sequence
+from urllib.parse import urlencode
+
+from .configuration import MARKET_HUB_LOCATION_IDS, MARKET_HUB_REGION_IDS, OUTPUT_MARKET_HUBS
+from .esi import EsiClient
+from .providers import ItemKey, LivePriceProvider, MarketSnapshotProvider, MarketSnapshotRecord
+
+if TYPE_CHECKING:
+    from .cache import LocalSQLiteCache
+
+
+# Upwell structures have 13-digit ids; NPC stations sit in the 60-million range.
+STRUCTURE_ID_MIN = 1_000_000_000_000
+
+
+@dataclass(frozen=True)
+class HubTypeSummary:
+    """Best prices and order-book depth for one type at one hub."""
+
+    type_id: int
+    best_sell: float | None
+    best_buy: float | None
+    sell_depth: int
+    buy_depth: int
+
+
+class _OrderBookReducer:
+    """Folds ESI order rows into per-type best prices and depth for a set of locations."""
+
+    def __init__(self, location_ids: Iterable[int]) -> None:
+        self.location_ids = frozenset(location_ids)
+        # type_id -> [best_sell, best_buy, sell_depth, buy_depth]
+        self._types: dict[int, list[Any]] = {}
+
+    def add(self, orders: Iterable[dict[str, Any]]) -> None:
+        for order in orders:
+            if order.get("location_id") not in self.location_ids:
+                continue
+            type_id = int(order["type_id"])
+            price = float(order["price"])
+            volume = int(order.get("volume_remain", 0))
+            entry = self._types.get(type_id)
+            if entry is None:
+                entry = self._types[type_id] = [None, None, 0, 0]
+            if order.get("is_buy_order"):
+                if entry[1] is None or price > entry[1]:
+                    entry[1] = price
+                entry[3] += volume
+            else:
+                if entry[0] is None or price < entry[0]:
+                    entry[0] = price
+                entry[2] += volume
+
+    def merge(self, other: _OrderBookReducer) -> None:
+        for type_id, (best_sell, best_buy, sell_depth, buy_depth) in other._types.items():
+            entry = self._types.get(type_id)
+            if entry is None:
+                self._types[type_id] = [best_sell, best_buy, sell_depth, buy_depth]
+                continue
+            if best_sell is not None and (entry[0] is None or best_sell < entry[0]):
+                entry[0] = best_sell
+            if best_buy is not None and (entry[1] is None or best_buy > entry[1]):
+                entry[1] = best_buy
+            entry[2] += sell_depth
+            entry[3] += buy_depth
+
+    def summaries(self) -> dict[int, HubTypeSummary]:
+        return {
+            type_id: HubTypeSummary(
+                type_id=type_id,
+                best_sell=best_sell,
+                best_buy=best_buy,
+                sell_depth=sell_depth,
+                buy_depth=buy_depth,
+            )
+            for type_id, (best_sell, best_buy, sell_depth, buy_depth) in self._types.items()
+        }
+
+
+class EsiMarketPriceProvider(LivePriceProvider):
+    """Live hub prices from ESI market orders for every ``OUTPUT_MARKET_HUBS`` entry.
+
+    NPC hubs are read from their region order book (``MARKET_HUB_REGION_IDS``) and
+    filtered to the hub's ``MARKET_HUB_LOCATION_IDS``; Upwell structures are read
+    from the structure market endpoint, which needs ``access_token``. The first page
+    of each book reports ``X-Pages`` and every remaining page is fetched concurrently.
+    """
+
+    def __init__(
+        self,
+        config: dict[str, Any],
+        *,
+        cache: LocalSQLiteCache | None = None,
+        access_token: Callable[[], str] | None = None,
+    ) -> None:
+        self.price_hub = str(config.get("price_hub", "Jita"))
+        self.esi = EsiClient(config, thread_name_prefix="esi-market")
+        self.cache = cache
+        self.access_token = access_token
+        self.errors: dict[str, Exception] = {}
+        self._summaries: dict[str, dict[int, HubTypeSummary]] = {}
+        self._expires: dict[str, int | None] = {}
+        self._type_names: dict[int, str] = {}
+        self._type_ids_by_name: dict[str, int] = {}
+
+    def close(self) -> None:
+        """Close pooled keep-alive connections."""
+        self.esi.close()
+
+    def get_sell_price(self, item_name: str) -> float | None:
+        """Best sell price at ``price_hub`` from the last fetch, if the item was listed there."""
+        type_id = self._type_ids_by_name.get(item_name.strip().lower())
+        if type_id is None:
+            return None
+        summary = self._summaries.get(self.price_hub, {}).get(type_id)
+        return summary.best_sell if summary is not None else None
+
+    def hub_summaries(self, hub_name: str) -> dict[int, HubTypeSummary]:
+        """Per-type summaries from the last fetch of ``hub_name``."""
+        return dict(self._summaries.get(hub_name, {}))
+
+    def fetch_hub(self, hub_name: str) -> dict[int, HubTypeSummary]:
+        """Fetch and reduce every order book that covers ``hub_name``."""
+        return self._fetch_hubs([hub_name], self._token_for([hub_name]))[hub_name]
+
+    def _token_for(self, hub_names: Iterable[str]) -> str | None:
+        needs_token = any(
+            location_id >= STRUCTURE_ID_MIN
+            for hub_name in hub_names
+            for location_id in MARKET_HUB_LOCATION_IDS.get(hub_name, ())
+        )
+        return self.access_token() if needs_token and self.access_token is not None else None
+
+    @staticmethod
+    def _hub_books(hub_name: str, token: str | None) -> list[tuple[str, frozenset[int]]]:
+        """``(path, locations counted from that book)`` for every order book covering ``hub_name``."""
+        if hub_name not in MARKET_HUB_LOCATION_IDS:
+            raise ValueError(f"Unknown market hub '{hub_name}'.")
+        location_ids = MARKET_HUB_LOCATION_IDS[hub_name]
+        structure_ids = sorted(location_id for location_id in location_ids if location_id >= STRUCTURE_ID_MIN)
+        books: list[tuple[str, frozenset[int]]] = []
+        region_id = MARKET_HUB_REGION_IDS.get(hub_name)
+        if region_id is not None:
+            # Region books also list public structure orders; count those from the structure book when it is read.
+            region_locations = set(location_ids) - set(structure_ids) if token else set(location_ids)
+            books.append((f"/markets/{region_id}/orders/?{urlencode({'order_type': 'all'})}", frozenset(region_locations)))
+        if token:
+            books.extend((f"/markets/structures/{structure_id}/", frozenset([structure_id])) for structure_id in structure_ids)
+        if not books:
+            raise ValueError(f"Hub '{hub_name}' only has structure markets; an ESI access token is required.")
+        return books
+
+    def _fetch_hubs(self, hub_names: Sequence[str], token: str | None) -> dict[str, dict[int, HubTypeSummary]]:
+        """Fetch the books of all ``hub_names`` as one batch of concurrent page requests."""
+        jobs = [(hub_name, path, locations) for hub_name in hub_names for path, locations in self._hub_books(hub_name, token)]
+
+        def reduce_page(index: int, orders: Iterator[dict[str, Any]]) -> _OrderBookReducer:
+            page_reducer = _OrderBookReducer(jobs[index][2])
+            page_reducer.add(orders)
+            return page_reducer
+
+        reducers = {hub_name: _OrderBookReducer(MARKET_HUB_LOCATION_IDS[hub_name]) for hub_name in hub_names}
+        expiries: dict[str, list[int]] = {hub_name: [] for hub_name in hub_names}
+        for (hub_name, _, _), result in zip(jobs, self.esi.reduce_pages([path for _, path, _ in jobs], reduce_page, token=token)):
+            for page_reducer in result.pages:
+                reducers[hub_name].merge(page_reducer)
+            if result.expires_ts is not None:
+                expiries[hub_name].append(result.expires_ts)
+
+        summaries = {hub_name: reducer.summaries() for hub_name, reducer in reducers.items()}
+        names = self.esi.type_names({type_id for hub_summaries in summaries.values() for type_id in hub_summaries})
+        self._type_names.update(names)
+        self._type_ids_by_name.update({name.strip().lower(): type_id for type_id, name in names.items()})
+        for hub_name in hub_names:
+            self._summaries[hub_name] = summaries[hub_name]
+            # A hub snapshot is only as fresh as its earliest-expiring book.
+            self._expires[hub_name] = min(expiries[hub_name]) if expiries[hub_name] else None
+        return summaries
+
+    def snapshot_expires_ts(self, hub_name: str) -> int | None:
+        """Upstream expiry of the last fetch of ``hub_name``, if ESI declared one."""
+        return self._expires.get(hub_name)
+
+    def market_snapshot_records(self, hub_name: str) -> dict[ItemKey, MarketSnapshotRecord]:
+        """Fetch ``hub_name`` and convert it to snapshot records.
+
+        Only types with at least one sell order become records. Order books carry no
+        traded volume, so ``daily_volume`` is left at 0.
+        """
+        self.fetch_hub(hub_name)
+        return self._snapshot_records(hub_name)
+
+    def _snapshot_records(self, hub_name: str) -> dict[ItemKey, MarketSnapshotRecord]:
+        records: dict[ItemKey, MarketSnapshotRecord] = {}
+        for type_id, summary in self._summaries.get(hub_name, {}).items():
+            if summary.best_sell is None:
+                continue
+            key = ItemKey.from_raw(type_id=type_id, item_name=self._type_names.get(type_id, ""))
+            records[key] = MarketSnapshotRecord(
+                key=key,
+                hub_name=hub_name,
+                sell_price=summary.best_sell,
+                buy_price=summary.best_buy or 0.0,
+                daily_volume=0.0,
+            )
+        return records
+
+    def snapshot_provider(self, hub_name: str) -> MarketSnapshotProvider:
+        """``MarketSnapshotProvider`` for one hub, e.g. for ``attach_market_snapshot_provider``."""
+        if hub_name not in MARKET_HUB_LOCATION_IDS:
+            raise ValueError(f"Unknown market hub '{hub_name}'.")
+        return _EsiHubSnapshotProvider(self, hub_name)
+
+    def refresh(
+        self,
+        hub_names: Sequence[str] | None = None,
+        *,
+        force: bool = False,
+    ) -> dict[str, dict[int, HubTypeSummary]]:
+        """Fetch the hubs that are due and write each through ``cache.save_market_snapshot``.
+
+        Hubs whose cached snapshot has not reached its upstream expiry are skipped
+        unless ``force`` is set. The remaining hubs are fetched as a single batch. If
+        the batch fails, each hub is retried on its own. Hubs that still fail, for
+        example structure-only hubs without a token, are skipped and their exception
+        is kept in ``errors``.
+        """
+        hubs = list(OUTPUT_MARKET_HUBS if hub_names is None else hub_names)
+        if self.cache is not None and not force:
+            hubs = self.cache.due_snapshots("market", hubs)
+        if not hubs:
+            return {}
+
+        token = self._token_for(hubs)
+        batch: list[str] = []
+        for hub_name in hubs:
+            try:
+                self._hub_books(hub_name, token)
+            except ValueError as exc:
+                self.errors[hub_name] = exc
+            else:
+                batch.append(hub_name)
+
+        fetched: dict[str, dict[int, HubTypeSummary]] = {}
+        try:
+            fetched = self._fetch_hubs(batch, token) if batch else {}
+        except Exception:
+            for hub_name in batch:
+                try:
+                    fetched.update(self._fetch_hubs([hub_name], token))
+                except Exception as exc:
+                    self.errors[hub_name] = exc
+        for hub_name in fetched:
+            self.errors.pop(hub_name, None)
+            if self.cache is not None:
+                self.cache.save_market_snapshot(
+                    hub_name,
+                    list(self._snapshot_records(hub_name).values()),
+                    expires_ts=self._expires.get(hub_name),
+                )
+        return fetched
+
+
+class _EsiHubSnapshotProvider(MarketSnapshotProvider):
+    """One hub of an ``EsiMarketPriceProvider`` as a cache snapshot provider.
+
+    Failures are recorded in the source's ``errors`` like ``refresh`` does and then
+    re-raised, so the cache keeps serving the last stored snapshot instead of
+    overwriting it with an empty one.
+    """
+
+    def __init__(self, source: EsiMarketPriceProvider, hub_name: str) -> None:
+        self.source = source
+        self.hub_name = hub_name
+
+    def get_market_snapshot_records(self) -> dict[ItemKey, MarketSnapshotRecord]:
+        try:
+            records = self.source.market_snapshot_records(self.hub_name)
+        except Exception as exc:
+            self.source.errors[self.hub_name] = exc
+            raise
+        self.source.errors.pop(self.hub_name, None)
+        return records
+
+    def snapshot_expires_ts(self) -> int | None:
+        return self.source.snapshot_expires_ts(self.hub_name)
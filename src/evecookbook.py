@@ -1,10 +1,16 @@
 from __future__ import annotations
 
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any
+from typing import TYPE_CHECKING, Any, Sequence
 from urllib.parse import quote
-from urllib.request import urlopen
+
+from .http_pool import HttpConnectionPool, freshness_expiry
+
+if TYPE_CHECKING:
+    from .cache import LocalSQLiteCache
 
 
 @dataclass(frozen=True)
@@ -17,13 +23,20 @@ class EveCookbookBlueprint:
 class EveCookbookClient:
     """Config-driven lightweight client for loading blueprint material data."""
 
-    def __init__(self, config: dict[str, Any]) -> None:
+    def __init__(self, config: dict[str, Any], *, response_cache: LocalSQLiteCache | None = None) -> None:
         self.enabled = bool(config.get("enabled", False))
         self.base_url = str(config.get("base_url", "")).rstrip("/")
         self.endpoint_template = str(
             config.get("blueprint_endpoint", "/api/blueprints/{blueprint_name}")
         )
         self.request_timeout_s = float(config.get("request_timeout_s", 15.0))
+        self.max_concurrency = max(int(config.get("max_concurrency", 8)), 1)
+        # Retries, rate limiting and the circuit breaker are configured in the same block.
+        self.pool = HttpConnectionPool.from_config(config, pool_size=self.max_concurrency, timeout_s=self.request_timeout_s)
+        # Why each blueprint was skipped by the last ``fetch_blueprints`` call.
+        self.errors: dict[str, Exception] = {}
+        # Reused across calls so worker threads (and their cache readers) are not recreated.
+        self._executor: ThreadPoolExecutor | None = None
 
         # Response mapping allows compatibility with different EVE Cookbook payloads.
         self.materials_field = str(config.get("materials_field", "materials"))
@@ -31,17 +44,101 @@ class EveCookbookClient:
         self.material_quantity_field = str(config.get("material_quantity_field", "quantity"))
         self.material_price_field = str(config.get("material_price_field", "adjusted_price"))
 
+        # Parsed responses are kept in ``response_cache`` and revalidated with ETag/Last-Modified.
+        self.response_cache = response_cache
+        self.offline = bool(config.get("offline", False))
+        self.cache_max_age_s = int(config.get("cache_max_age_s", 24 * 3600))
+
+        # Optional bulk endpoint: ``{blueprint_names}`` receives comma-separated, URL-quoted names.
+        self.bulk_endpoint_template = str(config.get("bulk_endpoint", ""))
+        self.bulk_chunk_size = max(int(config.get("bulk_chunk_size", 50)), 1)
+        self.bulk_results_field = str(config.get("bulk_results_field", "blueprints"))
+        self.bulk_name_field = str(config.get("bulk_name_field", "name"))
+
+    def close(self) -> None:
+        """Stop worker threads and close pooled keep-alive connections."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.pool.close()
+
     def fetch_blueprint(self, blueprint_name: str) -> EveCookbookBlueprint:
         if not self.enabled:
             raise ValueError("EVE Cookbook integration is disabled in config.")
         if not self.base_url:
             raise ValueError("evecookbook.base_url must be configured when enabled.")
 
-        endpoint = self.endpoint_template.format(blueprint_name=quote(blueprint_name, safe=""))
-        url = f"{self.base_url}{endpoint}"
-        with urlopen(url, timeout=self.request_timeout_s) as response:  # nosec B310 - config-driven URL required by feature
-            payload = json.loads(response.read().decode("utf-8"))
+        url = self._blueprint_url(blueprint_name)
+        if self.response_cache is None:
+            if self.offline:
+                raise ValueError("evecookbook.offline requires the local response cache.")
+            response = self.pool.request("GET", url, headers={"Accept": "application/json"})
+            response.raise_for_status()
+            return self._parse_blueprint(blueprint_name, url, json.loads(response.body.decode("utf-8")))
+
+        cache_key = self._cache_key(url)
+        now_ts = int(time.time())
+        cached = self.response_cache.get_http_response(cache_key)
+        if cached is not None and (self.offline or cached.expires_ts > now_ts):
+            return self._cached_blueprint(blueprint_name, cached.payload)
+        if self.offline:
+            raise ValueError(f"'{blueprint_name}' is not in the local cache and evecookbook.offline is set.")
 
+        headers = {"Accept": "application/json"}
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached is not None and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+        response = self.pool.request("GET", url, headers=headers)
+        expires_ts = freshness_expiry(response.headers, now_ts=now_ts, default_max_age_s=self.cache_max_age_s)
+        if cached is not None and response.status == 304:
+            self.response_cache.extend_http_response(cache_key, expires_ts=expires_ts)
+            return self._cached_blueprint(blueprint_name, cached.payload)
+
+        response.raise_for_status()
+        blueprint = self._parse_blueprint(blueprint_name, url, json.loads(response.body.decode("utf-8")))
+        self.response_cache.save_http_response(
+            cache_key,
+            {"materials": blueprint.materials, "material_prices": blueprint.material_prices},
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            expires_ts=expires_ts,
+            now_ts=now_ts,
+        )
+        return blueprint
+
+    def _blueprint_url(self, blueprint_name: str) -> str:
+        return f"{self.base_url}{self.endpoint_template.format(blueprint_name=quote(blueprint_name, safe=''))}"
+
+    def _cache_key(self, url: str) -> str:
+        # The response mapping is part of the key because the parsed result depends on it.
+        return "|".join(
+            [
+                url,
+                self.materials_field,
+                self.material_name_field,
+                self.material_quantity_field,
+                self.material_price_field,
+            ]
+        )
+
+    def _fresh_cached_blueprint(self, blueprint_name: str, now_ts: int) -> EveCookbookBlueprint | None:
+        if self.response_cache is None:
+            return None
+        cached = self.response_cache.get_http_response(self._cache_key(self._blueprint_url(blueprint_name)))
+        if cached is None or not (self.offline or cached.expires_ts > now_ts):
+            return None
+        return self._cached_blueprint(blueprint_name, cached.payload)
+
+    @staticmethod
+    def _cached_blueprint(blueprint_name: str, payload: dict[str, Any]) -> EveCookbookBlueprint:
+        return EveCookbookBlueprint(
+            name=blueprint_name,
+            materials=dict(payload["materials"]),
+            material_prices=dict(payload["material_prices"]),
+        )
+
+    def _parse_blueprint(self, blueprint_name: str, url: str, payload: dict[str, Any]) -> EveCookbookBlueprint:
         materials_raw = payload.get(self.materials_field, [])
         if not isinstance(materials_raw, list) or not materials_raw:
             raise ValueError(f"No materials found for '{blueprint_name}' from {url}.")
@@ -69,3 +166,94 @@ class EveCookbookClient:
             materials=materials,
             material_prices=material_prices,
         )
+
+    def fetch_blueprints(self, blueprint_names: Sequence[str]) -> list[EveCookbookBlueprint]:
+        """Fetch many blueprints with up to ``max_concurrency`` requests in flight.
+
+        Results keep the order of ``blueprint_names``; blueprints that fail to load
+        are skipped and their exceptions kept in ``errors``. With
+        ``bulk_endpoint`` configured, blueprints missing from the local cache are
+        requested ``bulk_chunk_size`` at a time, and only names a chunk did not
+        return fall back to single-blueprint requests.
+        """
+
+        errors: dict[str, Exception] = {}
+
+        def fetch_or_skip(blueprint_name: str) -> EveCookbookBlueprint | None:
+            try:
+                return self.fetch_blueprint(blueprint_name)
+            except Exception as exc:
+                errors[blueprint_name] = exc
+                return None
+
+        resolved: dict[str, EveCookbookBlueprint] = {}
+        pending = list(dict.fromkeys(blueprint_names))
+        if self.bulk_endpoint_template and self.enabled and self.base_url:
+            now_ts = int(time.time())
+            for blueprint_name in pending:
+                cached = self._fresh_cached_blueprint(blueprint_name, now_ts)
+                if cached is not None:
+                    resolved[blueprint_name] = cached
+            pending = [name for name in pending if name not in resolved]
+            if pending and not self.offline:
+                chunks = [pending[start : start + self.bulk_chunk_size] for start in range(0, len(pending), self.bulk_chunk_size)]
+                for fetched in self._map(self._fetch_bulk_chunk, chunks):
+                    resolved.update(fetched)
+                pending = [name for name in pending if name not in resolved]
+
+        for blueprint_name, blueprint in zip(pending, self._map(fetch_or_skip, pending)):
+            if blueprint is not None:
+                resolved[blueprint_name] = blueprint
+        self.errors = errors
+        return [resolved[name] for name in blueprint_names if name in resolved]
+
+    def _map(self, function: Any, items: Sequence[Any]) -> list[Any]:
+        """``map`` over ``items`` on up to ``max_concurrency`` threads, keeping order."""
+        if min(self.max_concurrency, len(items)) <= 1:
+            return [function(item) for item in items]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="evecookbook")
+        return list(self._executor.map(function, items))
+
+    def _fetch_bulk_chunk(self, blueprint_names: list[str]) -> dict[str, EveCookbookBlueprint]:
+        """One bulk request; returns the blueprints it resolved and never raises."""
+        names = ",".join(quote(name, safe="") for name in blueprint_names)
+        url = f"{self.base_url}{self.bulk_endpoint_template.format(blueprint_names=names)}"
+        now_ts = int(time.time())
+        try:
+            response = self.pool.request("GET", url, headers={"Accept": "application/json"})
+            response.raise_for_status()
+            payload = json.loads(response.body.decode("utf-8"))
+        except Exception:
+            return {}
+
+        entries = payload.get(self.bulk_results_field, []) if isinstance(payload, dict) else payload
+        if isinstance(entries, dict):
+            named_entries = list(entries.items())
+        elif isinstance(entries, list):
+            named_entries = [(entry.get(self.bulk_name_field), entry) for entry in entries if isinstance(entry, dict)]
+        else:
+            return {}
+
+        requested = set(blueprint_names)
+        expires_ts = freshness_expiry(response.headers, now_ts=now_ts, default_max_age_s=self.cache_max_age_s)
+        resolved: dict[str, EveCookbookBlueprint] = {}
+        for name, entry in named_entries:
+            if name not in requested or not isinstance(entry, dict):
+                continue
+            try:
+                blueprint = self._parse_blueprint(name, url, entry)
+            except (TypeError, ValueError, AttributeError):
+                continue
+            resolved[name] = blueprint
+            if self.response_cache is not None:
+                # Bulk responses carry no per-blueprint validators, only a freshness lifetime.
+                self.response_cache.save_http_response(
+                    self._cache_key(self._blueprint_url(name)),
+                    {"materials": blueprint.materials, "material_prices": blueprint.material_prices},
+                    etag=None,
+                    last_modified=None,
+                    expires_ts=expires_ts,
+                    now_ts=now_ts,
+                )
+        return resolved
@@ -0,0 +1,493 @@
+from __future__ import annotations
+
+import http.client
+import io
+import itertools
+import random
+import re
+import ssl
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, BinaryIO, Iterator, Mapping
+from urllib.parse import urlsplit
+
+
+class HttpError(Exception):
+    """Non-2xx response from an upstream HTTP API."""
+
+    def __init__(self, status: int, url: str) -> None:
+        super().__init__(f"HTTP {status} from {url}")
+        self.status = status
+        self.url = url
+
+
+class CircuitOpenError(Exception):
+    """Requests to a host are refused while its circuit breaker is open."""
+
+    def __init__(self, url: str, retry_in_s: float) -> None:
+        super().__init__(f"Circuit open for {url}; retry in {retry_in_s:.1f}s")
+        self.url = url
+        self.retry_in_s = retry_in_s
+
+
+@dataclass(frozen=True)
+class HttpResponse:
+    status: int
+    url: str
+    body: bytes
+    # Header names are lower-cased.
+    headers: Mapping[str, str] = field(default_factory=dict)
+
+    def raise_for_status(self) -> None:
+        if not 200 <= self.status < 300:
+            raise HttpError(self.status, self.url)
+
+
+@dataclass(frozen=True)
+class HttpStreamResponse:
+    """Response whose ``body`` is read incrementally from the connection."""
+
+    status: int
+    url: str
+    body: BinaryIO
+    # Header names are lower-cased.
+    headers: Mapping[str, str] = field(default_factory=dict)
+
+    def raise_for_status(self) -> None:
+        if not 200 <= self.status < 300:
+            raise HttpError(self.status, self.url)
+
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*(?:s-)?max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+def freshness_expiry(headers: Mapping[str, str], *, now_ts: int, default_max_age_s: int) -> int:
+    """Unix time until which a response stays fresh, per ``Cache-Control``/``Expires``.
+
+    ``no-cache``/``no-store`` make it stale immediately; without either header, or
+    with an unparseable ``Expires``, the response is fresh for ``default_max_age_s``.
+    A malformed ``Age`` is ignored and an ``Expires`` without a zone is read as UTC.
+    """
+    cache_control = headers.get("cache-control", "")
+    if re.search(r"no-cache|no-store", cache_control, re.IGNORECASE):
+        return now_ts
+    match = _MAX_AGE.search(cache_control)
+    if match:
+        return now_ts + int(match.group(1)) - max(_header_int(headers, "age") or 0, 0)
+    expires = headers.get("expires")
+    if expires:
+        try:
+            expires_at = parsedate_to_datetime(expires)
+        except (TypeError, ValueError, IndexError):
+            return now_ts + default_max_age_s
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return int(expires_at.timestamp())
+    return now_ts + default_max_age_s
+
+
+# A reused keep-alive connection may have been closed by the server while idle.
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+# Refused connections, timeouts and truncated responses are worth another attempt.
+_TRANSIENT_ERRORS = (OSError, http.client.HTTPException)
+# A certificate that failed verification fails the same way on every attempt.
+_PERMANENT_ERRORS = (ssl.SSLCertVerificationError,)
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Full-jitter exponential backoff for transient failures.
+
+    Attempt ``n`` (from 0) waits a random time up to ``backoff_base_s * 2**n``,
+    capped at ``backoff_max_s``; a ``Retry-After`` header takes precedence, up
+    to ``retry_after_max_s``. ESI answers 420 once a client exhausts its error limit.
+    """
+
+    max_retries: int = 3
+    backoff_base_s: float = 0.5
+    backoff_max_s: float = 8.0
+    retry_after_max_s: float = 60.0
+    retry_statuses: frozenset[int] = frozenset({420, 429, 500, 502, 503, 504})
+
+    def delay(self, attempt: int, retry_after_s: float | None = None) -> float:
+        if retry_after_s is not None:
+            return min(max(retry_after_s, 0.0), self.retry_after_max_s)
+        return random.uniform(0.0, min(self.backoff_max_s, self.backoff_base_s * 2**attempt))
+
+
+def _retry_after(headers: Mapping[str, str]) -> float | None:
+    try:
+        return float(headers["retry-after"])
+    except (KeyError, ValueError):
+        # HTTP-date values are rare enough upstream to fall back to backoff.
+        return None
+
+
+class TokenBucket:
+    """Rate limiter allowing ``rate_per_s`` requests on average and bursts of ``burst``."""
+
+    def __init__(self, rate_per_s: float, burst: int) -> None:
+        self.rate_per_s = float(rate_per_s)
+        self.burst = max(int(burst), 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take one token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_s)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait_s = (1.0 - self._tokens) / self.rate_per_s
+            time.sleep(wait_s)
+
+
+class CircuitBreaker:
+    """Per-host breaker driven by ESI's error-limit headers and consecutive failures.
+
+    When ``X-ESI-Error-Limit-Remain`` drops to ``error_limit_floor`` (or the host
+    answers 420), new requests wait out ``X-ESI-Error-Limit-Reset`` instead of
+    spending the rest of the budget. After ``failure_threshold`` consecutive
+    server errors or connection failures the circuit opens and requests fail fast
+    with ``CircuitOpenError`` for ``cooldown_s``. After that a failing request
+    reopens it straight away, while one success closes it again.
+    """
+
+    def __init__(self, *, failure_threshold: int = 5, cooldown_s: float = 30.0, error_limit_floor: int = 10) -> None:
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.cooldown_s = float(cooldown_s)
+        self.error_limit_floor = int(error_limit_floor)
+        self.failures = 0
+        self.open_until = 0.0
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def before_request(self, url: str) -> None:
+        """Fail fast while open; sleep while the upstream error budget recovers."""
+        with self._lock:
+            now = time.monotonic()
+            if self.open_until > now:
+                raise CircuitOpenError(url, self.open_until - now)
+            pause_s = self.paused_until - now
+        if pause_s > 0:
+            time.sleep(pause_s)
+
+    def record(self, status: int | None, headers: Mapping[str, str]) -> None:
+        """Account for one response, or a connection failure when ``status`` is ``None``."""
+        with self._lock:
+            now = time.monotonic()
+            reset_s = _header_int(headers, "x-esi-error-limit-reset")
+            remain = _header_int(headers, "x-esi-error-limit-remain")
+            if status == 420 or (remain is not None and remain <= self.error_limit_floor):
+                pause_s = self.cooldown_s if reset_s is None else reset_s
+                self.paused_until = max(self.paused_until, now + pause_s)
+            if status is None or status >= 500:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self.open_until = now + self.cooldown_s
+                    # Half-open after the cooldown: a single further failure reopens it.
+                    self.failures = self.failure_threshold - 1
+            else:
+                self.failures = 0
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> int | None:
+    try:
+        return int(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+class _HostPool:
+    def __init__(self, max_connections: int, breaker: CircuitBreaker, bucket: TokenBucket | None) -> None:
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.idle: deque[tuple[http.client.HTTPConnection, float]] = deque()
+        self.lock = threading.Lock()
+        self.breaker = breaker
+        self.bucket = bucket
+
+
+class HttpConnectionPool:
+    """Thread-safe pool of persistent HTTP/1.1 connections, one bounded pool per host.
+
+    At most ``max_connections_per_host`` requests to a host are in flight at once;
+    further callers wait for a free connection. Idle connections are reused until
+    they have been unused for ``idle_timeout_s``.
+
+    Each host also gets a ``CircuitBreaker`` and, with ``rate_limit_per_s`` set, a
+    ``TokenBucket``. Transient failures are retried per ``retry_policy``;
+    requests with non-idempotent methods only when the caller passes ``retry=True``.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_connections_per_host: int = 8,
+        idle_timeout_s: float = 30.0,
+        timeout_s: float = 15.0,
+        retry_policy: RetryPolicy | None = None,
+        rate_limit_per_s: float | None = None,
+        rate_limit_burst: int | None = None,
+        breaker_failure_threshold: int = 5,
+        breaker_cooldown_s: float = 30.0,
+        error_limit_floor: int = 10,
+    ) -> None:
+        self.max_connections_per_host = max(int(max_connections_per_host), 1)
+        self.idle_timeout_s = float(idle_timeout_s)
+        self.timeout_s = float(timeout_s)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limit_per_s = float(rate_limit_per_s) if rate_limit_per_s else None
+        self.rate_limit_burst = int(rate_limit_burst or self.max_connections_per_host)
+        self.breaker_failure_threshold = int(breaker_failure_threshold)
+        self.breaker_cooldown_s = float(breaker_cooldown_s)
+        self.error_limit_floor = int(error_limit_floor)
+        self.connections_opened = 0
+        self._hosts: dict[tuple[str, str, int], _HostPool] = {}
+        self._lock = threading.Lock()
+        self._ssl_context: ssl.SSLContext | None = None
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Mapping[str, Any],
+        *,
+        pool_size: int,
+        timeout_s: float,
+        rate_limit_per_s: float | None = None,
+    ) -> "HttpConnectionPool":
+        """Pool for a client config block; ``pool_size`` and ``rate_limit_per_s`` are defaults."""
+        rate = config.get("rate_limit_per_s", rate_limit_per_s)
+        return cls(
+            max_connections_per_host=int(config.get("pool_size", pool_size)),
+            idle_timeout_s=float(config.get("pool_idle_timeout_s", 30.0)),
+            timeout_s=timeout_s,
+            retry_policy=RetryPolicy(
+                max_retries=max(int(config.get("max_retries", 3)), 0),
+                backoff_base_s=float(config.get("backoff_base_s", 0.5)),
+                backoff_max_s=float(config.get("backoff_max_s", 8.0)),
+                retry_after_max_s=float(config.get("retry_after_max_s", 60.0)),
+            ),
+            rate_limit_per_s=None if rate is None else float(rate),
+            rate_limit_burst=config.get("rate_limit_burst"),
+            breaker_failure_threshold=int(config.get("breaker_failure_threshold", 5)),
+            breaker_cooldown_s=float(config.get("breaker_cooldown_s", 30.0)),
+            error_limit_floor=int(config.get("error_limit_floor", 10)),
+        )
+
+    def __enter__(self) -> "HttpConnectionPool":
+        return self
+
+    def __exit__(self, exc_type: object, exc: object, tb: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            hosts, self._hosts = list(self._hosts.values()), {}
+        for host in hosts:
+            with host.lock:
+                while host.idle:
+                    host.idle.popleft()[0].close()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Mapping[str, str] | None = None,
+        body: bytes | None = None,
+        timeout_s: float | None = None,
+        retry: bool | None = None,
+    ) -> HttpResponse:
+        """Send one request on a pooled connection and read the whole response body.
+
+        The body is read inside the retry loop, so a truncated body or a timeout
+        while reading it is retried like a failed connection.
+        """
+        with self._exchange(method, url, headers, body, timeout_s, retry, buffered=True) as response:
+            data = response.body.read()
+        return HttpResponse(status=response.status, url=url, body=data, headers=response.headers)
+
+    @contextmanager
+    def stream(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Mapping[str, str] | None = None,
+        body: bytes | None = None,
+        timeout_s: float | None = None,
+        retry: bool | None = None,
+    ) -> Iterator[HttpStreamResponse]:
+        """Send one request and yield the response with an unread, file-like body.
+
+        The connection goes back to the pool only if the body was read to the end;
+        leaving the block early closes it instead. Retries happen before anything
+        is yielded; ``retry`` defaults to whether ``method`` is idempotent. A body
+        that fails mid-read is not retried, but counts toward the circuit breaker.
+        """
+        with self._exchange(method, url, headers, body, timeout_s, retry, buffered=False) as response:
+            yield response
+
+    @contextmanager
+    def _exchange(
+        self,
+        method: str,
+        url: str,
+        headers: Mapping[str, str] | None,
+        body: bytes | None,
+        timeout_s: float | None,
+        retry: bool | None,
+        *,
+        buffered: bool,
+    ) -> Iterator[HttpStreamResponse]:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported URL: {url}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        timeout = self.timeout_s if timeout_s is None else float(timeout_s)
+        if retry is None:
+            retry = method.upper() in _IDEMPOTENT_METHODS
+        retries = self.retry_policy.max_retries if retry else 0
+
+        host = self._host(key)
+        for attempt in itertools.count():
+            host.breaker.before_request(url)
+            if host.bucket is not None:
+                host.bucket.acquire()
+            with host.slots:
+                conn, reused = self._checkout(host, key, timeout)
+                try:
+                    try:
+                        raw = self._send(conn, method, target, headers, body)
+                    except _STALE_CONNECTION_ERRORS:
+                        if not reused:
+                            raise
+                        conn.close()
+                        conn, reused = self._open(key, timeout), False
+                        raw = self._send(conn, method, target, headers, body)
+                    response_body: BinaryIO = io.BytesIO(raw.read()) if buffered else raw
+                except _PERMANENT_ERRORS:
+                    conn.close()
+                    raise
+                except _TRANSIENT_ERRORS:
+                    conn.close()
+                    host.breaker.record(None, {})
+                    if attempt >= retries:
+                        raise
+                    delay_s = self.retry_policy.delay(attempt)
+                except BaseException:
+                    conn.close()
+                    raise
+                else:
+                    response_headers = {name.lower(): value for name, value in raw.getheaders()}
+                    if attempt < retries and raw.status in self.retry_policy.retry_statuses:
+                        host.breaker.record(raw.status, response_headers)
+                        try:
+                            raw.read()
+                        except BaseException:
+                            conn.close()
+                            raise
+                        self._release(host, conn, raw)
+                        delay_s = self.retry_policy.delay(attempt, _retry_after(response_headers))
+                    else:
+                        try:
+                            yield HttpStreamResponse(
+                                status=raw.status, url=url, body=response_body, headers=response_headers
+                            )
+                        except _TRANSIENT_ERRORS:
+                            # A body that broke off mid-read counts as a failed request.
+                            conn.close()
+                            host.breaker.record(None, response_headers)
+                            raise
+                        except BaseException:
+                            conn.close()
+                            host.breaker.record(raw.status, response_headers)
+                            raise
+                        host.breaker.record(raw.status, response_headers)
+                        self._release(host, conn, raw)
+                        return
+            time.sleep(delay_s)
+
+    @staticmethod
+    def _release(host: _HostPool, conn: http.client.HTTPConnection, raw: http.client.HTTPResponse) -> None:
+        # http.client marks a response closed once its body has been fully read.
+        if raw.will_close or not raw.isclosed():
+            conn.close()
+        else:
+            with host.lock:
+                host.idle.append((conn, time.monotonic()))
+
+    def _host(self, key: tuple[str, str, int]) -> _HostPool:
+        with self._lock:
+            host = self._hosts.get(key)
+            if host is None:
+                breaker = CircuitBreaker(
+                    failure_threshold=self.breaker_failure_threshold,
+                    cooldown_s=self.breaker_cooldown_s,
+                    error_limit_floor=self.error_limit_floor,
+                )
+                bucket = None if self.rate_limit_per_s is None else TokenBucket(self.rate_limit_per_s, self.rate_limit_burst)
+                host = self._hosts[key] = _HostPool(self.max_connections_per_host, breaker, bucket)
+            return host
+
+    def _checkout(
+        self,
+        host: _HostPool,
+        key: tuple[str, str, int],
+        timeout: float,
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        expired: list[http.client.HTTPConnection] = []
+        conn: http.client.HTTPConnection | None = None
+        with host.lock:
+            now = time.monotonic()
+            while host.idle:
+                candidate, last_used = host.idle.pop()
+                if now - last_used <= self.idle_timeout_s:
+                    conn = candidate
+                    break
+                expired.append(candidate)
+            # Anything older than the connection we took has expired as well.
+            while host.idle and now - host.idle[0][1] > self.idle_timeout_s:
+                expired.append(host.idle.popleft()[0])
+        for stale in expired:
+            stale.close()
+        if conn is None:
+            return self._open(key, timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _open(self, key: tuple[str, str, int], timeout: float) -> http.client.HTTPConnection:
+        scheme, hostname, port = key
+        with self._lock:
+            self.connections_opened += 1
+            if scheme == "https" and self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+        if scheme == "https":
+            return http.client.HTTPSConnection(hostname, port, timeout=timeout, context=self._ssl_context)
+        return http.client.HTTPConnection(hostname, port, timeout=timeout)
+
+    @staticmethod
+    def _send(
+        conn: http.client.HTTPConnection,
+        method: str,
+        target: str,
+        headers: Mapping[str, str] | None,
+        body: bytes | None,
+    ) -> http.client.HTTPResponse:
+        conn.request(method, target, body=body, headers=dict(headers or {}))
+        return conn.getresponse()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import codecs
+import json
+from typing import Any, BinaryIO, Iterator
+
+_WHITESPACE = " \t\n\r"
+_DECODER = json.JSONDecoder()
+
+# Parser states while walking the top-level array.
+_START, _FIRST_VALUE, _VALUE, _SEPARATOR = range(4)
+
+
+def iter_json_array(stream: BinaryIO, *, chunk_size: int = 64 * 1024) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array read incrementally from ``stream``.
+
+    Only the unparsed tail of the current chunk and the element being decoded are
+    held in memory, so peak usage does not grow with the size of the array.
+    """
+    decode = codecs.getincrementaldecoder("utf-8")().decode
+    buffer = ""
+    pos = 0
+    eof = False
+    state = _START
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of JSON array.")
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + decode(chunk, final=eof), 0
+            continue
+
+        char = buffer[pos]
+        if state == _START:
+            if char != "[":
+                raise ValueError("Expected a JSON array.")
+            pos += 1
+            state = _FIRST_VALUE
+            continue
+        if state == _SEPARATOR or (state == _FIRST_VALUE and char == "]"):
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' in JSON array, found {char!r}.")
+            pos += 1
+            state = _VALUE
+            continue
+
+        try:
+            value, end = _DECODER.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            end = -1
+        # A number cut at the chunk edge ("1500" of "1500.25") still decodes, so a value
+        # only counts once the next non-blank character is already buffered.
+        lookahead = end
+        while 0 <= lookahead < len(buffer) and buffer[lookahead] in _WHITESPACE:
+            lookahead += 1
+        if end == -1 or (not eof and (lookahead == len(buffer) or buffer[lookahead] not in ",]")):
+            if eof:
+                raise ValueError("Malformed element in JSON array.")
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + decode(chunk, final=eof), 0
+            continue
+        yield value
+        pos = end
+        state = _SEPARATOR
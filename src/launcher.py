@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import multiprocessing
 import sys
 from pathlib import Path
 from tkinter import Button, Label, StringVar, Tk
@@ -9,8 +10,12 @@ if __package__ in (None, ""):
     sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from src.auth import EveSsoClient
+from src.configuration import OUTPUT_MARKET_HUBS
 from src.engine import CalculatorEngine
+from src.esi_character import EsiCharacterStateFetcher
+from src.esi_market import EsiMarketPriceProvider
 from src.live_pricing import ConfigJitaLivePriceProvider
+from src.providers import LivePriceProvider
 
 
 def bundled_path(file_name: str) -> Path:
@@ -27,7 +32,6 @@ class LauncherApp:
         self.connection_state = StringVar(value="Reconnect")
 
         self.engine = CalculatorEngine(bundled_path("app_config.json"))
-        self.live_pricing = ConfigJitaLivePriceProvider(self.engine.config)
 
         esi_cfg = self.engine.config["esi"]
         self.sso = EveSsoClient(
@@ -36,6 +40,24 @@ class LauncherApp:
             scopes=esi_cfg["scopes"],
             token_store_path=Path.home() / ".builder_lightweight" / "sso_token.json",
         )
+
+        self.live_pricing: LivePriceProvider = ConfigJitaLivePriceProvider(self.engine.config)
+        self.esi_market: EsiMarketPriceProvider | None = None
+        esi_market_cfg = self.engine.config.get("esi_market", {})
+        if esi_market_cfg.get("enabled", False):
+            self.esi_market = EsiMarketPriceProvider(
+                esi_market_cfg,
+                cache=self.engine.cache,
+                access_token=self._structure_market_token,
+            )
+            for hub_name in OUTPUT_MARKET_HUBS:
+                self.engine.attach_market_snapshot_provider(hub_name, self.esi_market.snapshot_provider(hub_name))
+            self.live_pricing = self.esi_market
+
+        self.character_state: EsiCharacterStateFetcher | None = None
+        esi_character_cfg = self.engine.config.get("esi_character", {})
+        if esi_character_cfg.get("enabled", False):
+            self.character_state = EsiCharacterStateFetcher(esi_character_cfg, cache=self.engine.cache)
         self.connection_state.set(self.sso.connection_label())
 
         Label(root, text="Builder Lightweight", font=("Segoe UI", 14, "bold")).pack(pady=(12, 8))
@@ -46,6 +68,39 @@ class LauncherApp:
 
         Label(root, textvariable=self.status).pack(pady=(10, 12))
 
+    def close(self) -> None:
+        """Close the HTTP clients and the engine's cache."""
+        if self.esi_market is not None:
+            self.esi_market.close()
+        if self.character_state is not None:
+            self.character_state.close()
+        self.sso.close()
+        self.engine.close()
+
+    def _structure_market_token(self) -> str:
+        # Structure markets are skipped, not failed, while signed out.
+        try:
+            return self.sso.ensure_access_token()
+        except Exception:
+            return ""
+
+    def _attach_character_state(self, access_token: str) -> bool:
+        """Attach the character's assets and orders; ``False`` when ESI could not supply them."""
+        if self.character_state is None:
+            self._attach_character_state_from_config(access_token)
+            return True
+        try:
+            state = self.character_state.fetch(access_token)
+        except Exception:
+            # An ESI outage is not a sign-in failure; the last attached state stays in use.
+            return False
+        self.engine.attach_character_state(
+            oauth_token=access_token,
+            asset_rows=state.asset_rows,
+            order_rows=state.order_rows,
+        )
+        return True
+
     def _attach_character_state_from_config(self, access_token: str) -> None:
         overrides = self.engine.config.get("character_state_overrides", {})
         self.engine.attach_character_state(
@@ -65,27 +120,35 @@ class LauncherApp:
         self.root.update_idletasks()
         try:
             auth = self.sso.login()
-            self._attach_character_state_from_config(auth.access_token)
-            self.connection_state.set("Connected")
-            self.status.set("Connected")
         except Exception:
             self.connection_state.set("Reconnect")
             self.status.set("Reconnect required")
             messagebox.showerror("Sign-in failed", "Unable to connect. Please try reconnecting.")
+            return
+
+        self.connection_state.set("Connected")
+        if self._attach_character_state(auth.access_token):
+            self.status.set("Connected")
+        else:
+            self.status.set("Connected (character assets and orders unavailable)")
 
     def refresh_data(self) -> None:
         try:
             access_token = self.sso.ensure_access_token()
-            self._attach_character_state_from_config(access_token)
-            self.connection_state.set("Connected")
         except Exception:
             self.connection_state.set("Reconnect")
             self.status.set("Reconnect required")
             return
 
+        self.connection_state.set("Connected")
+        character_attached = self._attach_character_state(access_token)
+        if self.esi_market is not None:
+            # One batch for every hub past its ESI expiry; fresh hubs cost no requests.
+            self.esi_market.refresh()
         results = self.engine.refresh_data()
         total = sum(item.total_cost for item in results)
-        self.status.set(f"Refreshed {len(results)} blueprints. Total: {total:,.2f} ISK")
+        status = f"Refreshed {len(results)} blueprints. Total: {total:,.2f} ISK"
+        self.status.set(status if character_attached else f"{status} (character assets and orders unavailable)")
 
     def export_csv(self) -> None:
         target = filedialog.asksaveasfilename(
@@ -96,15 +159,25 @@ class LauncherApp:
         if not target:
             return
         path = self.engine.export_csv(Path(target), live_price_provider=self.live_pricing)
-        self.status.set(f"Exported CSV to {path}")
+        skipped = sorted(self.engine.snapshot_errors)
+        if skipped:
+            # Those hubs were exported from stored snapshots or the config overrides.
+            self.status.set(f"Exported CSV to {path} (no live data for {', '.join(skipped)})")
+        else:
+            self.status.set(f"Exported CSV to {path}")
         messagebox.showinfo("Export complete", f"Saved to:\n{path}")
 
 
 def main() -> None:
+    # Required so frozen Windows builds can spawn parallel refresh workers.
+    multiprocessing.freeze_support()
     root = Tk()
     root.geometry("380x230")
-    LauncherApp(root)
-    root.mainloop()
+    app = LauncherApp(root)
+    try:
+        root.mainloop()
+    finally:
+        app.close()
 
 
 if __name__ == "__main__":
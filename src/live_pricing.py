@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import Any
 
-from .engine import LivePriceProvider
+from .providers import LivePriceProvider
 
 
 class ConfigJitaLivePriceProvider(LivePriceProvider):
@@ -35,6 +35,8 @@ class CharacterStateRecord:
     key: ItemKey
     asset_quantity: int
     open_order_quantity: int
+    # Station or structure holding the items; 0 when quantities are summed over all locations.
+    location_id: int = 0
 
 
 @dataclass(frozen=True)
@@ -82,6 +84,13 @@ class MarketSnapshotProvider(Protocol):
         ...
 
 
+class LivePriceProvider:
+    """Protocol-like base class for optional live pricing integrations."""
+
+    def get_sell_price(self, item_name: str) -> float | None:
+        return None
+
+
 class EveCookbookCostAdapter(CostProvider):
     def __init__(self, cookbook_rows: Iterable[Mapping[str, Any]]) -> None:
         self.cookbook_rows = cookbook_rows
@@ -0,0 +1,86 @@
+"""Local stand-in HTTP/1.1 server for client tests."""
+
+import json
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+
+@dataclass(frozen=True)
+class StubRequest:
+    method: str
+    path: str
+    headers: dict[str, str]
+    body: bytes
+    client_port: int
+
+
+StubResponse = tuple[int, dict[str, str], bytes]
+
+
+def json_response(payload: Any, *, status: int = 200, headers: dict[str, str] | None = None) -> StubResponse:
+    return status, {"Content-Type": "application/json", **(headers or {})}, json.dumps(payload).encode("utf-8")
+
+
+class StubHttpServer:
+    """Serves ``handler(request)`` on 127.0.0.1 with keep-alive enabled."""
+
+    def __init__(self, handler: Callable[[StubRequest], StubResponse]) -> None:
+        self.handler = handler
+        self.requests: list[StubRequest] = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                request = StubRequest(
+                    method=self.command,
+                    path=self.path,
+                    headers={name.lower(): value for name, value in self.headers.items()},
+                    body=self.rfile.read(length) if length else b"",
+                    client_port=self.client_address[1],
+                )
+                with stub._lock:
+                    stub.requests.append(request)
+                status, headers, body = stub.handler(request)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if "Content-Length" not in headers:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                # A declared length that overstates the body simulates a dropped transfer.
+                self.close_connection = int(headers.get("Content-Length", len(body))) != len(body)
+
+            do_GET = _serve
+            do_POST = _serve
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def connections(self) -> set[int]:
+        with self._lock:
+            return {request.client_port for request in self.requests}
+
+    def __enter__(self) -> "StubHttpServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -1,11 +1,16 @@
 import json
 import sqlite3
 import sys
+import threading
+import time
+from dataclasses import replace
 from pathlib import Path
 
+import pytest
+
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from src.cache import LocalSQLiteCache
+from src.cache import LocalSQLiteCache, MemoryTieredCache, _encode_build_cost
 from src.engine import CalculatorEngine
 from src.providers import CharacterStateRecord, ItemKey, MarketSnapshotRecord
 
@@ -81,3 +86,457 @@ def test_engine_recomputes_only_dirty_blueprint_configs(tmp_path: Path) -> None:
     assert third[0].total_cost == second[0].total_cost
     assert third[1].total_cost != second[1].total_cost
     conn.close()
+
+
+def test_cache_reuses_connections_in_wal_mode_and_readers_do_not_block_writer(tmp_path: Path) -> None:
+    with LocalSQLiteCache(tmp_path / "cache.sqlite3") as cache:
+        assert cache._writer.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+        for index in range(50):
+            cache.save_build_cost(f"hash-{index}", cost={"name": "Rifter", "total_cost": float(index)})
+            assert cache.get_build_cost(f"hash-{index}") == {"name": "Rifter", "total_cost": float(index)}
+        assert len(cache._connections) == 2
+
+        reads: list[dict | None] = []
+        with cache._write() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO build_cost_cache (config_hash, computed_ts, payload) VALUES (?, ?, ?)",
+                ("hash-0", 1, _encode_build_cost({"name": "Rifter", "total_cost": -1.0})),
+            )
+            reader = threading.Thread(target=lambda: reads.append(cache.get_build_cost("hash-0")))
+            reader.start()
+            reader.join(timeout=2)
+            assert not reader.is_alive()
+
+        # The concurrent reader saw the last committed value instead of waiting on the open write.
+        assert reads == [{"name": "Rifter", "total_cost": 0.0}]
+        assert cache.get_build_cost("hash-0") == {"name": "Rifter", "total_cost": -1.0}
+
+
+def test_bulk_build_cost_get_and_save_round_trip(tmp_path: Path) -> None:
+    with LocalSQLiteCache(tmp_path / "cache.sqlite3") as cache:
+        costs = {f"hash-{index}": {"name": f"bp-{index}", "total_cost": index * 1.5} for index in range(1200)}
+        cache.save_build_costs(costs, now_ts=1_000)
+
+        hits = cache.get_build_costs([*costs, "missing-hash"])
+        assert hits == costs
+        assert cache.get_build_costs([]) == {}
+        assert cache.get_build_cost("hash-7") == costs["hash-7"]
+
+
+def test_engine_refresh_uses_bulk_cache_calls(tmp_path: Path, monkeypatch) -> None:
+    config_path = tmp_path / "config.json"
+    config_path.write_text(
+        json.dumps(
+            {
+                "defaults": {"me": 10, "te": 20, "tax_rate": 0.08},
+                "blueprints": [
+                    {"name": "Rifter", "materials": {"Tritanium": 100}},
+                    {"name": "Merlin", "materials": {"Tritanium": 80}},
+                ],
+                "price_overrides": {"Tritanium": 5},
+            }
+        ),
+        encoding="utf-8",
+    )
+    engine = CalculatorEngine(config_path)
+    calls: list[str] = []
+
+    def record(name: str):
+        original = getattr(engine.cache, name)
+
+        def wrapper(*args, **kwargs):
+            calls.append(name)
+            return original(*args, **kwargs)
+
+        return wrapper
+
+    for name in ("get_build_cost", "save_build_cost", "get_build_costs", "save_build_costs"):
+        monkeypatch.setattr(engine.cache, name, record(name))
+
+    first = engine.refresh_data()
+    second = engine.refresh_data()
+
+    assert first == second
+    assert calls == ["get_build_costs", "save_build_costs", "get_build_costs", "save_build_costs"]
+
+
+def test_prune_applies_snapshot_retention_and_build_cost_lru(tmp_path: Path) -> None:
+    cache = LocalSQLiteCache(
+        tmp_path / "cache.sqlite3",
+        market_snapshots_to_keep=3,
+        character_snapshots_to_keep=2,
+        snapshot_max_age_seconds=10_000,
+        build_cost_max_entries=2,
+        build_cost_max_age_seconds=5_000,
+        maintenance_interval_seconds=None,
+        market_keyframe_interval=2,
+    )
+    for snapshot_ts in (1_000, 2_000, 3_000, 4_000, 5_000):
+        record = MarketSnapshotRecord(
+            key=ItemKey(type_id=34, item_name="tritanium"),
+            hub_name="Jita",
+            sell_price=snapshot_ts / 1000,
+            buy_price=4.1,
+            daily_volume=1000,
+        )
+        cache.save_market_snapshot("Jita", [record], now_ts=snapshot_ts)
+        cache.save_market_snapshot("Amarr", [record], now_ts=snapshot_ts)
+        cache.save_character_snapshot(
+            [CharacterStateRecord(key=ItemKey(type_id=34, item_name="tritanium"), asset_quantity=1, open_order_quantity=0)],
+            now_ts=snapshot_ts,
+        )
+    cache.save_build_cost("old", cost={"name": "a"}, now_ts=1_000)
+    cache.save_build_cost("warm", cost={"name": "b"}, now_ts=8_000)
+    cache.save_build_cost("hot", cost={"name": "c"}, now_ts=9_000)
+    cache.save_build_cost("newest", cost={"name": "d"}, now_ts=9_500)
+    assert cache.get_build_costs(["warm"]) == {"warm": {"name": "b"}}
+
+    removed = cache.run_maintenance(now_ts=12_500)
+
+    assert removed["market_snapshots"] == 4
+    assert removed["character_assets_snapshots"] == 3
+    assert removed["build_cost_cache"] == 2
+    conn = sqlite3.connect(tmp_path / "cache.sqlite3")
+    jita_ts = [row[0] for row in conn.execute("SELECT DISTINCT snapshot_ts FROM market_snapshots WHERE hub_name = 'Jita' ORDER BY 1")]
+    assert jita_ts == [3_000, 4_000, 5_000]
+    assert sorted(row[0] for row in conn.execute("SELECT config_hash FROM build_cost_cache")) == ["newest", "warm"]
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    conn.close()
+    assert cache.get_market_snapshot("Jita", now_ts=5_100) is not None
+    cache.close()
+
+
+def test_latest_snapshot_lookup_uses_catalog_and_ignores_uncommitted_rows(tmp_path: Path) -> None:
+    cache = LocalSQLiteCache(tmp_path / "cache.sqlite3", maintenance_interval_seconds=None)
+    key = ItemKey(type_id=34, item_name="tritanium")
+    cache.save_market_snapshot(
+        "Jita", [MarketSnapshotRecord(key=key, hub_name="Jita", sell_price=4.2, buy_price=4.1, daily_volume=10)], now_ts=1_000
+    )
+    cache.save_character_snapshot([CharacterStateRecord(key=key, asset_quantity=5, open_order_quantity=1)], now_ts=1_000, character_id=7)
+    cache.save_character_snapshot([CharacterStateRecord(key=key, asset_quantity=9, open_order_quantity=0)], now_ts=1_010, character_id=8)
+
+    # Rows for a newer snapshot that never got published in the catalog must not be served.
+    conn = sqlite3.connect(tmp_path / "cache.sqlite3")
+    conn.execute(
+        "INSERT INTO market_snapshots "
+        "SELECT 'Jita', 1100, 34, item_id, 99.0, 98.0, 1.0, 0 FROM item_names WHERE item_name = 'tritanium'"
+    )
+    conn.execute("INSERT INTO market_snapshot_index VALUES ('Jita', 1100, 1100)")
+    conn.commit()
+
+    assert cache.get_market_snapshot("Jita", now_ts=1_200)[0]["sell_price"] == 4.2
+    assert cache.get_character_snapshot(now_ts=1_020, character_id=7)["assets"][0]["quantity"] == 5
+    assert cache.get_character_snapshot(now_ts=1_020, character_id=8)["assets"][0]["quantity"] == 9
+    assert cache.get_character_snapshot(now_ts=1_020) is None
+
+    plan = " ".join(
+        row[3]
+        for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT m.type_id, n.item_name, m.sell_price, m.buy_price, m.daily_volume "
+            "FROM market_snapshots AS m JOIN item_names AS n ON n.item_id = m.item_id "
+            "WHERE m.hub_name = 'Jita' AND m.snapshot_ts = 1000"
+        )
+    )
+    assert "USING INDEX sqlite_autoindex_market_snapshots_1 (hub_name=? AND snapshot_ts=?)" in plan
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE tbl_name = 'market_snapshots'")}
+    assert "market_snapshots_covering" not in indexes
+    conn.close()
+    cache.close()
+
+
+def test_cache_upgrades_pre_catalog_databases(tmp_path: Path) -> None:
+    db_path = tmp_path / "cache.sqlite3"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        """
+        CREATE TABLE market_snapshots (
+            hub_name TEXT NOT NULL, snapshot_ts INTEGER NOT NULL, type_id INTEGER, item_name TEXT NOT NULL,
+            sell_price REAL NOT NULL, buy_price REAL NOT NULL, daily_volume REAL NOT NULL,
+            PRIMARY KEY (hub_name, snapshot_ts, type_id, item_name)
+        )
+        """
+    )
+    conn.execute("CREATE TABLE character_assets_snapshots (snapshot_ts INTEGER NOT NULL, type_id INTEGER, item_name TEXT NOT NULL, quantity INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE build_cost_cache (config_hash TEXT PRIMARY KEY, computed_ts INTEGER NOT NULL, payload_json TEXT NOT NULL)")
+    conn.executemany(
+        "INSERT INTO market_snapshots VALUES ('Jita', ?, 34, 'tritanium', ?, 4.0, 100.0)",
+        [(900, 4.0), (1_000, 4.5)],
+    )
+    conn.execute("INSERT INTO build_cost_cache VALUES ('hash', 1, '{\"name\": \"Rifter\"}')")
+    conn.commit()
+    conn.close()
+
+    with LocalSQLiteCache(db_path, maintenance_interval_seconds=None) as cache:
+        assert cache.get_market_snapshot("Jita", now_ts=1_100) == [
+            {"type_id": 34, "item_name": "tritanium", "sell_price": 4.5, "buy_price": 4.0, "daily_volume": 100.0}
+        ]
+        assert cache.get_build_cost("hash") == {"name": "Rifter"}
+        assert cache.get_character_snapshot(now_ts=1_100) is None
+
+
+def test_build_costs_are_binary_encoded_and_item_names_interned(tmp_path: Path) -> None:
+    with LocalSQLiteCache(tmp_path / "cache.sqlite3", maintenance_interval_seconds=None) as cache:
+        cost = {"name": "Rifter", "material_cost": 1234.57, "tax_cost": 98.77, "total_cost": 1333.34}
+        cache.save_build_costs({"hash-a": cost, "hash-b": {"name": "Merlin", "notes": ["x"]}}, now_ts=1_000)
+        assert cache.get_build_costs(["hash-a", "hash-b"]) == {"hash-a": cost, "hash-b": {"name": "Merlin", "notes": ["x"]}}
+
+        blob = cache._writer.execute("SELECT payload FROM build_cost_cache WHERE config_hash = 'hash-a'").fetchone()[0]
+        assert len(blob) < len(json.dumps(cost, sort_keys=True))
+
+        key = ItemKey(type_id=34, item_name="tritanium")
+        for ts in (1_000, 1_100, 1_200):
+            cache.save_market_snapshot(
+                "Jita", [MarketSnapshotRecord(key=key, hub_name="Jita", sell_price=4.2, buy_price=4.1, daily_volume=10)], now_ts=ts
+            )
+        cache.save_character_snapshot([CharacterStateRecord(key=key, asset_quantity=5, open_order_quantity=1)], now_ts=1_200)
+
+        assert cache._writer.execute("SELECT COUNT(*) FROM item_names").fetchone()[0] == 1
+        assert cache.get_market_snapshot("Jita", now_ts=1_200)[0]["item_name"] == "tritanium"
+        assert cache.get_character_snapshot(now_ts=1_200)["open_orders"][0]["item_name"] == "tritanium"
+
+
+def test_market_snapshots_are_stored_as_deltas_and_replay_exactly(tmp_path: Path) -> None:
+    with LocalSQLiteCache(
+        tmp_path / "cache.sqlite3",
+        market_ttl_seconds=10_000,
+        market_keyframe_interval=4,
+        maintenance_interval_seconds=None,
+    ) as cache:
+        prices = {type_id: float(type_id) for type_id in range(1, 101)}
+        expected: dict[int, list[dict]] = {}
+        for step in range(10):
+            snapshot_ts = 1_000 + step * 600
+            prices[1 + step] += 0.5
+            if step == 3:
+                del prices[100]
+            if step == 6:
+                prices[200] = 7.0
+            records = [
+                MarketSnapshotRecord(
+                    key=ItemKey(type_id=type_id, item_name=f"item-{type_id}"),
+                    hub_name="Jita",
+                    sell_price=price,
+                    buy_price=price - 0.1,
+                    daily_volume=10.0,
+                )
+                for type_id, price in prices.items()
+            ]
+            cache.save_market_snapshot("Jita", records, now_ts=snapshot_ts)
+            expected[snapshot_ts] = [
+                {"type_id": type_id, "item_name": f"item-{type_id}", "sell_price": price, "buy_price": price - 0.1, "daily_volume": 10.0}
+                for type_id, price in sorted(prices.items())
+            ]
+            assert cache.get_market_snapshot("Jita", now_ts=snapshot_ts) == expected[snapshot_ts]
+
+        keyframes = [row[0] for row in cache._writer.execute("SELECT keyframe_ts FROM market_snapshot_index WHERE keyframe_ts = snapshot_ts")]
+        assert keyframes == [1_000, 3_400, 5_800]
+        stored_rows = cache._writer.execute("SELECT COUNT(*) FROM market_snapshots").fetchone()[0]
+        assert stored_rows < 3 * 100 + 7 * 3
+
+        assert cache.get_market_history("Jita", start_ts=1_600, end_ts=4_600) == [
+            (snapshot_ts, expected[snapshot_ts]) for snapshot_ts in (1_600, 2_200, 2_800, 3_400, 4_000, 4_600)
+        ]
+
+        # Re-saving the latest snapshot replaces it instead of stacking a second delta.
+        cache.save_market_snapshot("Jita", [], now_ts=6_400)
+        assert cache.get_market_snapshot("Jita", now_ts=6_400) == []
+        assert cache.get_market_history("Jita", start_ts=5_800, end_ts=5_800) == [(5_800, expected[5_800])]
+
+
+def test_market_rollups_aggregate_hourly_and_daily_buckets(tmp_path: Path) -> None:
+    def snapshot(sell_price: float, daily_volume: float) -> list[MarketSnapshotRecord]:
+        return [
+            MarketSnapshotRecord(
+                key=ItemKey(type_id=587, item_name="Rifter"),
+                hub_name="Jita",
+                sell_price=sell_price,
+                buy_price=sell_price - 1,
+                daily_volume=daily_volume,
+            )
+        ]
+
+    day = 86_400
+    with LocalSQLiteCache(tmp_path / "cache.sqlite3", maintenance_interval_seconds=None) as cache:
+        cache.save_market_snapshot("Jita", snapshot(10.0, 100.0), now_ts=10 * day)
+        cache.save_market_snapshot("Jita", snapshot(14.0, 120.0), now_ts=10 * day + 600)
+        cache.save_market_snapshot("Jita", snapshot(9.0, 140.0), now_ts=10 * day + 3_600)
+        # Re-saving the latest snapshot replaces its sample instead of adding one.
+        cache.save_market_snapshot("Jita", snapshot(12.0, 140.0), now_ts=10 * day + 3_600)
+        cache.save_market_snapshot("Jita", snapshot(11.0, 300.0), now_ts=12 * day)
+
+        hourly = cache.get_market_rollups("Jita", bucket_seconds=3_600, start_ts=10 * day, end_ts=11 * day)
+        assert [(row["bucket_ts"], row["open_sell"], row["high_sell"], row["low_sell"], row["close_sell"]) for row in hourly] == [
+            (10 * day, 10.0, 14.0, 10.0, 14.0),
+            (10 * day + 3_600, 9.0, 12.0, 9.0, 12.0),
+        ]
+        daily = cache.get_market_rollups("Jita", bucket_seconds=day, start_ts=0, end_ts=20 * day)
+        assert [(row["bucket_ts"], row["avg_daily_volume"], row["samples"]) for row in daily] == [
+            (10 * day, 120.0, 3),
+            (12 * day, 300.0, 1),
+        ]
+
+        assert cache.get_average_daily_volume("Jita", days=7, now_ts=12 * day + 60) == {"Rifter": 210.0}
+        assert cache.get_average_daily_volume("Jita", days=1, now_ts=12 * day + 60) == {"Rifter": 300.0}
+
+        # Rollups outlive raw snapshots but have their own retention.
+        removed = cache.prune(now_ts=12 * day + 15 * day)
+        assert removed["market_rollups"] == 3
+        assert len(cache.get_market_rollups("Jita", bucket_seconds=day, start_ts=0, end_ts=20 * day)) == 2
+
+
+class _CountingMarketProvider:
+    def __init__(self, sell_price: float) -> None:
+        self.sell_price = sell_price
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def get_market_snapshot_records(self) -> dict[ItemKey, MarketSnapshotRecord]:
+        self.release.wait(timeout=5)
+        self.calls += 1
+        key = ItemKey(type_id=587, item_name="Rifter")
+        return {key: MarketSnapshotRecord(key=key, hub_name="Jita", sell_price=self.sell_price, buy_price=1.0, daily_volume=1.0)}
+
+
+class _FailingCharacterProvider:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def get_character_state_records(self) -> dict[ItemKey, CharacterStateRecord]:
+        self.calls += 1
+        if self.calls > 1:
+            raise RuntimeError("ESI unavailable")
+        key = ItemKey(type_id=587, item_name="Rifter")
+        return {key: CharacterStateRecord(key=key, asset_quantity=self.calls, open_order_quantity=0)}
+
+
+def test_stale_while_revalidate_returns_stale_rows_and_refreshes_in_background(tmp_path: Path) -> None:
+    base_ts = int(time.time()) - 5_000
+    with LocalSQLiteCache(
+        tmp_path / "cache.sqlite3",
+        market_ttl_seconds=600,
+        market_max_stale_seconds=3_600,
+        character_ttl_seconds=60,
+        character_max_stale_seconds=1_000,
+        maintenance_interval_seconds=None,
+    ) as cache:
+        provider = _CountingMarketProvider(sell_price=10.0)
+        first = cache.read_market_snapshot("Jita", provider, now_ts=base_ts)
+        assert (first.stale, first.age_seconds, first.snapshot_ts, provider.calls) == (False, 0, base_ts, 1)
+        assert cache.read_market_snapshot("Jita", provider, now_ts=base_ts + 100).rows == first.rows
+        assert provider.calls == 1
+
+        # Past the TTL the old rows come back at once while the provider is still blocked.
+        provider.sell_price = 12.0
+        provider.release.clear()
+        stale = cache.read_market_snapshot("Jita", provider, now_ts=base_ts + 1_000)
+        assert (stale.stale, stale.age_seconds, stale.rows[0]["sell_price"]) == (True, 1_000, 10.0)
+        cache.read_market_snapshot("Jita", provider, now_ts=base_ts + 1_001)
+        provider.release.set()
+        cache.wait_for_revalidation()
+        assert provider.calls == 2
+        refreshed = cache.read_market_snapshot("Jita", provider)
+        assert (refreshed.stale, refreshed.rows[0]["sell_price"]) == (False, 12.0)
+
+        # Beyond the staleness limit the read blocks on the provider; when that fails,
+        # the outdated snapshot is still returned, flagged as past the limit.
+        character_provider = _FailingCharacterProvider()
+        stored = cache.read_character_snapshot(character_provider, now_ts=base_ts)
+        cache.read_character_snapshot(character_provider, now_ts=base_ts + 500)
+        cache.wait_for_revalidation()
+        assert isinstance(cache.revalidation_errors[("character", "0")], RuntimeError)
+        assert character_provider.calls == 2
+        cache.revalidation_errors.clear()
+        outdated = cache.read_character_snapshot(character_provider, now_ts=base_ts + 2_000)
+        assert (outdated.stale, outdated.age_seconds, outdated.rows) == (True, 2_000, stored.rows)
+        assert outdated.past_max_stale and not stored.past_max_stale
+        assert isinstance(cache.revalidation_errors[("character", "0")], RuntimeError)
+        assert character_provider.calls == 3
+
+
+class _ExpiringMarketProvider(_CountingMarketProvider):
+    def __init__(self, sell_price: float, expires_ts: int) -> None:
+        super().__init__(sell_price)
+        self.expires_ts = expires_ts
+
+    def snapshot_expires_ts(self) -> int | None:
+        return self.expires_ts
+
+
+@pytest.mark.parametrize("cache_class", [LocalSQLiteCache, MemoryTieredCache])
+def test_upstream_expiry_replaces_the_ttl(tmp_path: Path, cache_class) -> None:
+    base_ts = int(time.time()) - 10_000
+    with cache_class(tmp_path / "cache.sqlite3", market_ttl_seconds=600, maintenance_interval_seconds=None) as cache:
+        provider = _ExpiringMarketProvider(sell_price=10.0, expires_ts=base_ts + 60)
+        cache.read_market_snapshot("Jita", provider, now_ts=base_ts)
+        records = list(provider.get_market_snapshot_records().values())
+        cache.save_market_snapshot("Amarr", records, now_ts=base_ts, expires_ts=base_ts + 3_000)
+        cache.save_market_snapshot("Dodixie", records, now_ts=base_ts)
+
+        assert cache.snapshot_fresh_until("market", "Jita") == base_ts + 60
+        assert cache.snapshot_fresh_until("market", "Dodixie") == base_ts + 600
+        assert cache.snapshot_fresh_until("market", "O-PNSN") is None
+        assert cache.get_market_snapshot("Jita", now_ts=base_ts + 60) is not None
+        assert cache.get_market_snapshot("Jita", now_ts=base_ts + 61) is None
+        assert cache.get_market_snapshot("Amarr", now_ts=base_ts + 2_000) is not None
+        assert cache.due_snapshots("market", ["Jita", "Amarr", "Dodixie", "O-PNSN"], now_ts=base_ts + 700) == [
+            "Jita",
+            "Dodixie",
+            "O-PNSN",
+        ]
+
+        # Past the declared expiry the read is stale even though the TTL has not run out.
+        calls = provider.calls
+        read = cache.read_market_snapshot("Jita", provider, now_ts=base_ts + 100)
+        cache.wait_for_revalidation()
+        assert read.stale and provider.calls == calls + 1
+
+
+def test_memory_tier_serves_repeat_reads_without_sqlite_and_invalidates_on_save(tmp_path: Path, monkeypatch) -> None:
+    with MemoryTieredCache(tmp_path / "cache.sqlite3", market_ttl_seconds=600, maintenance_interval_seconds=None) as cache:
+        record = MarketSnapshotRecord(
+            key=ItemKey(type_id=34, item_name="tritanium"),
+            hub_name="Jita",
+            sell_price=4.2,
+            buy_price=4.1,
+            daily_volume=1000,
+        )
+        cache.save_market_snapshot("Jita", [record], now_ts=1_000)
+        cache.save_build_costs({"hash-a": {"total_cost": 1.0}}, now_ts=1_000)
+        first_market = cache.get_market_snapshot("Jita", now_ts=1_100)
+        assert cache.get_build_costs(["hash-a"]) == {"hash-a": {"total_cost": 1.0}}
+
+        real_read = cache._read
+
+        def no_sqlite_reads():
+            raise AssertionError("memory tier should have served this read")
+
+        monkeypatch.setattr(cache, "_read", no_sqlite_reads)
+        cached_market = cache.get_market_snapshot("Jita", now_ts=1_200)
+        assert cached_market == first_market
+        cached_market[0]["sell_price"] = 0
+        assert cache.get_market_snapshot("Jita", now_ts=1_200) == first_market
+        assert cache.get_build_cost("hash-a") == {"total_cost": 1.0}
+        monkeypatch.setattr(cache, "_read", real_read)
+
+        # Memory hits still honor the snapshot TTL.
+        assert cache.get_market_snapshot("Jita", now_ts=1_601) is None
+
+        cache.save_market_snapshot("Jita", [replace(record, sell_price=5.0)], now_ts=1_700)
+        cache.save_build_costs({"hash-a": {"total_cost": 2.0}}, now_ts=1_700)
+        assert cache.get_market_snapshot("Jita", now_ts=1_700)[0]["sell_price"] == 5.0
+        assert cache.get_build_cost("hash-a") == {"total_cost": 2.0}
+
+
+def test_memory_tier_evicts_least_recently_used_entries_within_budget(tmp_path: Path) -> None:
+    with MemoryTieredCache(tmp_path / "cache.sqlite3", memory_budget_bytes=4096, maintenance_interval_seconds=None) as cache:
+        costs = {f"hash-{index}": {"total_cost": float(index)} for index in range(100)}
+        cache.save_build_costs(costs, now_ts=1_000)
+        for config_hash in costs:
+            cache.get_build_cost(config_hash)
+
+        assert cache._memory_bytes <= 4096
+        assert ("build", "hash-99") in cache._memory
+        assert ("build", "hash-0") not in cache._memory
+        assert cache.get_build_cost("hash-0") == {"total_cost": 0.0}
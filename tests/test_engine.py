@@ -1,4 +1,8 @@
 import csv
+import json
+import shutil
+import time
+from math import ceil
 import sys
 from pathlib import Path
 
@@ -9,6 +13,7 @@ sys.path.append(str(Path(__file__).resolve().parents[1]))
 from src.configuration import MARKET_HUB_LOCATION_IDS, OUTPUT_MARKET_HUBS
 from src.build_plan import STATIC_BUILD_QUANTITIES
 from src.engine import CSV_EXPORT_HEADERS, CalculatorEngine, LivePriceProvider
+from src.providers import HubMarketSnapshotAdapter, ItemKey, MarketSnapshotRecord
 
 
 class StubLivePriceProvider(LivePriceProvider):
@@ -148,8 +153,6 @@ def test_export_prefers_live_jita_price_provider(tmp_path: Path) -> None:
     assert rifter["jita_sell_price"] == "777777.0"
 
 
-
-
 def test_build_calculation_profile_from_config_is_used_for_costing(tmp_path: Path) -> None:
     config_path = tmp_path / "config.json"
     config_path.write_text(
@@ -191,3 +194,468 @@ def test_static_build_quantities_include_user_blueprints_and_merge_duplicates()
     assert STATIC_BUILD_QUANTITIES["Bustard"] == 50
     assert STATIC_BUILD_QUANTITIES["Signal Amplifier II"] == 12965
     assert STATIC_BUILD_QUANTITIES["Complex Asteroid Mining Crystal Type A II"] == 37926
+
+
+def test_vectorized_batch_mode_matches_scalar_costing(tmp_path: Path) -> None:
+    pytest.importorskip("numpy")
+    materials = ["Tritanium", "Pyerite", "Mexallon", "Isogen", "Nocxium", "Zydrine", "Megacyte"]
+    blueprints = [
+        {
+            "name": name,
+            "materials": {
+                material: (index * 37 + offset * 11) % 5000 + 1
+                for offset, material in enumerate(materials[: 1 + index % len(materials)])
+            },
+        }
+        for index, name in enumerate(sorted(STATIC_BUILD_QUANTITIES))
+    ]
+    config = {
+        "defaults": {
+            "me": 10,
+            "te": 20,
+            "tax_rate": 0.08,
+            "build_calculation": {
+                "system": "O-PNSN",
+                "additional_cost_isk": 1250.0,
+                "manufacturing_structure": "Azbel",
+                "manufacturing_rig": "T2 industry rig",
+            },
+        },
+        "blueprints": blueprints,
+        "price_overrides": {"Tritanium": 4.01, "Pyerite": 8.53, "Mexallon": 58.7, "Isogen": 99.9, "Megacyte": 1234.5},
+    }
+
+    scalar_path = tmp_path / "scalar.json"
+    scalar_path.write_text(json.dumps(config), encoding="utf-8")
+    vectorized_path = tmp_path / "vectorized.json"
+    vectorized_path.write_text(json.dumps({**config, "engine": {"vectorized": True}}), encoding="utf-8")
+
+    scalar = CalculatorEngine(scalar_path).refresh_data()
+    vectorized = CalculatorEngine(vectorized_path).refresh_data()
+
+    assert len(vectorized) == len(STATIC_BUILD_QUANTITIES)
+    assert vectorized == scalar
+
+
+def test_reprice_recomputes_only_blueprints_using_changed_materials(tmp_path: Path) -> None:
+    config = {
+        "defaults": {"me": 10, "te": 20, "tax_rate": 0.08},
+        "blueprints": [
+            {"name": "Rifter", "materials": {"Tritanium": 100, "Pyerite": 10}},
+            {"name": "Merlin", "materials": {"Tritanium": 80}},
+            {"name": "Crow", "materials": {"Mexallon": 5}},
+        ],
+        "price_overrides": {"Tritanium": 5, "Pyerite": 8, "Mexallon": 50},
+    }
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+
+    engine = CalculatorEngine(config_path)
+    first = list(engine.refresh_data())
+
+    assert engine.reprice({"Mexallon": 50}) == []
+
+    repriced = engine.reprice({"Pyerite": 9.5})
+    assert [row.name for row in repriced] == ["Rifter"]
+    assert engine.results[0] is repriced[0]
+    assert engine.results[1] is first[1]
+    assert engine.results[2] is first[2]
+
+    config["price_overrides"]["Pyerite"] = 9.5
+    expected_path = tmp_path / "expected.json"
+    expected_path.write_text(json.dumps(config), encoding="utf-8")
+    assert engine.results == CalculatorEngine(expected_path).refresh_data()
+
+
+def test_build_graph_prices_shared_sub_trees_once_with_reaction_bonuses(tmp_path: Path, monkeypatch) -> None:
+    from src.build_graph import BuildGraph
+
+    config = {
+        "defaults": {
+            "me": 10,
+            "te": 20,
+            "tax_rate": 0.0,
+            "build_calculation": {
+                "system": "Nowhere",
+                "scc_surcharge_percent": 0.0,
+                "manufacturing_structure": "Tatara",
+                "manufacturing_rig": "No rig",
+                "reaction_rig": "T2 reaction rig",
+                "calculate_reaction_jobs": True,
+                "show_detailed_build_steps": True,
+            },
+        },
+        "blueprints": [
+            {"name": "Jaguar", "materials": {"Fusion Thruster": 5, "Tritanium": 10}},
+            {"name": "Wolf", "materials": {"Fusion Thruster": 3}},
+        ],
+        "components": [{"name": "Fusion Thruster", "materials": {"Titanium Carbide": 10}}],
+        "reactions": [
+            {"name": "Titanium Carbide", "output_quantity": 200, "materials": {"Titanium": 100, "Carbon": 100}}
+        ],
+        "price_overrides": {"Tritanium": 4.0, "Titanium": 10.0, "Carbon": 20.0, "Titanium Carbide": 15.0},
+    }
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+
+    expanded: list[str] = []
+    original_multiplier = BuildGraph._material_multiplier
+
+    def counting_multiplier(self, recipe):
+        expanded.append(recipe.name)
+        return original_multiplier(self, recipe)
+
+    monkeypatch.setattr(BuildGraph, "_material_multiplier", counting_multiplier)
+
+    engine = CalculatorEngine(config_path)
+    jaguar, wolf = engine.refresh_data()
+
+    assert expanded.count("Fusion Thruster") == 1
+    assert expanded.count("Titanium Carbide") == 1
+    carbide_unit = 100 * (1 - 0.024) / 200 * (10.0 + 20.0)
+    thruster_unit = 10 * 0.9 * carbide_unit
+    assert jaguar.material_cost == pytest.approx((239 * thruster_unit + 477 * 4.0) / 53, abs=0.01)
+    assert wolf.material_cost == pytest.approx(ceil(3 * 53 * 0.9) * thruster_unit / 53, abs=0.01)
+    assert {step.name for step in engine.build_steps} >= {"Fusion Thruster", "Titanium Carbide", "Titanium"}
+
+    config["defaults"]["build_calculation"]["calculate_reaction_jobs"] = False
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+    engine.load_config()
+    market_carbide_wolf = engine.refresh_data()[1]
+    assert market_carbide_wolf.material_cost == pytest.approx(ceil(3 * 53 * 0.9) * 10 * 0.9 * 15.0 / 53, abs=0.01)
+
+
+def test_reprice_only_reexpands_build_graph_nodes_fed_by_changed_materials(tmp_path: Path, monkeypatch) -> None:
+    from src.build_graph import BuildGraph
+
+    config = {
+        "defaults": {
+            "me": 10,
+            "te": 20,
+            "tax_rate": 0.0,
+            "build_calculation": {
+                "system": "Nowhere",
+                "scc_surcharge_percent": 0.0,
+                "reaction_cost_index": 0.05,
+                "calculate_reaction_jobs": True,
+            },
+        },
+        "blueprints": [
+            {"name": "Jaguar", "materials": {"Fusion Thruster": 5, "Tritanium": 10}},
+            {"name": "Hound", "materials": {"Plasma Thruster": 4}},
+        ],
+        "components": [
+            {"name": "Fusion Thruster", "materials": {"Titanium Carbide": 10}},
+            {"name": "Plasma Thruster", "materials": {"Tritanium": 30}},
+        ],
+        "reactions": [
+            {"name": "Titanium Carbide", "output_quantity": 200, "materials": {"Titanium": 100, "Carbon": 100}}
+        ],
+        "price_overrides": {"Tritanium": 4.0, "Titanium": 10.0, "Carbon": 20.0},
+    }
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+
+    expanded: list[str] = []
+    original_multiplier = BuildGraph._material_multiplier
+
+    def counting_multiplier(self, recipe):
+        expanded.append(recipe.name)
+        return original_multiplier(self, recipe)
+
+    monkeypatch.setattr(BuildGraph, "_material_multiplier", counting_multiplier)
+
+    engine = CalculatorEngine(config_path)
+    engine.refresh_data()
+    # Reaction jobs are charged the reaction cost index, not the manufacturing one.
+    carbide = next(node for node in engine._build_graph.node_costs() if node.name == "Titanium Carbide")
+    assert carbide.job_cost == pytest.approx(carbide.material_cost * 0.05)
+
+    expanded.clear()
+    assert [row.name for row in engine.reprice({"Carbon": 25.0})] == ["Jaguar"]
+    assert sorted(expanded) == ["Fusion Thruster", "Titanium Carbide"]
+
+    expanded.clear()
+    engine.reprice({"Tritanium": 5.0})
+    assert expanded == ["Plasma Thruster"]
+
+    config["price_overrides"].update({"Carbon": 25.0, "Tritanium": 5.0})
+    expected_path = tmp_path / "expected.json"
+    expected_path.write_text(json.dumps(config), encoding="utf-8")
+    assert engine.results == CalculatorEngine(expected_path).refresh_data()
+
+
+def test_sweep_scenarios_matches_per_scenario_refresh(tmp_path: Path, monkeypatch) -> None:
+    from src.batch_costing import numpy_available
+    from src.configuration import build_scenario_grid
+
+    config = {
+        "defaults": {"me": 10, "te": 20, "tax_rate": 0.01},
+        "blueprints": [
+            {"name": "Rifter", "materials": {"Tritanium": 53000, "Pyerite": 11000}},
+            {"name": "Merlin", "materials": {"Tritanium": 65000, "Mexallon": 3500}},
+        ],
+        "price_overrides": {"Tritanium": 4.0, "Pyerite": 8.5, "Mexallon": 58.0},
+    }
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+    engine = CalculatorEngine(config_path)
+
+    material_sums: list[str] = []
+    original_material_cost = CalculatorEngine._material_cost_per_unit
+
+    def counting_material_cost(compiled, price_vector, facility_me_multiplier):
+        material_sums.append(compiled.name)
+        return original_material_cost(compiled, price_vector, facility_me_multiplier)
+
+    monkeypatch.setattr(CalculatorEngine, "_material_cost_per_unit", staticmethod(counting_material_cost))
+
+    grid = build_scenario_grid(structures=["Azbel", "Sotiyo"], rigs=["No rig", "T2 industry rig"], systems=["Jita", "O-PNSN"])
+    table = engine.sweep_scenarios(grid)
+    # Eight scenarios, but only three distinct facility ME bonuses to sum materials for.
+    assert len(material_sums) == 3 * 2
+    monkeypatch.undo()
+
+    assert len(table.scenario_names) == 8
+    assert table.blueprint_names == ["Rifter", "Merlin"]
+    assert engine.results == []
+
+    for scenario_name in ("Sotiyo / T2 industry rig / O-PNSN", "Azbel / No rig / Jita"):
+        scenario_path = tmp_path / "scenario.json"
+        scenario_path.write_text(
+            json.dumps({**config, "defaults": {**config["defaults"], "build_calculation": grid[scenario_name]}}),
+            encoding="utf-8",
+        )
+        expected = CalculatorEngine(scenario_path).refresh_data()
+        assert table.costs[scenario_name] == expected
+
+    assert table.cheapest_scenario("Rifter") == "Azbel / T2 industry rig / O-PNSN"
+
+    if numpy_available():
+        vectorized_path = tmp_path / "vectorized.json"
+        vectorized_path.write_text(json.dumps({**config, "engine": {"vectorized": True}}), encoding="utf-8")
+        assert CalculatorEngine(vectorized_path).sweep_scenarios(grid).costs == table.costs
+
+    with pytest.raises(ValueError, match="Unknown manufacturing_rig"):
+        build_scenario_grid(rigs=["T3 mystery rig"])
+
+
+def test_sweep_does_not_disturb_the_plan_that_reprice_patches(tmp_path: Path) -> None:
+    config = {
+        "defaults": {"me": 10, "te": 20, "tax_rate": 0.01},
+        "blueprints": [
+            {"name": "Rifter", "materials": {"Tritanium": 53000, "Pyerite": 11000}},
+            {"name": "Merlin", "materials": {"Tritanium": 65000, "Pyerite": 500}},
+        ],
+        "price_overrides": {"Tritanium": 4.0, "Pyerite": 8.5},
+    }
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+    engine = CalculatorEngine(config_path)
+    engine.refresh_data()
+
+    # A later hydration that only resolves Merlin.
+    engine.config["blueprints"] = config["blueprints"][1:]
+    table = engine.sweep_scenarios({"Azbel": {"structure": "Azbel"}})
+    assert table.blueprint_names == ["Merlin"]
+
+    engine.config["blueprints"] = config["blueprints"]
+    repriced = engine.reprice({"Pyerite": 100})
+    assert [row.name for row in engine.results] == ["Rifter", "Merlin"]
+    assert [row.name for row in repriced] == ["Rifter", "Merlin"]
+
+    config["price_overrides"]["Pyerite"] = 100
+    expected_path = tmp_path / "expected.json"
+    expected_path.write_text(json.dumps(config), encoding="utf-8")
+    assert engine.results == CalculatorEngine(expected_path).refresh_data()
+
+
+def test_cost_plan_is_compiled_once_and_rebuilt_on_config_change(tmp_path: Path, monkeypatch) -> None:
+    import src.engine
+
+    config = {
+        "defaults": {"me": 10, "te": 20, "tax_rate": 0.08},
+        "blueprints": [
+            {"name": "Rifter", "materials": {"Tritanium": 100, "Pyerite": 10}},
+            {"name": "Merlin", "materials": {"Tritanium": 80}},
+        ],
+        "price_overrides": {"Tritanium": 5, "Pyerite": 8},
+    }
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+
+    profile_loads: list[object] = []
+    original_loader = src.engine.load_build_calculation_profile
+
+    def counting_loader(defaults):
+        profile_loads.append(defaults)
+        return original_loader(defaults)
+
+    monkeypatch.setattr(src.engine, "load_build_calculation_profile", counting_loader)
+
+    engine = CalculatorEngine(config_path)
+    engine.refresh_data()
+    plan = engine._cost_plan
+    engine.refresh_data()
+    engine.refresh_data()
+
+    assert engine._cost_plan is plan
+    assert len(profile_loads) == 1
+    assert plan.material_names == ("Tritanium", "Pyerite")
+    assert [bp.material_ids for bp in plan.blueprints] == [(0, 1), (0,)]
+    assert plan.material_index == {0: (0, 1), 1: (0,)}
+
+    config["blueprints"][1]["materials"]["Mexallon"] = 3
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+    engine.load_config()
+    engine.refresh_data()
+
+    assert engine._cost_plan is not plan
+    assert len(profile_loads) == 2
+
+
+def test_cost_plan_cache_keys_only_depend_on_relevant_inputs() -> None:
+    from src.configuration import load_build_calculation_profile
+    from src.cost_plan import compile_cost_plan
+
+    blueprints = [
+        {"name": "Rifter", "materials": {"Tritanium": 100, "Pyerite": 10}},
+        {"name": "Merlin", "materials": {"Mexallon": 80}},
+    ]
+    profile = load_build_calculation_profile({"me": 10, "te": 20, "tax_rate": 0.08})
+    plan = compile_cost_plan(blueprints, profile=profile, recipes={})
+    base_prices = {"Tritanium": 5, "Pyerite": 8, "Mexallon": 50}
+
+    keys = plan.cache_keys(plan.price_vector(base_prices))
+    assert keys == compile_cost_plan(blueprints, profile=profile, recipes={}).cache_keys(plan.price_vector(base_prices))
+    assert len(set(keys)) == 2
+    assert plan.cache_keys(plan.price_vector(base_prices), [1]) == keys[1:]
+
+    mexallon_tick = plan.cache_keys(plan.price_vector({**base_prices, "Mexallon": 51}))
+    assert mexallon_tick[0] == keys[0]
+    assert mexallon_tick[1] != keys[1]
+
+    other_profile = load_build_calculation_profile({"me": 10, "te": 20, "tax_rate": 0.02})
+    other_plan = compile_cost_plan(blueprints, profile=other_profile, recipes={})
+    assert set(other_plan.cache_keys(other_plan.price_vector(base_prices))).isdisjoint(keys)
+
+    reordered = [{"name": "Rifter", "materials": {"Pyerite": 10, "Tritanium": 100}}, blueprints[1]]
+    reordered_plan = compile_cost_plan(reordered, profile=profile, recipes={})
+    assert reordered_plan.cache_keys(reordered_plan.price_vector(base_prices))[0] != keys[0]
+
+
+def test_parallel_refresh_matches_serial_refresh(tmp_path: Path) -> None:
+    blueprints = [
+        {"name": name, "materials": {"Tritanium": 1000 + index, "Pyerite": 50 + index % 7}}
+        for index, name in enumerate(sorted(STATIC_BUILD_QUANTITIES))
+    ]
+    config = {
+        "defaults": {"me": 10, "te": 20, "tax_rate": 0.08},
+        "blueprints": blueprints,
+        "price_overrides": {"Tritanium": 4.01, "Pyerite": 8.53},
+    }
+    serial_path = tmp_path / "serial.json"
+    serial_path.write_text(json.dumps(config), encoding="utf-8")
+    parallel_path = tmp_path / "parallel.json"
+    parallel_path.write_text(
+        json.dumps({**config, "engine": {"workers": 2, "parallel_min_blueprints": 1}}),
+        encoding="utf-8",
+    )
+
+    parallel_engine = CalculatorEngine(parallel_path)
+    try:
+        parallel = parallel_engine.refresh_data()
+        assert parallel_engine._process_pool is not None
+    finally:
+        parallel_engine.close()
+
+    assert [row.name for row in parallel] == [bp["name"] for bp in blueprints]
+    assert parallel == CalculatorEngine(serial_path).refresh_data()
+
+
+def test_export_fills_average_daily_volume_from_local_market_history(tmp_path: Path) -> None:
+    config_path = tmp_path / "app_config.json"
+    shutil.copy("app_config.json", config_path)
+    engine = CalculatorEngine(config_path)
+    now_ts = int(time.time())
+    for snapshot_ts, daily_volume in ((now_ts - 2 * 86_400, 100.0), (now_ts, 300.0)):
+        engine.cache.save_market_snapshot(
+            "Amarr",
+            [
+                MarketSnapshotRecord(
+                    key=ItemKey(type_id=587, item_name="Rifter"),
+                    hub_name="Amarr",
+                    sell_price=560000.0,
+                    buy_price=500000.0,
+                    daily_volume=daily_volume,
+                )
+            ],
+            now_ts=snapshot_ts,
+        )
+
+    out_csv = tmp_path / "history.csv"
+    engine.export_csv(out_csv)
+    engine.close()
+
+    with out_csv.open("r", encoding="utf-8", newline="") as f:
+        rifter = next(row for row in csv.DictReader(f) if row["item_name"] == "Rifter")
+    assert rifter["amarr_avg_daily_volume"] == "200.0"
+
+
+def test_export_reads_attached_market_providers_through_the_cache(tmp_path: Path) -> None:
+    config_path = tmp_path / "app_config.json"
+    shutil.copy("app_config.json", config_path)
+    engine = CalculatorEngine(config_path)
+    provider = HubMarketSnapshotAdapter("Dodixie", [{"type_id": 587, "item_name": "Rifter", "sell_price": 612345.0}])
+    engine.attach_market_snapshot_provider("Dodixie", provider)
+    with pytest.raises(ValueError):
+        engine.attach_market_snapshot_provider("Hek", provider)
+
+    out_csv = tmp_path / "snapshot.csv"
+    engine.export_csv(out_csv)
+    snapshot = engine.cache.read_market_snapshot("Dodixie", provider)
+    engine.close()
+
+    with out_csv.open("r", encoding="utf-8", newline="") as f:
+        rifter = next(row for row in csv.DictReader(f) if row["item_name"] == "Rifter")
+    assert rifter["dodixie_sell_price"] == "612345.0"
+    assert snapshot.stale is False
+
+
+def test_export_survives_failing_market_providers(tmp_path: Path) -> None:
+    class FailingProvider:
+        def get_market_snapshot_records(self):
+            raise ConnectionRefusedError("ESI unreachable")
+
+    config_path = tmp_path / "app_config.json"
+    shutil.copy("app_config.json", config_path)
+    engine = CalculatorEngine(config_path)
+    baseline_csv = engine.export_csv(tmp_path / "baseline.csv")
+    # Far older than market_max_stale_seconds, so the read would normally block on the provider.
+    engine.cache.save_market_snapshot(
+        "Dodixie",
+        [
+            MarketSnapshotRecord(
+                key=ItemKey(type_id=587, item_name="Rifter"),
+                hub_name="Dodixie",
+                sell_price=611111.0,
+                buy_price=600000.0,
+                daily_volume=0.0,
+            )
+        ],
+        now_ts=int(time.time()) - 10 * 86_400,
+    )
+    engine.attach_market_snapshot_provider("Dodixie", FailingProvider())
+    engine.attach_market_snapshot_provider("Amarr", FailingProvider())
+
+    out_csv = engine.export_csv(tmp_path / "failing.csv")
+    engine.close()
+
+    with baseline_csv.open("r", encoding="utf-8", newline="") as f:
+        expected = next(row for row in csv.DictReader(f) if row["item_name"] == "Rifter")
+    with out_csv.open("r", encoding="utf-8", newline="") as f:
+        rifter = next(row for row in csv.DictReader(f) if row["item_name"] == "Rifter")
+    assert rifter["dodixie_sell_price"] == "611111.0"
+    assert rifter["amarr_sell_price"] == expected["amarr_sell_price"]
+    assert set(engine.snapshot_errors) == {"Amarr"}
+    assert isinstance(engine.cache.revalidation_errors[("market", "Dodixie")], ConnectionRefusedError)
@@ -0,0 +1,126 @@
+import base64
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.cache import LocalSQLiteCache
+from src.configuration import MARKET_HUB_LOCATION_IDS
+from src.esi_character import EsiCharacterStateFetcher, character_id_from_token
+from src.providers import EsiCharacterStateAdapter
+from tests.http_stub import StubHttpServer, StubRequest, json_response
+
+
+CHARACTER_ID = 90000001
+JITA_STATION = 60003760
+AMARR_STATION = 60008494
+TYPE_NAMES = {587: "Rifter", 34: "Tritanium", 3466: "Large Secure Container"}
+
+
+def _token(character_id: int = CHARACTER_ID) -> str:
+    def segment(payload: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).rstrip(b"=").decode("ascii")
+
+    return ".".join([segment({"alg": "RS256"}), segment({"sub": f"CHARACTER:EVE:{character_id}", "name": "Pilot"}), "sig"])
+
+
+class _StubCharacterEsi:
+    def __init__(self, asset_pages: list[list[dict]], orders: list[dict], *, delay_s: float = 0.0) -> None:
+        self.asset_pages = asset_pages
+        self.orders = orders
+        self.delay_s = delay_s
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request: StubRequest):
+        parts = urlsplit(request.path)
+        if request.method == "POST" and parts.path == "/universe/names/":
+            return json_response([{"id": type_id, "name": TYPE_NAMES[type_id]} for type_id in json.loads(request.body)])
+        if request.headers.get("authorization") != f"Bearer {_token()}":
+            return json_response({"error": "authentication required"}, status=401)
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay_s)
+            if parts.path == f"/characters/{CHARACTER_ID}/assets/":
+                page = int(parse_qs(parts.query)["page"][0])
+                return json_response(self.asset_pages[page - 1], headers={"X-Pages": str(len(self.asset_pages))})
+            if parts.path == f"/characters/{CHARACTER_ID}/orders/":
+                return json_response(self.orders)
+            return json_response({"error": "not found"}, status=404)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def _asset(item_id: int, type_id: int, location_id: int, quantity: int, *, is_singleton: bool = False) -> dict:
+    return {
+        "item_id": item_id,
+        "type_id": type_id,
+        "location_id": location_id,
+        "quantity": quantity,
+        "location_flag": "Hangar",
+        "is_singleton": is_singleton,
+    }
+
+
+def test_character_id_is_read_from_the_sso_token() -> None:
+    assert character_id_from_token(_token(123)) == 123
+    with pytest.raises(ValueError):
+        character_id_from_token("not-a-jwt")
+
+
+def test_fetch_streams_asset_pages_concurrently_and_feeds_hub_state(tmp_path: Path) -> None:
+    asset_pages = [
+        [_asset(1, 587, JITA_STATION, 4), _asset(2, 3466, JITA_STATION, 1, is_singleton=True)],
+        [_asset(3, 587, 2, 3), _asset(4, 587, AMARR_STATION, 1)],  # three Rifters inside the container
+        [_asset(5, 34, JITA_STATION, 1000), _asset(6, 587, JITA_STATION, 1)],
+        [_asset(7, 34, 30000142, 50)],  # in space, not at a hub
+    ]
+    orders = [
+        {"order_id": 1, "type_id": 587, "location_id": JITA_STATION, "volume_remain": 5, "is_buy_order": False},
+        {"order_id": 2, "type_id": 587, "location_id": JITA_STATION, "volume_remain": 2},
+        {"order_id": 3, "type_id": 34, "location_id": JITA_STATION, "volume_remain": 9999, "is_buy_order": True},
+    ]
+    esi = _StubCharacterEsi(asset_pages, orders, delay_s=0.05)
+    cache = LocalSQLiteCache(tmp_path / "cache.sqlite3", character_ttl_seconds=600)
+
+    with StubHttpServer(esi) as server:
+        fetcher = EsiCharacterStateFetcher({"base_url": server.base_url, "max_concurrency": 4}, cache=cache)
+        state = fetcher.fetch(_token(), now_ts=1_700_000_000)
+        requests_after_first_fetch = len(server.requests)
+        cached = fetcher.fetch(_token(), now_ts=1_700_000_300)
+        assert len(server.requests) == requests_after_first_fetch
+        fetcher.fetch(_token(), now_ts=1_700_000_700)
+        assert len(server.requests) > requests_after_first_fetch
+        fetcher.close()
+
+    assert esi.peak_in_flight > 1
+
+    def stacks(rows: list[dict], column: str) -> dict:
+        return {(row["type_id"], row["item_name"], row["location_id"]): row[column] for row in rows}
+
+    assert stacks(cached.asset_rows, "quantity") == stacks(state.asset_rows, "quantity")
+    assert stacks(cached.order_rows, "volume_remain") == stacks(state.order_rows, "volume_remain")
+    assert stacks(state.order_rows, "volume_remain") == {(587, "rifter", JITA_STATION): 7}
+
+    adapter = EsiCharacterStateAdapter(oauth_token=_token(), asset_rows=cached.asset_rows, order_rows=cached.order_rows)
+    hub_state = {
+        (key.item_name, hub_name): (record.stock, record.on_market)
+        for (key, hub_name), record in adapter.get_hub_state_records(MARKET_HUB_LOCATION_IDS).items()
+    }
+    assert hub_state[("rifter", "Jita")] == (8, 7)
+    assert hub_state[("rifter", "Amarr")] == (1, 0)
+    assert hub_state[("tritanium", "Jita")] == (1000, 0)
+
+    snapshot = cache.get_character_snapshot(now_ts=1_700_000_000, character_id=CHARACTER_ID)
+    assert stacks(snapshot["assets"], "quantity")[(587, "rifter", AMARR_STATION)] == 1
+    cache.close()
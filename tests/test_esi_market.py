@@ -0,0 +1,225 @@
+import csv
+import json
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.cache import LocalSQLiteCache
+from src.configuration import OUTPUT_MARKET_HUBS
+from src.engine import CalculatorEngine
+from src.esi_market import EsiMarketPriceProvider
+from tests.http_stub import StubHttpServer, StubRequest, json_response
+
+
+JITA_STATION = 60003760
+PERIMETER_TOWER = 1022734985679
+AMARR_STATION = 60008494
+OPNSN_STRUCTURE = 1036927076065
+TYPE_NAMES = {34: "Tritanium", 35: "Pyerite", 587: "Rifter"}
+
+
+def _order(order_id: int, type_id: int, location_id: int, price: float, volume: int, *, buy: bool = False) -> dict:
+    return {
+        "order_id": order_id,
+        "type_id": type_id,
+        "location_id": location_id,
+        "price": price,
+        "volume_remain": volume,
+        "is_buy_order": buy,
+    }
+
+
+def _paged(orders: list[dict], page_size: int) -> list[list[dict]]:
+    return [orders[start : start + page_size] for start in range(0, len(orders), page_size)]
+
+
+class _StubEsi:
+    """Region and structure order books served in pages, plus /universe/names/."""
+
+    def __init__(
+        self,
+        books: dict[str, list[list[dict]]],
+        *,
+        token: str = "secret",
+        delay_s: float = 0.0,
+        max_age: dict[str, int] | None = None,
+    ) -> None:
+        self.books = books
+        self.max_age = max_age or {}
+        self.token = token
+        self.delay_s = delay_s
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, request: StubRequest):
+        parts = urlsplit(request.path)
+        query = parse_qs(parts.query)
+        if request.method == "POST" and parts.path == "/universe/names/":
+            ids = json.loads(request.body)
+            return json_response([{"id": type_id, "name": TYPE_NAMES[type_id], "category": "inventory_type"} for type_id in ids])
+
+        pages = self.books.get(parts.path)
+        if pages is None:
+            return json_response({"error": "not found"}, status=404)
+        if parts.path.startswith("/markets/structures/") and request.headers.get("authorization") != f"Bearer {self.token}":
+            return json_response({"error": "authentication required"}, status=401)
+        assert query["datasource"] == ["tranquility"]
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay_s)
+            page = int(query.get("page", ["1"])[0])
+            headers = {"X-Pages": str(len(pages))}
+            if parts.path in self.max_age:
+                headers["Cache-Control"] = f"public, max-age={self.max_age[parts.path]}"
+            return json_response(pages[page - 1], headers=headers)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_region_pages_are_fetched_concurrently_and_reduced_per_hub() -> None:
+    forge_orders = [
+        _order(1, 34, JITA_STATION, 5.0, 1000),
+        _order(2, 34, JITA_STATION, 4.5, 500),
+        _order(3, 34, JITA_STATION, 4.0, 700, buy=True),
+        _order(4, 34, 60000004, 1.0, 9999),  # another station in the region
+        _order(5, 587, JITA_STATION, 400000.0, 3),
+        _order(6, 35, JITA_STATION, 9.0, 100, buy=True),
+    ]
+    forge_orders += [_order(100 + index, 34, JITA_STATION, 6.0, 1) for index in range(14)]
+    esi = _StubEsi({"/markets/10000002/orders/": _paged(forge_orders, 2)}, delay_s=0.05)
+
+    with StubHttpServer(esi) as server:
+        provider = EsiMarketPriceProvider({"base_url": server.base_url, "max_concurrency": 8})
+        summaries = provider.fetch_hub("Jita")
+        provider.close()
+
+    page_requests = [request for request in server.requests if request.method == "GET"]
+    assert len(page_requests) == 10
+    assert all("order_type=all" in request.path for request in page_requests)
+    assert esi.peak_in_flight > 1
+
+    tritanium = summaries[34]
+    assert (tritanium.best_sell, tritanium.best_buy) == (4.5, 4.0)
+    assert (tritanium.sell_depth, tritanium.buy_depth) == (1514, 700)
+    assert summaries[35].best_sell is None and summaries[35].best_buy == 9.0
+    assert provider.get_sell_price("Rifter") == 400000.0
+    assert provider.get_sell_price("Pyerite") is None
+    assert provider.get_sell_price("Unknown Item") is None
+
+
+def test_structure_markets_need_a_token_and_duplicate_orders_are_counted_once() -> None:
+    books = {
+        "/markets/10000002/orders/": [[_order(1, 34, JITA_STATION, 5.0, 10), _order(2, 34, PERIMETER_TOWER, 4.8, 20)]],
+        f"/markets/structures/{PERIMETER_TOWER}/": [
+            [_order(2, 34, PERIMETER_TOWER, 4.8, 20)],
+            [_order(3, 34, PERIMETER_TOWER, 4.7, 5)],
+        ],
+        f"/markets/structures/{OPNSN_STRUCTURE}/": [[_order(9, 587, OPNSN_STRUCTURE, 450000.0, 2)]],
+    }
+
+    with StubHttpServer(_StubEsi(books)) as server:
+        signed_out = EsiMarketPriceProvider({"base_url": server.base_url})
+        assert signed_out.fetch_hub("Jita")[34].sell_depth == 30
+        signed_out.close()
+
+        provider = EsiMarketPriceProvider({"base_url": server.base_url}, access_token=lambda: "secret")
+        jita = provider.fetch_hub("Jita")
+        opnsn = provider.fetch_hub("O-PNSN")
+        provider.close()
+
+    assert (jita[34].best_sell, jita[34].sell_depth) == (4.7, 35)
+    assert opnsn[587].best_sell == 450000.0
+
+    try:
+        EsiMarketPriceProvider({"base_url": server.base_url}).fetch_hub("C-N4OD")
+    except ValueError as exc:
+        assert "access token" in str(exc)
+    else:
+        raise AssertionError("Expected structure-only hubs to require a token")
+
+
+def test_refresh_saves_hub_snapshots_and_records_failures(tmp_path: Path) -> None:
+    books = {
+        "/markets/10000002/orders/": [[_order(1, 34, JITA_STATION, 5.0, 10), _order(2, 35, JITA_STATION, 8.0, 4, buy=True)]],
+        "/markets/10000043/orders/": [[_order(3, 34, AMARR_STATION, 5.5, 7), _order(4, 34, AMARR_STATION, 5.1, 3, buy=True)]],
+    }
+    cache = LocalSQLiteCache(tmp_path / "cache.sqlite3")
+
+    with StubHttpServer(_StubEsi(books)) as server:
+        provider = EsiMarketPriceProvider({"base_url": server.base_url}, cache=cache)
+        summaries = provider.refresh(["Jita", "Amarr", "Dodixie", "C-N4OD"])
+        provider.close()
+
+    assert set(summaries) == {"Jita", "Amarr"}
+    assert set(provider.errors) == {"Dodixie", "C-N4OD"}
+    assert [(row["item_name"], row["sell_price"]) for row in cache.get_market_snapshot("Jita")] == [("tritanium", 5.0)]
+    amarr = cache.get_market_snapshot("Amarr")
+    assert [(row["type_id"], row["sell_price"], row["buy_price"]) for row in amarr] == [(34, 5.5, 5.1)]
+    # Order books carry no traded volume, so they leave the history-based volume alone.
+    assert cache.get_average_daily_volume("Amarr") == {}
+    cache.close()
+
+
+def test_refresh_skips_hubs_until_their_declared_expiry(tmp_path: Path) -> None:
+    books = {
+        "/markets/10000002/orders/": [[_order(1, 34, JITA_STATION, 5.0, 10)]],
+        f"/markets/structures/{PERIMETER_TOWER}/": [[_order(2, 34, PERIMETER_TOWER, 4.9, 5)]],
+        "/markets/10000043/orders/": [[_order(3, 34, AMARR_STATION, 5.5, 7)]],
+    }
+    max_age = {"/markets/10000002/orders/": 300, f"/markets/structures/{PERIMETER_TOWER}/": 120, "/markets/10000043/orders/": 300}
+    cache = LocalSQLiteCache(tmp_path / "cache.sqlite3", market_ttl_seconds=5)
+
+    with StubHttpServer(_StubEsi(books, max_age=max_age)) as server:
+        provider = EsiMarketPriceProvider({"base_url": server.base_url}, cache=cache, access_token=lambda: "secret")
+        started = int(time.time())
+        assert set(provider.refresh(["Jita", "Amarr"])) == {"Jita", "Amarr"}
+        fetches = len(server.requests)
+
+        # Both hubs are inside their ESI expiry, so nothing is requested again.
+        assert provider.refresh(["Jita", "Amarr"]) == {}
+        assert len(server.requests) == fetches
+        assert set(provider.refresh(["Jita"], force=True)) == {"Jita"}
+        assert len(server.requests) > fetches
+        provider.close()
+
+    # A hub is only as fresh as its earliest-expiring book.
+    assert started + 120 <= cache.snapshot_fresh_until("market", "Jita") <= started + 125
+    assert started + 300 <= cache.snapshot_fresh_until("market", "Amarr") <= started + 305
+    assert cache.get_market_snapshot("Jita", now_ts=started + 60)[0]["sell_price"] == 4.9
+    cache.close()
+
+
+def test_signed_out_export_skips_structure_hubs_and_failed_books(tmp_path: Path) -> None:
+    # Only Amarr's book is served; Jita and Dodixie fail with 404, structure hubs need a token.
+    books = {"/markets/10000043/orders/": [[_order(3, 587, AMARR_STATION, 555000.0, 2)]]}
+    config_path = tmp_path / "app_config.json"
+    shutil.copy("app_config.json", config_path)
+    engine = CalculatorEngine(config_path)
+    baseline_csv = engine.export_csv(tmp_path / "baseline.csv")
+
+    with StubHttpServer(_StubEsi(books)) as server:
+        provider = EsiMarketPriceProvider({"base_url": server.base_url}, cache=engine.cache, access_token=lambda: "")
+        for hub_name in OUTPUT_MARKET_HUBS:
+            engine.attach_market_snapshot_provider(hub_name, provider.snapshot_provider(hub_name))
+        out_csv = engine.export_csv(tmp_path / "signed_out.csv", live_price_provider=provider)
+        provider.close()
+    engine.close()
+
+    assert set(provider.errors) == {"Jita", "Dodixie", "O-PNSN", "C-N4OD"}
+    assert set(engine.snapshot_errors) == set(provider.errors)
+    with baseline_csv.open("r", encoding="utf-8", newline="") as f:
+        expected = next(row for row in csv.DictReader(f) if row["item_name"] == "Rifter")
+    with out_csv.open("r", encoding="utf-8", newline="") as f:
+        rifter = next(row for row in csv.DictReader(f) if row["item_name"] == "Rifter")
+    assert rifter["amarr_sell_price"] == "555000.0"
+    for column in ("dodixie_sell_price", "o-pnsn_sell_price", "c-n4od_sell_price"):
+        assert rifter[column] == expected[column]
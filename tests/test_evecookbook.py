@@ -1,32 +1,32 @@
 import json
 import sys
+import threading
+import time
 from pathlib import Path
+from urllib.parse import unquote
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from src.evecookbook import EveCookbookClient
+from src.cache import LocalSQLiteCache
+from src.evecookbook import EveCookbookBlueprint, EveCookbookClient
 from src.engine import CalculatorEngine
+from tests.http_stub import StubHttpServer, StubRequest, json_response
 
 
-class _FakeResponse:
-    def __init__(self, payload: dict) -> None:
-        self._payload = payload
+def _cookbook_config(base_url: str, **overrides) -> dict:
+    return {
+        "enabled": True,
+        "base_url": base_url,
+        "blueprint_endpoint": "/api/blueprints/{blueprint_name}",
+        "backoff_base_s": 0.01,
+        **overrides,
+    }
 
-    def read(self) -> bytes:
-        return json.dumps(self._payload).encode("utf-8")
 
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc, tb):
-        return False
-
-
-def test_evecookbook_client_parses_materials(monkeypatch) -> None:
-    def fake_urlopen(url: str, timeout: float):
-        assert "Rifter" in url
-        assert timeout == 15.0
-        return _FakeResponse(
+def test_evecookbook_client_parses_materials() -> None:
+    def handler(request: StubRequest):
+        assert request.path == "/api/blueprints/Rifter"
+        return json_response(
             {
                 "materials": [
                     {"name": "Tritanium", "quantity": 10, "adjusted_price": 4.2},
@@ -35,44 +35,137 @@ def test_evecookbook_client_parses_materials(monkeypatch) -> None:
             }
         )
 
-    monkeypatch.setattr("src.evecookbook.urlopen", fake_urlopen)
-
-    client = EveCookbookClient(
-        {
-            "enabled": True,
-            "base_url": "https://example.test",
-            "blueprint_endpoint": "/api/blueprints/{blueprint_name}",
-            "request_timeout_s": 15,
-        }
-    )
-    result = client.fetch_blueprint("Rifter")
+    with StubHttpServer(handler) as server:
+        client = EveCookbookClient(_cookbook_config(server.base_url, request_timeout_s=15))
+        result = client.fetch_blueprint("Rifter")
+        client.close()
 
+    assert client.request_timeout_s == 15.0
     assert result.name == "Rifter"
     assert result.materials == {"Tritanium": 10.0, "Pyerite": 2.0}
     assert result.material_prices == {"Tritanium": 4.2, "Pyerite": 8.5}
 
 
-def test_engine_can_hydrate_blueprints_from_evecookbook(tmp_path: Path, monkeypatch) -> None:
-    config_path = tmp_path / "config.json"
-    config_path.write_text(
-        json.dumps(
-            {
-                "defaults": {"me": 10, "te": 20, "tax_rate": 0.08},
-                "evecookbook": {
-                    "enabled": True,
-                    "base_url": "https://example.test",
-                    "blueprint_endpoint": "/api/blueprints/{blueprint_name}",
-                    "blueprints": ["Rifter"],
-                },
-                "price_overrides": {},
-                "blueprints": [],
-            }
-        ),
-        encoding="utf-8",
-    )
+def test_evecookbook_client_reuses_keep_alive_connections() -> None:
+    def handler(request: StubRequest):
+        return json_response({"materials": [{"name": "Tritanium", "quantity": 1}]})
+
+    with StubHttpServer(handler) as server:
+        client = EveCookbookClient(_cookbook_config(server.base_url, pool_size=2, pool_idle_timeout_s=60))
+        for name in ("Rifter", "Merlin", "Tristan", "Punisher"):
+            client.fetch_blueprint(name)
+        assert client.pool.connections_opened == 1
+        assert len(server.connections) == 1
+
+        # Connections idle for longer than the timeout are replaced.
+        client.pool.idle_timeout_s = 0.0
+        time.sleep(0.01)
+        client.fetch_blueprint("Rifter")
+        client.close()
+
+    assert client.pool.connections_opened == 2
+    assert len(server.connections) == 2
+
+
+def test_fetch_blueprints_runs_concurrently_keeps_order_and_skips_failures() -> None:
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def handler(request: StubRequest):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.05)
+        with lock:
+            in_flight -= 1
+        name = unquote(request.path.rsplit("/", 1)[-1])
+        if name == "Broken":
+            return json_response({"error": "unavailable"}, status=503)
+        return json_response({"materials": [{"name": f"{name}-mat", "quantity": 1}]})
+
+    names = [f"Ship {index}" for index in range(8)]
+    names.insert(3, "Broken")
+    with StubHttpServer(handler) as server:
+        client = EveCookbookClient(_cookbook_config(server.base_url, max_concurrency=4))
+        results = client.fetch_blueprints(names)
+        client.close()
+
+    assert [result.name for result in results] == [name for name in names if name != "Broken"]
+    assert set(client.errors) == {"Broken"}
+    assert results[0].materials == {"Ship 0-mat": 1.0}
+    assert 1 < peak <= 4
+    assert client.pool.connections_opened <= 4
+
+
+def test_evecookbook_responses_are_cached_revalidated_and_served_offline(tmp_path: Path) -> None:
+    max_age = {"value": 0}
+
+    def handler(request: StubRequest):
+        if request.headers.get("if-none-match") == '"v1"':
+            return 304, {"ETag": '"v1"', "Cache-Control": f"max-age={max_age['value']}"}, b""
+        return json_response(
+            {"materials": [{"name": "Tritanium", "quantity": 10, "adjusted_price": 4.2}]},
+            headers={"ETag": '"v1"', "Cache-Control": f"max-age={max_age['value']}"},
+        )
 
-    def fake_urlopen(url: str, timeout: float):
-        return _FakeResponse(
+    with StubHttpServer(handler) as server, LocalSQLiteCache(tmp_path / "cache.sqlite3") as cache:
+        client = EveCookbookClient(_cookbook_config(server.base_url), response_cache=cache)
+        first = client.fetch_blueprint("Rifter")
+        max_age["value"] = 3_600
+        revalidated = client.fetch_blueprint("Rifter")
+        fresh = client.fetch_blueprint("Rifter")
+        client.close()
+
+        offline = EveCookbookClient(_cookbook_config(server.base_url, offline=True), response_cache=cache)
+        assert offline.fetch_blueprints(["Rifter", "Merlin"]) == [
+            EveCookbookBlueprint(name="Rifter", materials={"Tritanium": 10.0}, material_prices={"Tritanium": 4.2})
+        ]
+
+    assert first == revalidated == fresh
+    assert [request.headers.get("if-none-match") for request in server.requests] == [None, '"v1"']
+
+
+def test_bulk_endpoint_fetches_chunks_and_falls_back_per_blueprint(tmp_path: Path) -> None:
+    def handler(request: StubRequest):
+        path, _, query = request.path.partition("?")
+        if path == "/api/blueprints/bulk":
+            names = [unquote(name) for name in query.removeprefix("names=").split(",")]
+            return json_response(
+                {
+                    "blueprints": [
+                        {"name": name, "materials": [{"name": "Tritanium", "quantity": index + 1}]}
+                        for index, name in enumerate(names)
+                        if name != "Hound"
+                    ]
+                }
+            )
+        return json_response({"materials": [{"name": "Pyerite", "quantity": 5}]})
+
+    names = ["Rifter", "Merlin", "Tristan", "Hound", "Punisher", "Slasher", "Atron"]
+    with StubHttpServer(handler) as server, LocalSQLiteCache(tmp_path / "cache.sqlite3") as cache:
+        config = _cookbook_config(
+            server.base_url,
+            bulk_endpoint="/api/blueprints/bulk?names={blueprint_names}",
+            bulk_chunk_size=3,
+        )
+        client = EveCookbookClient(config, response_cache=cache)
+        results = client.fetch_blueprints(names)
+        warm = client.fetch_blueprints(names)
+        client.close()
+
+    assert [result.name for result in results] == names
+    assert results[0].materials == {"Tritanium": 1.0}
+    assert results[3].materials == {"Pyerite": 5.0}
+    assert warm == results
+    paths = sorted(request.path.partition("?")[0] for request in server.requests)
+    assert paths == ["/api/blueprints/Hound"] + ["/api/blueprints/bulk"] * 3
+
+
+def test_engine_can_hydrate_blueprints_from_evecookbook(tmp_path: Path) -> None:
+    def handler(request: StubRequest):
+        return json_response(
             {
                 "materials": [
                     {"name": "Tritanium", "quantity": 100, "adjusted_price": 1.0},
@@ -81,43 +174,77 @@ def test_engine_can_hydrate_blueprints_from_evecookbook(tmp_path: Path, monkeypa
             }
         )
 
-    monkeypatch.setattr("src.evecookbook.urlopen", fake_urlopen)
+    with StubHttpServer(handler) as server:
+        config_path = tmp_path / "config.json"
+        config_path.write_text(
+            json.dumps(
+                {
+                    "defaults": {"me": 10, "te": 20, "tax_rate": 0.08},
+                    "evecookbook": {**_cookbook_config(server.base_url), "blueprints": ["Rifter"]},
+                    "price_overrides": {},
+                    "blueprints": [],
+                }
+            ),
+            encoding="utf-8",
+        )
 
-    engine = CalculatorEngine(config_path)
-    result = engine.refresh_data()
+        engine = CalculatorEngine(config_path)
+        result = engine.refresh_data()
+        engine.refresh_data()
+        engine.close()
 
     assert len(result) == 1
     assert result[0].name == "Rifter"
     assert result[0].total_cost > 0
+    # The second refresh is served from the local response cache.
+    assert len(server.requests) == 1
+
+
+def test_engine_falls_back_to_local_blueprints_when_cookbook_hydration_fails(tmp_path: Path) -> None:
+    def handler(request: StubRequest):
+        return json_response({"error": "cookbook unavailable"}, status=500)
+
+    with StubHttpServer(handler) as server:
+        config_path = tmp_path / "config.json"
+        config_path.write_text(
+            json.dumps(
+                {
+                    "defaults": {"me": 10, "te": 20, "tax_rate": 0.08},
+                    "evecookbook": {**_cookbook_config(server.base_url), "blueprints": ["Rifter"]},
+                    "price_overrides": {"Tritanium": 2.0},
+                    "blueprints": [{"name": "Rifter", "materials": {"Tritanium": 10}}],
+                }
+            ),
+            encoding="utf-8",
+        )
 
-
-def test_engine_falls_back_to_local_blueprints_when_cookbook_hydration_fails(tmp_path: Path, monkeypatch) -> None:
-    config_path = tmp_path / "config.json"
-    config_path.write_text(
-        json.dumps(
-            {
-                "defaults": {"me": 10, "te": 20, "tax_rate": 0.08},
-                "evecookbook": {
-                    "enabled": True,
-                    "base_url": "https://example.test",
-                    "blueprint_endpoint": "/api/blueprints/{blueprint_name}",
-                    "blueprints": ["Rifter"],
-                },
-                "price_overrides": {"Tritanium": 2.0},
-                "blueprints": [{"name": "Rifter", "materials": {"Tritanium": 10}}],
-            }
-        ),
-        encoding="utf-8",
-    )
-
-    def failing_urlopen(url: str, timeout: float):
-        raise RuntimeError("cookbook unavailable")
-
-    monkeypatch.setattr("src.evecookbook.urlopen", failing_urlopen)
-
-    engine = CalculatorEngine(config_path)
-    result = engine.refresh_data()
+        engine = CalculatorEngine(config_path)
+        result = engine.refresh_data()
+        engine.close()
 
     assert len(result) == 1
     assert result[0].name == "Rifter"
     assert result[0].total_cost > 0
+
+
+def test_repeated_hydrations_do_not_accumulate_cache_connections(tmp_path: Path) -> None:
+    def handler(request: StubRequest):
+        name = unquote(request.path.rsplit("/", 1)[-1])
+        return json_response({"materials": [{"name": f"{name}-mat", "quantity": 1}]}, headers={"Cache-Control": "max-age=0"})
+
+    names = [f"Ship {index}" for index in range(16)]
+    with StubHttpServer(handler) as server, LocalSQLiteCache(tmp_path / "cache.sqlite3") as cache:
+        client = EveCookbookClient(_cookbook_config(server.base_url, max_concurrency=8), response_cache=cache)
+        held = []
+        for _ in range(5):
+            assert len(client.fetch_blueprints(names)) == len(names)
+            held.append(len(cache._connections))
+        client.close()
+        assert held == [held[0]] * 5
+
+        # Readers opened by threads that have since exited are closed on the next new reader.
+        for _ in range(3):
+            worker = threading.Thread(target=cache.get_http_response, args=("missing",))
+            worker.start()
+            worker.join()
+        assert len(cache._connections) <= held[0] + 1
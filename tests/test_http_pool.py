@@ -0,0 +1,182 @@
+import http.client
+import ssl
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.http_pool import CircuitOpenError, HttpConnectionPool, RetryPolicy, freshness_expiry
+from tests.http_stub import StubHttpServer, StubRequest, json_response
+
+
+_FAST_RETRIES = RetryPolicy(max_retries=3, backoff_base_s=0.01, backoff_max_s=0.05)
+
+
+def _flaky(statuses: list[int], headers: dict[str, str] | None = None):
+    """Answer with ``statuses`` in turn, then 200 for every later request."""
+    lock = threading.Lock()
+
+    def handler(request: StubRequest):
+        with lock:
+            status = statuses.pop(0) if statuses else 200
+        return json_response({"status": status}, status=status, headers=headers if status != 200 else None)
+
+    return handler
+
+
+def test_transient_statuses_are_retried_with_backoff_and_posts_only_on_request() -> None:
+    with StubHttpServer(_flaky([503, 502])) as server, HttpConnectionPool(retry_policy=_FAST_RETRIES) as pool:
+        response = pool.request("GET", f"{server.base_url}/orders/")
+        assert response.status == 200
+        assert len(server.requests) == 3
+
+    with StubHttpServer(_flaky([503])) as server, HttpConnectionPool(retry_policy=_FAST_RETRIES) as pool:
+        assert pool.request("POST", f"{server.base_url}/names/", body=b"[]").status == 503
+        assert pool.request("POST", f"{server.base_url}/names/", body=b"[]").status == 200
+
+    with StubHttpServer(_flaky([503, 503, 503, 503, 503])) as server, HttpConnectionPool(retry_policy=_FAST_RETRIES) as pool:
+        assert pool.request("POST", f"{server.base_url}/names/", body=b"[]", retry=True).status == 503
+        assert len(server.requests) == 4
+
+    with StubHttpServer(_flaky([404])) as server, HttpConnectionPool(retry_policy=_FAST_RETRIES) as pool:
+        assert pool.request("GET", f"{server.base_url}/missing/").status == 404
+        assert len(server.requests) == 1
+
+
+def test_refused_connections_are_retried_then_raised() -> None:
+    with StubHttpServer(_flaky([])) as server:
+        url = f"{server.base_url}/orders/"
+    pool = HttpConnectionPool(retry_policy=_FAST_RETRIES, timeout_s=1.0)
+    with pytest.raises(OSError):
+        pool.request("GET", url)
+    assert pool.connections_opened == 4
+
+
+def test_certificate_verification_failures_are_not_retried(monkeypatch) -> None:
+    attempts = []
+
+    def failing_send(conn, method, target, headers, body):
+        attempts.append(target)
+        raise ssl.SSLCertVerificationError("certificate verify failed")
+
+    with StubHttpServer(_flaky([])) as server, HttpConnectionPool(retry_policy=_FAST_RETRIES) as pool:
+        monkeypatch.setattr(HttpConnectionPool, "_send", staticmethod(failing_send))
+        with pytest.raises(ssl.SSLCertVerificationError):
+            pool.request("GET", f"{server.base_url}/orders/")
+    assert len(attempts) == 1
+
+
+def test_truncated_bodies_are_retried_and_count_toward_the_circuit_breaker() -> None:
+    truncated = {"remaining": 2}
+
+    def handler(request: StubRequest):
+        if truncated["remaining"]:
+            truncated["remaining"] -= 1
+            return 200, {"Content-Length": "100"}, b"[1, "
+        return json_response([1, 2])
+
+    with StubHttpServer(handler) as server, HttpConnectionPool(retry_policy=_FAST_RETRIES) as pool:
+        response = pool.request("GET", f"{server.base_url}/orders/")
+        assert response.status == 200 and response.body == b"[1, 2]"
+        assert len(server.requests) == 3
+
+    truncated["remaining"] = 5
+    with StubHttpServer(handler) as server, HttpConnectionPool(
+        retry_policy=RetryPolicy(max_retries=0), breaker_failure_threshold=2
+    ) as pool:
+        url = f"{server.base_url}/orders/"
+        for _ in range(2):
+            with pytest.raises(http.client.IncompleteRead):
+                with pool.stream("GET", url) as stream:
+                    stream.body.read()
+        with pytest.raises(CircuitOpenError):
+            pool.request("GET", url)
+
+
+def test_retry_after_is_honored() -> None:
+    with StubHttpServer(_flaky([429], headers={"Retry-After": "0.3"})) as server, HttpConnectionPool(
+        retry_policy=_FAST_RETRIES
+    ) as pool:
+        started = time.monotonic()
+        assert pool.request("GET", f"{server.base_url}/orders/").status == 200
+        assert time.monotonic() - started >= 0.3
+
+    # A server asking for an hour must not park the worker thread that long.
+    assert RetryPolicy(retry_after_max_s=5.0).delay(0, 3600.0) == 5.0
+
+
+def test_low_esi_error_limit_pauses_the_host_until_the_window_resets() -> None:
+    remain = {"value": 60}
+
+    def handler(request: StubRequest):
+        remain["value"] -= 25
+        return json_response(
+            {"error": "bad request"},
+            status=400,
+            headers={"X-ESI-Error-Limit-Remain": str(remain["value"]), "X-ESI-Error-Limit-Reset": "1"},
+        )
+
+    with StubHttpServer(handler) as server, HttpConnectionPool(retry_policy=_FAST_RETRIES) as pool:
+        url = f"{server.base_url}/orders/"
+        started = time.monotonic()
+        pool.request("GET", url)  # 35 errors left
+        pool.request("GET", url)  # 10 left: at the floor, so the next request waits out the window
+        assert time.monotonic() - started < 0.5
+        pool.request("GET", url)
+        assert time.monotonic() - started >= 1.0
+
+
+def test_consecutive_failures_open_the_circuit_until_the_cooldown() -> None:
+    statuses = [500] * 4
+
+    with StubHttpServer(_flaky(statuses)) as server, HttpConnectionPool(
+        retry_policy=RetryPolicy(max_retries=0), breaker_failure_threshold=3, breaker_cooldown_s=0.3
+    ) as pool:
+        url = f"{server.base_url}/orders/"
+        for _ in range(3):
+            assert pool.request("GET", url).status == 500
+        with pytest.raises(CircuitOpenError):
+            pool.request("GET", url)
+        assert len(server.requests) == 3
+
+        # After the cooldown one failing trial is enough to reopen the circuit.
+        time.sleep(0.35)
+        assert pool.request("GET", url).status == 500
+        with pytest.raises(CircuitOpenError):
+            pool.request("GET", url)
+
+        time.sleep(0.35)
+        assert pool.request("GET", url).status == 200
+        assert pool.request("GET", url).status == 200
+        assert len(server.requests) == 6
+
+
+def test_token_bucket_limits_the_request_rate_per_host() -> None:
+    with StubHttpServer(_flaky([])) as server, HttpConnectionPool(rate_limit_per_s=20.0, rate_limit_burst=2) as pool:
+        started = time.monotonic()
+        for _ in range(6):
+            pool.request("GET", f"{server.base_url}/orders/")
+        # Two requests ride the burst; the other four wait 1/20 s each.
+        assert time.monotonic() - started >= 0.19
+
+
+def test_freshness_expiry_tolerates_malformed_age_and_expires_headers() -> None:
+    now = 1_700_000_000
+
+    def expiry(**headers: str) -> int:
+        return freshness_expiry({k.replace("_", "-"): v for k, v in headers.items()}, now_ts=now, default_max_age_s=60)
+
+    assert expiry(cache_control="max-age=300", age="100") == now + 200
+    assert expiry(cache_control="max-age=300", age="soon") == now + 300
+    assert expiry(cache_control="max-age=300", age="-50") == now + 300
+    assert expiry(cache_control="no-store", expires="Tue, 14 Nov 2023 22:13:20 GMT") == now
+    assert expiry(expires="Tue, 14 Nov 2023 22:13:20 GMT") == now
+    # A "-0000" zone parses as a naive datetime, which still means UTC.
+    assert expiry(expires="Tue, 14 Nov 2023 22:13:20 -0000") == now
+    assert expiry(expires="not a date") == now + 60
+    assert expiry(expires="0") == now + 60
+    assert expiry() == now + 60
@@ -0,0 +1,65 @@
+import io
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from src.http_pool import HttpConnectionPool
+from src.json_stream import iter_json_array
+from tests.http_stub import StubHttpServer, StubRequest, json_response
+
+
+def test_iter_json_array_handles_every_chunk_boundary() -> None:
+    rows = [{"order_id": index, "price": 1.5e3 + index, "name": "Ünïcode" * (index % 3), "flags": [True, None]} for index in range(60)]
+    rows += [12345, -0.5, "tail", [], {}]
+    raw = json.dumps(rows).encode("utf-8")
+
+    for chunk_size in range(1, 10):
+        assert list(iter_json_array(io.BytesIO(raw), chunk_size=chunk_size)) == rows
+    assert list(iter_json_array(io.BytesIO(b" \n[ ] "))) == []
+
+
+@pytest.mark.parametrize("raw", [b"{}", b"[1,", b"[1 2]", b"[", b"[tru]", b""])
+def test_iter_json_array_rejects_malformed_input(raw: bytes) -> None:
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.BytesIO(raw), chunk_size=2))
+
+
+def test_iter_json_array_memory_does_not_grow_with_the_array() -> None:
+    order = {"order_id": 1, "type_id": 34, "location_id": 60003760, "price": 5.01, "volume_remain": 1000, "is_buy_order": False}
+    raw = b"[" + b",".join([json.dumps(order).encode("utf-8")] * 40_000) + b"]"
+    stream = io.BytesIO(raw)
+
+    tracemalloc.start()
+    try:
+        total = sum(row["volume_remain"] for row in iter_json_array(stream))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert total == 40_000_000
+    assert len(raw) > 4_000_000
+    assert peak < 1_000_000
+
+
+def test_streamed_responses_return_fully_read_connections_to_the_pool() -> None:
+    def handler(request: StubRequest):
+        return json_response([{"row": index} for index in range(500)])
+
+    with StubHttpServer(handler) as server, HttpConnectionPool() as pool:
+        for _ in range(3):
+            with pool.stream("GET", f"{server.base_url}/rows") as response:
+                response.raise_for_status()
+                assert sum(1 for _ in iter_json_array(response.body, chunk_size=512)) == 500
+        assert pool.connections_opened == 1
+
+        # Abandoning a body part-way closes the connection instead of reusing it.
+        with pool.stream("GET", f"{server.base_url}/rows") as response:
+            response.body.read(10)
+        with pool.stream("GET", f"{server.base_url}/rows") as response:
+            response.body.read()
+        assert pool.connections_opened == 2